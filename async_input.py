@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+
+class AsyncInput:
+    """
+    Reads lines from stdin on a daemon thread so the event loop stays free
+    while the user is typing.
+
+    Only one read is ever in flight. If the task waiting on a read gets
+    cancelled (Ctrl-C during a confirmation, say), the next read adopts the
+    line the user is still typing instead of starting a second reader that
+    would race the first one for stdin.
+    """
+
+    def __init__(self):
+        self._pending = None
+
+    async def read(self, show_prompt=None):
+        """
+        Awaits the next input line. `show_prompt` is called before a fresh read,
+        or again when an orphaned read is adopted, to (re)draw the prompt.
+        """
+        loop = asyncio.get_running_loop()
+
+        if show_prompt:
+            show_prompt()
+
+        if self._pending is None or self._pending.done():
+            future = loop.create_future()
+
+            def deliver(result, error):
+                if future.done():
+                    return
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+            def worker():
+                try:
+                    line = input()
+                except BaseException as e:  # EOFError / KeyboardInterrupt go to the awaiting task
+                    loop.call_soon_threadsafe(deliver, None, e)
+                else:
+                    loop.call_soon_threadsafe(deliver, line, None)
+
+            threading.Thread(target=worker, name="nl-terminal-input", daemon=True).start()
+            self._pending = future
+
+        # Cancelling the caller must not cancel the read itself
+        return await asyncio.shield(self._pending)
@@ -1,34 +1,377 @@
 import os
+import re
 import shutil
 import json
-import uuid
-from datetime import datetime
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+import lzma
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from rich.console import Console
+from config import (
+    BASE_DIR, BACKUP_WORKERS, BACKUP_COMPRESSION,
+    BACKUP_MAX_BYTES, BACKUP_MAX_AGE_DAYS, BACKUP_KEEP_PER_PATH, BACKUP_GC_INTERVAL,
+)
+
+try:
+    import fcntl  # reflinks; POSIX only
+except ImportError:
+    fcntl = None
 
 console = Console()
 
-BACKUP_DIR = ".backups"
-INDEX_FILE = os.path.join(BACKUP_DIR, "index.json")
+BACKUP_DIR = os.path.join(BASE_DIR, ".backups")
+
+FICLONE = 0x40049409  # Linux ioctl: make dst share src's extents (btrfs, XFS, ...), no data copied
+CHUNK = 1024 * 1024
+
+# Blob file name suffix per compression; raw blobs have none
+_SUFFIX = {None: "", "zlib": ".zz", "lzma": ".xz"}
+
+# One row of the history, as returned by find() / list_backups()
+BackupEntry = namedtuple("BackupEntry", [
+    "id", "original_path", "filename", "timestamp", "blob", "size", "mode", "mtime", "restored", "kind", "compression",
+])
+_ENTRY_COLUMNS = ", ".join(BackupEntry._fields)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_path TEXT NOT NULL,
+    filename      TEXT NOT NULL,
+    timestamp     TEXT NOT NULL,
+    blob          TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    mode          INTEGER,
+    mtime         REAL,
+    restored      INTEGER NOT NULL DEFAULT 0,
+    kind          TEXT NOT NULL DEFAULT 'file',  -- 'dir': blob is the tree manifest, size the tree's bytes
+    compression   TEXT
+);
+-- restore_last() reads the newest entry that hasn't been restored yet
+CREATE INDEX IF NOT EXISTS idx_backups_pending ON backups(id) WHERE restored = 0;
+-- point-in-time restore and listings: by full path (and path prefix for a directory), or by file name
+CREATE INDEX IF NOT EXISTS idx_backups_path_time ON backups(original_path, timestamp);
+CREATE INDEX IF NOT EXISTS idx_backups_name_time ON backups(filename, timestamp);
+"""
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _reflink(src_fd, dst_fd):
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+def _copy_fast(src, dst):
+    """
+    Copies src to dst, keeping the data out of Python where the OS allows:
+    a reflink first, then copy_file_range (in-kernel), then a buffered copy.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        if _reflink(fsrc.fileno(), fdst.fileno()):
+            return
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 64 * CHUNK):
+                    pass
+                return
+            except OSError:
+                # Not supported between these filesystems: start over the slow way
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, CHUNK)
+
+def _compressor(compression):
+    return zlib.compressobj(1) if compression == "zlib" else lzma.LZMACompressor(preset=1)
+
+def _compressible(path, sample=16 * 1024):
+    """Cheap guess from the first bytes: media, archives and random data don't shrink, so don't spend time on them."""
+    with open(path, "rb") as f:
+        head = f.read(sample)
+    return len(head) >= 512 and len(zlib.compress(head, 1)) < len(head) * 0.9
+
+def _decompressor(compression):
+    return zlib.decompressobj() if compression == "zlib" else lzma.LZMADecompressor()
+
+def _set_meta(path, mode, mtime):
+    if mode is not None:
+        os.chmod(path, mode)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+def _stats(files, size, seconds):
+    return {"files": files, "bytes": size, "seconds": seconds, "mb_per_s": size / 1e6 / seconds if seconds > 0 else 0.0}
+
+_CLOCK = re.compile(
+    r"^(?:(?P<day>today|yesterday)\s+)?(?:at\s+)?(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?(?::(?P<second>\d{2}))?"
+    r"\s*(?P<ampm>am|pm)?(?:\s+(?P<day_after>today|yesterday))?$"
+)
+_AGO = re.compile(r"^(?P<n>\d+)\s*(?P<unit>s|sec|second|m|min|minute|h|hr|hour|d|day|w|week)s?\s+ago$")
+_UNIT_SECONDS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60,
+                 "h": 3600, "hr": 3600, "hour": 3600, "d": 86400, "day": 86400, "w": 604800, "week": 604800}
+
+def parse_when(text, now=None):
+    """
+    "10:30", "9pm", "yesterday 18:05", "2 hours ago", "2026-10-17 10:30" -> datetime, or None.
+    A bare time of day that hasn't come yet today means yesterday.
+    """
+    now = now or datetime.now()
+    text = text.strip().lower()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+
+    match = _AGO.match(text)
+    if match:
+        return now - timedelta(seconds=int(match["n"]) * _UNIT_SECONDS[match["unit"]])
+
+    match = _CLOCK.match(text)
+    if not match or (match["minute"] is None and match["ampm"] is None):
+        return None  # a bare number isn't a time
+    hour = int(match["hour"])
+    if match["ampm"]:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if match["ampm"] == "pm" else 0)
+    try:
+        when = now.replace(hour=hour, minute=int(match["minute"] or 0), second=int(match["second"] or 0), microsecond=0)
+    except ValueError:
+        return None
+    day = match["day"] or match["day_after"]
+    if day == "yesterday" or (day is None and when > now):
+        when -= timedelta(days=1)
+    return when
+
+_HERE = {"this dir", "this directory", "this folder", "here", "."}
+
+def backup_target(name):
+    """An extracted entity -> a path for find()/list_backups(): quotes stripped, "this dir"/"here" = the cwd."""
+    if not name:
+        return None
+    name = name.strip().strip("\"'")
+    if " ".join(name.lower().split()) in _HERE:
+        return os.getcwd()
+    return os.path.expanduser(name)
+
+def transfer_summary(stats):
+    """One line for a snapshot/restore, e.g. "1,204 files, 48.3 MB in 0.61s (79.2 MB/s)"."""
+    return (f"{stats['files']:,} files, {stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.2f}s "
+            f"({stats['mb_per_s']:.1f} MB/s)")
 
 class BackupManager:
-    def __init__(self):
-        if not os.path.exists(BACKUP_DIR):
-            os.makedirs(BACKUP_DIR)
-        
-        if not os.path.exists(INDEX_FILE):
-             with open(INDEX_FILE, "w") as f:
-                 json.dump([], f)
-
-    def _load_index(self):
+    """
+    Content-addressed backup store.
+
+    File contents live once under objects/<sha256[:2]>/<sha256>, however many
+    times they are backed up; the history is a SQLite index. Taking a backup
+    or restoring the last one costs the same with 10 or 100k entries behind
+    it, and a crash mid-way leaves at worst an unreferenced blob behind.
+
+    A directory snapshot stores each file as a blob (on a thread pool) plus a
+    manifest blob describing the tree; its index entry points at the manifest.
+    """
+
+    def __init__(self, backup_dir=BACKUP_DIR, compression=BACKUP_COMPRESSION, workers=BACKUP_WORKERS):
+        if compression not in _SUFFIX:
+            raise ValueError(f"Unknown backup compression: {compression!r} (use None, 'zlib' or 'lzma')")
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.compression = compression
+        self.workers = max(1, workers)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Blobs being written whose index row doesn't exist yet: GC must not sweep them,
+        # nor the ones indexed after a running GC pass read the history
+        self._pinned = Counter()
+        self._unpinned = set()
+        self._gc_active = False
+        self._pin_lock = threading.Lock()
+        self._gc_stop = threading.Event()
+        self._gc_thread = None
+        self._db = sqlite3.connect(os.path.join(backup_dir, "index.db"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._upgrade_schema()
+
+        self._migrate_legacy_index()
+
+    def _upgrade_schema(self):
+        """Adds the columns an index created before directory snapshots lacks."""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(backups)")}
+        if "kind" not in columns:
+            self._db.execute("ALTER TABLE backups ADD COLUMN kind TEXT NOT NULL DEFAULT 'file'")
+        if "compression" not in columns:
+            self._db.execute("ALTER TABLE backups ADD COLUMN compression TEXT")
+
+    # --- blob store ------------------------------------------------------
+
+    def blob_path(self, digest, compression=None):
+        return os.path.join(self.objects_dir, digest[:2], digest + _SUFFIX[compression])
+
+    def _pin(self, name):
+        with self._pin_lock:
+            self._pinned[name] += 1
+
+    def _unpin(self, names):
+        with self._pin_lock:
+            self._pinned.subtract(names)
+            self._pinned += Counter()  # drop the zeros
+            if self._gc_active:
+                self._unpinned.update(names)
+
+    @staticmethod
+    def _tmp_path(target):
+        return f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _store_blob(self, filepath, digest, compression=None):
+        """
+        Puts the content of `filepath` into the store under `digest` unless it's already there.
+        The blob is always its own inode (a reflink or a copy, never a hardlink): a blob
+        sharing the live file's inode would change with it if the file is edited, or the
+        delete it was taken for fails, and corrupt every backup deduplicated onto it.
+        Returns the compression of the stored blob (None = raw).
+        """
+        for stored in [compression, *_SUFFIX]:
+            if os.path.exists(self.blob_path(digest, stored)):
+                return stored  # deduplicated
+        target = self.blob_path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        if compression and self._write_compressed(filepath, digest, compression):
+            return compression
+
+        tmp = self._tmp_path(target)
+        try:
+            _copy_fast(filepath, tmp)
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return None
+
+    def _write_compressed(self, filepath, digest, compression):
+        """Stores a compressed blob. Returns False (storing nothing) if it wouldn't be smaller."""
+        if not _compressible(filepath):
+            return False
+        target = self.blob_path(digest, compression)
+        tmp = self._tmp_path(target)
+        compressor = _compressor(compression)
+        raw = 0
+        try:
+            with open(filepath, "rb") as fsrc, open(tmp, "wb") as fdst:
+                for chunk in iter(lambda: fsrc.read(CHUNK), b""):
+                    raw += len(chunk)
+                    fdst.write(compressor.compress(chunk))
+                fdst.write(compressor.flush())
+                packed = fdst.tell()
+            if packed >= raw:
+                return False  # media, archives, tiny files: keep them raw
+            os.replace(tmp, target)
+            return True
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _store_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.blob_path(digest)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = self._tmp_path(target)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        return digest
+
+    def _restore_file(self, dest, digest, compression, mode, mtime):
+        """Writes a blob back to `dest` via a temp file, so a half-written restore never replaces `dest`."""
+        source = self.blob_path(digest, compression)
+        tmp = self._tmp_path(dest)
+        try:
+            if compression:
+                decompressor = _decompressor(compression)
+                with open(source, "rb") as fsrc, open(tmp, "wb") as fdst:
+                    for chunk in iter(lambda: fsrc.read(CHUNK), b""):
+                        fdst.write(decompressor.decompress(chunk))
+                    if compression == "zlib":
+                        fdst.write(decompressor.flush())
+            else:
+                _copy_fast(source, tmp)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        _set_meta(dest, mode, mtime)
+
+    # --- index -----------------------------------------------------------
+
+    def _add_entry(self, original_path, timestamp, digest, size, st, kind="file", compression=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO backups (original_path, filename, timestamp, blob, size, mode, mtime, kind, compression) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (original_path, os.path.basename(original_path), timestamp, digest, size,
+                 st.st_mode & 0o7777, st.st_mtime, kind, compression),
+            )
+
+    def _migrate_legacy_index(self):
+        """Moves the old .backups/<uuid> + index.json history into the store (once)."""
+        index_path = os.path.join(self.backup_dir, "index.json")
         try:
-            with open(INDEX_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return []
+            with open(index_path, "r") as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not legacy:
+            return
 
-    def _save_index(self, index):
-        with open(INDEX_FILE, "w") as f:
-            json.dump(index, f, indent=4)
+        migrated = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            for entry in legacy:
+                old_blob = os.path.join(self.backup_dir, entry.get("id", ""))
+                if not entry.get("id") or not os.path.isfile(old_blob):
+                    continue
+                digest = _hash_file(old_blob)
+                target = self.blob_path(digest)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                st = os.stat(old_blob)
+                if os.path.exists(target):
+                    os.remove(old_blob)
+                else:
+                    os.replace(old_blob, target)
+                self._db.execute(
+                    "INSERT INTO backups (original_path, filename, timestamp, blob, size, mode, mtime) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entry["original_path"], entry.get("filename") or os.path.basename(entry["original_path"]),
+                     entry.get("timestamp") or datetime.now().isoformat(), digest, st.st_size, st.st_mode & 0o7777, st.st_mtime),
+                )
+                migrated += 1
+            self._db.execute("COMMIT")
+        os.replace(index_path, index_path + ".migrated")
+        if migrated:
+            console.print(f"[dim]Migrated {migrated} backups to the new store[/dim]")
+
+    # --- public API ------------------------------------------------------
 
     def backup_file(self, filepath):
         """
@@ -36,69 +379,371 @@ class BackupManager:
         Returns True if successful, False otherwise.
         """
         filepath = os.path.abspath(filepath)
-        if not os.path.exists(filepath):
+        if not os.path.isfile(filepath):
             return False
 
+        digest = None
         try:
-            backup_id = str(uuid.uuid4())
-            timestamp = datetime.now().isoformat()
-            filename = os.path.basename(filepath)
-            
-            # Save the file content to .backups/<uuid>
-            backup_path = os.path.join(BACKUP_DIR, backup_id)
-            shutil.copy2(filepath, backup_path)
-
-            # Update index
-            index = self._load_index()
-            entry = {
-                "id": backup_id,
-                "original_path": filepath,
-                "timestamp": timestamp,
-                "filename": filename
-            }
-            index.append(entry)
-            self._save_index(index)
-            
-            # console.print(f"[dim]Backed up {filename}[/dim]")
+            st = os.stat(filepath)
+            digest = _hash_file(filepath)
+            self._pin(digest)
+            compression = self._store_blob(filepath, digest, compression=self.compression)
+            self._add_entry(filepath, datetime.now().isoformat(), digest, st.st_size, st, compression=compression)
             return True
         except Exception as e:
             console.print(f"[red]Backup failed: {e}[/red]")
             return False
+        finally:
+            if digest:
+                self._unpin([digest])
+
+    def snapshot_dir(self, dirpath):
+        """
+        Backs up a whole directory tree before modification/deletion.
+        Files are hashed and stored on the thread pool while the tree is still
+        being walked. Returns the transfer stats (see transfer_summary), or
+        None if the tree couldn't be saved completely.
+        """
+        dirpath = os.path.abspath(dirpath)
+        if not os.path.isdir(dirpath) or os.path.islink(dirpath):
+            return None
+
+        started = time.perf_counter()
+        dirs, links, futures, pinned = [], [], [], []
+
+        def file_done(future):
+            # Recorded as each file is stored, so a walk that fails half-way still unpins them
+            if future.exception() is None:
+                pinned.append(future.result()[1])
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="nl-backup") as pool:
+                pending = [""]
+                while pending:
+                    rel = pending.pop()
+                    with os.scandir(os.path.join(dirpath, rel)) as it:
+                        for entry in it:
+                            relpath = os.path.join(rel, entry.name)
+                            if entry.is_symlink():
+                                links.append([relpath, os.readlink(entry.path)])
+                            elif entry.is_dir(follow_symlinks=False):
+                                st = entry.stat(follow_symlinks=False)
+                                dirs.append([relpath, st.st_mode & 0o7777, st.st_mtime])
+                                pending.append(relpath)
+                            elif entry.is_file(follow_symlinks=False):
+                                future = pool.submit(self._snapshot_file, entry.path, relpath)
+                                future.add_done_callback(file_done)
+                                futures.append(future)
+                            # sockets, fifos, devices: nothing to bring back
+                files = [future.result() for future in futures]
+
+            manifest = {"root": dirpath, "dirs": dirs, "files": files, "links": links}
+            data = json.dumps(manifest).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+            self._pin(digest)
+            pinned.append(digest)
+            self._store_bytes(data)
+            total = sum(f[3] for f in files)
+            self._add_entry(dirpath, datetime.now().isoformat(), digest, total, os.stat(dirpath), kind="dir")
+        except Exception as e:
+            console.print(f"[red]Snapshot failed: {e}[/red]")
+            return None
+        finally:
+            self._unpin(pinned)
+        return _stats(len(files), total, time.perf_counter() - started)
+
+    def _snapshot_file(self, path, relpath):
+        st = os.stat(path)
+        digest = _hash_file(path)
+        self._pin(digest)  # released by snapshot_dir once the manifest is indexed
+        try:
+            compression = self._store_blob(path, digest, compression=self.compression)
+        except Exception:
+            self._unpin([digest])
+            raise
+        return [relpath, digest, compression, st.st_size, st.st_mode & 0o7777, st.st_mtime]
 
     def restore_last(self):
         """
-        Restores the last backed up file to its original location.
+        Restores the last backed up file (or directory tree) to its original location.
         """
-        index = self._load_index()
-        if not index:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE restored = 0 ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        if row is None:
             return "No backups found."
 
-        # Get last entry
-        last_entry = index.pop()
-        backup_id = last_entry["id"]
-        original_path = last_entry["original_path"]
-        backup_path = os.path.join(BACKUP_DIR, backup_id)
+        entry = BackupEntry(*row)
+        if not os.path.exists(self.blob_path(entry.blob, entry.compression)):
+            self._mark_restored(entry.id)  # Pop it anyway, as before
+            return "Backup file missing from storage."
+
+        try:
+            message = self._restore_entry(entry)
+            # Undo is a stack: the entry leaves it but stays in the history
+            self._mark_restored(entry.id)
+            return message
+        except Exception as e:
+            return f"Restore failed: {e}"
 
-        if not os.path.exists(backup_path):
-            self._save_index(index) # Save the popped state anyway
+    def restore_as_of(self, path, when=None):
+        """
+        Puts `path` back the way it was at `when` (datetime; None = its latest backup).
+        Doesn't touch the undo stack.
+        """
+        entry = self.find(path, when)
+        if entry is None:
+            at = f" from {when:%Y-%m-%d %H:%M}" if when else ""
+            return f"No backup of {path}{at} found."
+        if not os.path.exists(self.blob_path(entry.blob, entry.compression)):
             return "Backup file missing from storage."
 
+        # What's there now becomes a backup itself, so "undo" takes the restore back
+        if entry.kind == "dir" and os.path.isdir(entry.original_path):
+            self.snapshot_dir(entry.original_path)
+        elif entry.kind == "file" and os.path.isfile(entry.original_path):
+            self.backup_file(entry.original_path)
+
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(original_path), exist_ok=True)
-            
-            # Restore
-            shutil.copy2(backup_path, original_path)
-            
-            # Clean up backup ?? Or keep it? 
-            # Usually strict undo removes the undo stack item, but keeping it is safer.
-            # For this "undo" command, let's treat it as a reversion. We can keep the backup file but remove from index or keep history.
-            # Let's remove it from index to "undo" the action effectively in the stack sense.
-            self._save_index(index)
-            
-            # Optional: delete the blob to save space?
-            # os.remove(backup_path) 
-            
-            return f"Restored {os.path.basename(original_path)}"
+            message = self._restore_entry(entry)
         except Exception as e:
             return f"Restore failed: {e}"
+        return f"{message} (backup from {entry.timestamp[:19].replace('T', ' ')})"
+
+    def _restore_entry(self, entry):
+        if entry.kind == "dir":
+            stats = self._restore_tree(entry.original_path, entry.blob, entry.mode, entry.mtime)
+            return f"Restored {os.path.basename(entry.original_path)}/ ({transfer_summary(stats)})"
+
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(entry.original_path), exist_ok=True)
+
+        # Restore as a copy: the blob may be shared with other backups and must stay untouched
+        self._restore_file(entry.original_path, entry.blob, entry.compression, entry.mode, entry.mtime)
+        return f"Restored {os.path.basename(entry.original_path)}"
+
+    def _restore_tree(self, root, manifest_digest, mode, mtime):
+        started = time.perf_counter()
+        with open(self.blob_path(manifest_digest), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        os.makedirs(root, exist_ok=True)
+        for rel, _, _ in manifest["dirs"]:
+            os.makedirs(os.path.join(root, rel), exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="nl-restore") as pool:
+            futures = [
+                pool.submit(self._restore_file, os.path.join(root, rel), digest, compression, fmode, fmtime)
+                for rel, digest, compression, _, fmode, fmtime in manifest["files"]
+            ]
+            for future in futures:
+                future.result()
+
+        for rel, target in manifest["links"]:
+            path = os.path.join(root, rel)
+            if not os.path.lexists(path):
+                os.symlink(target, path)
+
+        # Directory modes/mtimes last: writing the files changed the mtimes, and read-only dirs would have refused them
+        for rel, dmode, dmtime in sorted(manifest["dirs"], key=lambda d: d[0].count(os.sep), reverse=True):
+            _set_meta(os.path.join(root, rel), dmode, dmtime)
+        _set_meta(root, mode, mtime)
+
+        total = sum(f[3] for f in manifest["files"])
+        return _stats(len(manifest["files"]), total, time.perf_counter() - started)
+
+    # --- history lookups -------------------------------------------------
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [BackupEntry(*row) for row in self._db.execute(sql, params).fetchall()]
+
+    def find(self, path, when=None):
+        """
+        The entry holding `path` as it was at `when`. Backups are taken right
+        before a file changes, so that's the first backup after `when`; if the
+        path hasn't been backed up since, the last one before it. `path` may
+        also be a bare file name backed up from anywhere (the most recent wins).
+        """
+        target = os.path.abspath(path)
+        column, key = "original_path", target
+        if not self._query(f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE original_path = ? LIMIT 1", (target,)):
+            column, key = "filename", os.path.basename(target)
+            latest = self._query(
+                f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE filename = ? ORDER BY timestamp DESC LIMIT 1", (key,)
+            )
+            if not latest:
+                return None
+            column, key = "original_path", latest[0].original_path
+
+        if when is None:
+            rows = self._query(
+                f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE {column} = ? ORDER BY timestamp DESC LIMIT 1", (key,)
+            )
+            return rows[0] if rows else None
+
+        at = when.isoformat()
+        rows = self._query(
+            f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE {column} = ? AND timestamp >= ? ORDER BY timestamp LIMIT 1", (key, at)
+        ) or self._query(
+            f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE {column} = ? AND timestamp < ? ORDER BY timestamp DESC LIMIT 1", (key, at)
+        )
+        return rows[0] if rows else None
+
+    def list_backups(self, path=None, limit=50):
+        """
+        Newest first; the whole history without a path. For a directory
+        (deleted ones too): its own snapshots and everything backed up below
+        it. For a file: its backups, matched by full path or else by file name.
+        """
+        if path is None:
+            return self._query(f"SELECT {_ENTRY_COLUMNS} FROM backups ORDER BY id DESC LIMIT ?", (limit,))
+
+        target = os.path.abspath(path)
+        entries = []
+        if not os.path.isfile(target):
+            prefix = target.rstrip(os.sep) + os.sep
+            # [prefix, prefix with the separator bumped) is exactly "below target", and can use the index
+            upper = prefix[:-1] + chr(ord(os.sep) + 1)
+            entries = self._query(
+                f"SELECT {_ENTRY_COLUMNS} FROM backups "
+                "WHERE original_path = ? OR (original_path >= ? AND original_path < ?) "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (target, prefix, upper, limit),
+            )
+        return entries or self._query(
+            f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE original_path = ? ORDER BY timestamp DESC LIMIT ?", (target, limit)
+        ) or self._query(
+            f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE filename = ? ORDER BY timestamp DESC LIMIT ?",
+            (os.path.basename(target), limit),
+        )
+
+    # --- retention / garbage collection ----------------------------------
+
+    def _entry_blobs(self, entry):
+        """Blob file names an entry needs: its blob, plus every file of a tree manifest."""
+        names = [entry.blob + _SUFFIX[entry.compression]]
+        if entry.kind == "dir":
+            try:
+                with open(self.blob_path(entry.blob), "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                return names
+            names.extend(digest + _SUFFIX[compression] for _, digest, compression, *_ in manifest["files"])
+        return names
+
+    def _delete_entries(self, ids):
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM backups WHERE id = ?", [(i,) for i in ids])
+            self._db.execute("COMMIT")
+
+    def collect_garbage(self, max_bytes=BACKUP_MAX_BYTES, max_age_days=BACKUP_MAX_AGE_DAYS,
+                        keep_per_path=BACKUP_KEEP_PER_PATH):
+        """
+        One GC pass: drops the history entries the retention policies rule
+        out, then deletes every blob no remaining entry needs. The newest
+        entry always survives the size limit, so a big snapshot that was just
+        taken isn't thrown away. Returns {"entries", "blobs", "bytes"} removed.
+        """
+        with self._pin_lock:
+            self._gc_active = True
+        try:
+            return self._collect(max_bytes, max_age_days, keep_per_path)
+        finally:
+            with self._pin_lock:
+                self._gc_active = False
+                self._unpinned.clear()
+
+    def _collect(self, max_bytes, max_age_days, keep_per_path):
+        expired = set()
+        if max_age_days is not None:
+            cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+            expired.update(e.id for e in self._query(f"SELECT {_ENTRY_COLUMNS} FROM backups WHERE timestamp < ?", (cutoff,)))
+        if keep_per_path is not None:
+            with self._lock:
+                expired.update(row[0] for row in self._db.execute(
+                    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+                    "(PARTITION BY original_path ORDER BY id DESC) AS rank FROM backups) WHERE rank > ?",
+                    (keep_per_path,),
+                ))
+
+        entries = [e for e in self._query(f"SELECT {_ENTRY_COLUMNS} FROM backups ORDER BY id") if e.id not in expired]
+        needs = [(e.id, self._entry_blobs(e)) for e in entries]
+        refs = Counter(name for _, names in needs for name in names)
+
+        sizes = {}
+        for name in refs:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(self.objects_dir, name[:2], name))
+            except OSError:
+                sizes[name] = 0
+        total = sum(sizes.values())
+
+        if max_bytes is not None:
+            for entry_id, names in needs[:-1]:  # oldest first, never the newest
+                if total <= max_bytes:
+                    break
+                expired.add(entry_id)
+                for name in names:
+                    refs[name] -= 1
+                    if refs[name] == 0:
+                        total -= sizes[name]
+                        del refs[name]
+
+        if expired:
+            self._delete_entries(expired)
+
+        blobs = freed = 0
+        grace = time.time() - 3600
+        for shard in os.scandir(self.objects_dir):
+            if not shard.is_dir():
+                continue
+            for blob in os.scandir(shard.path):
+                if blob.name in refs:
+                    continue
+                try:
+                    if blob.name.endswith(".tmp"):
+                        # Left over by a crash; a recent one may still be being written
+                        if blob.stat().st_mtime < grace:
+                            os.remove(blob.path)
+                        continue
+                    digest = blob.name.split(".", 1)[0]
+                    with self._pin_lock:
+                        if self._pinned[digest] or digest in self._unpinned:
+                            continue  # referenced by a backup taken during this pass
+                        size = blob.stat().st_size
+                        os.remove(blob.path)
+                    blobs += 1
+                    freed += size
+                except OSError:
+                    pass
+        return {"entries": len(expired), "blobs": blobs, "bytes": freed}
+
+    def start_gc(self, interval=BACKUP_GC_INTERVAL):
+        """Runs collect_garbage() on a daemon thread: once shortly after startup, then every `interval` seconds."""
+        if self._gc_thread is not None or interval is None:
+            return
+
+        def loop():
+            delay = min(30, interval)
+            while not self._gc_stop.wait(delay):
+                try:
+                    self.collect_garbage()
+                except Exception:
+                    pass  # retried on the next pass; never bother the REPL
+                delay = interval
+
+        self._gc_thread = threading.Thread(target=loop, name="nl-backup-gc", daemon=True)
+        self._gc_thread.start()
+
+    def stop_gc(self):
+        self._gc_stop.set()
+
+    def _mark_restored(self, entry_id):
+        with self._lock:
+            self._db.execute("UPDATE backups SET restored = 1 WHERE id = ?", (entry_id,))
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,344 @@
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from intent_parser import route_input, extract_entities, match_learned, learn_phrase, confident_guess
+from local_ai import ai_interpret_ranked, ai_explain, ai_teach
+from command_mapper import map_command
+from executor import stream_command
+from safety import is_safe, confirmation_prompt
+from logger import log_action, start_action
+from session import Session
+from ui import TerminalUI
+from backup_manager import BackupManager, transfer_summary, backup_target, parse_when
+from config import CONFIDENCE_THRESHOLD, BATCH_WORKERS
+from output_formatter import FORMATTED_INTENTS, format_output, format_metrics, format_backup_list, format_history
+from model_manager import get_model
+import sys_metrics
+import history
+from tracing import traced
+
+# What one input line turned into. `kind` says how to run it:
+# COMMAND, METRICS, BACKUP (undo / restore / list backups), HISTORY, INTERNAL (plugin reply),
+# MODE, ANSWER (explain/teach) or ERROR. `learn` is set when the LLM read the line: its
+# phrase is learned once the line ran successfully.
+Plan = namedtuple("Plan", ["line_no", "text", "kind", "intent", "entities", "command", "answer", "learn"],
+                  defaults=[False])
+
+DESTRUCTIVE_INTENTS = ["DELETE_FILE", "DELETE_FOLDER", "KILL_PROCESS"]
+BACKUP_INTENTS = ["ROLLBACK", "RESTORE_BACKUP", "LIST_BACKUPS"]
+
+
+def read_lines(source):
+    """(line_no, text) for every non-blank, non-comment line of a file or "-" (stdin)."""
+    if source == "-":
+        raw = sys.stdin.read().splitlines()
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            raw = f.read().splitlines()
+    return [(n, line.strip()) for n, line in enumerate(raw, 1) if line.strip() and not line.strip().startswith("#")]
+
+
+@traced("interpret")
+def interpret(line_no, text, os_type, intent_catalog):
+    """
+    Turns one line into a Plan without side effects, so lines can be
+    interpreted concurrently. All LLM round-trips for the line happen here.
+    """
+    use_cache = "--no-cache" not in text
+    if not use_cache:
+        text = " ".join(text.replace("--no-cache", " ").split())
+
+    learn = False
+
+    def plan(kind, intent=None, entities=None, command=None, answer=None):
+        return Plan(line_no, text, kind, intent, entities or {}, command, answer, learn)
+
+    lower = text.lower()
+    route = route_input(text)
+
+    if route.route == "MODE":
+        for m in ["beginner", "expert", "safe"]:
+            if m in lower:
+                return plan("MODE", answer=m)
+        return plan("ERROR", answer="Specify mode: beginner | expert | safe")
+
+    if route.route == "EXPLAIN":
+        return plan("ANSWER", answer=ai_explain(text.replace("explain", "", 1).strip(), use_cache))
+
+    if route.route == "LEARN":
+        topic = lower.replace("teach me", "").replace("learn", "").replace("how to", "")
+        return plan("ANSWER", answer=ai_teach(topic.strip(), use_cache))
+
+    if route.route == "INTERACTIVE":
+        return plan("ERROR", answer="Interactive programs can't run in batch mode")
+
+    if route.route != "NL":
+        return plan("COMMAND", "RAW_COMMAND", command=text)
+
+    intent = route.intent
+    entities = extract_entities(text, intent)
+
+    if intent == "UNKNOWN":
+        learned = match_learned(text)
+        if learned:
+            intent, entities = learned
+
+    if intent == "UNKNOWN":
+        guess = confident_guess(text)
+        if guess:
+            intent = guess.intent
+            entities = extract_entities(text, intent)
+
+    if intent == "UNKNOWN":
+        # Nobody is there to pick from a menu: only a confident answer runs
+        ai_result = ai_interpret_ranked(text, intent_catalog)
+        if ai_result["confidence"] < CONFIDENCE_THRESHOLD:
+            return plan("ERROR", answer=f"Too ambiguous (Confidence: {ai_result['confidence']:.2f}). Please rephrase.")
+        intent = ai_result["intent"]
+        entities = ai_result["entities"]
+        learn = True
+
+    if intent in BACKUP_INTENTS:
+        return plan("BACKUP", intent, entities)
+
+    if intent == "SHOW_HISTORY":
+        return plan("HISTORY", intent, entities)
+
+    if intent in sys_metrics.METRIC_INTENTS and os_type == "LINUX" and sys_metrics.available():
+        return plan("METRICS", intent, entities)
+
+    command = map_command(intent, os_type, entities)
+    if not command:
+        return plan("ERROR", intent, entities, answer=f"Could not map command for intent: {intent}")
+
+    if command.startswith("INTERNAL:"):
+        return plan("INTERNAL", intent, entities, command, answer=command.split("INTERNAL:", 1)[1])
+
+    return plan("COMMAND", intent, entities, command)
+
+
+class BatchRunner:
+    """
+    Runs a script of NL/shell lines: every line is interpreted up front on a
+    bounded thread pool, then executed strictly in file order in the same
+    persistent shell. Execution of line N starts as soon as line N is
+    interpreted, so the wall time is roughly the slowest interpretation plus
+    the execution time, not the sum of all LLM calls.
+
+    Destructive intents need `assume_yes` (or expert mode), since there is
+    nobody to confirm them.
+    """
+
+    def __init__(self, os_type, intent_catalog, assume_yes=False, as_json=False, fail_fast=False, workers=BATCH_WORKERS):
+        self.os_type = os_type
+        self.intent_catalog = intent_catalog
+        self.assume_yes = assume_yes
+        self.as_json = as_json
+        self.fail_fast = fail_fast
+        self.workers = max(1, workers)
+        self.session = Session()
+        self.ui = TerminalUI(self.session.mode, os_type)
+        self.backup_manager = BackupManager()
+        self.backup_manager.start_gc()
+
+    def run(self, lines):
+        """Returns the process exit code: 0 if every line succeeded, 1 otherwise."""
+        failed = 0
+        # Load the model alongside the first interpretations; LLM calls wait for it instead of timing out
+        get_model().start()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="nl-batch") as pool:
+            futures = [pool.submit(interpret, n, text, self.os_type, self.intent_catalog) for n, text in lines]
+            for (line_no, text), future in zip(lines, futures):
+                started = time.monotonic()
+                try:
+                    plan = future.result()
+                except Exception as e:
+                    plan = Plan(line_no, text, "ERROR", None, {}, None, f"Interpretation failed: {e}")
+
+                result = self.execute(plan)
+                result["seconds"] = round(time.monotonic() - started, 3)
+                self.report(plan, result)
+                if plan.learn and not result["exit_code"]:
+                    learn_phrase(plan.text, plan.intent, plan.entities)
+
+                if result["exit_code"]:
+                    failed += 1
+                    if self.fail_fast:
+                        for pending in futures:
+                            pending.cancel()
+                        break
+
+        if not self.as_json:
+            status = f"{failed} of {len(lines)} lines failed" if failed else f"All {len(lines)} lines succeeded"
+            (self.ui.print_error if failed else self.ui.print_success)(status)
+        return 1 if failed else 0
+
+    # --- execution (in order, on the calling thread) ---------------------
+
+    @traced("run_line")
+    def execute(self, plan):
+        """Runs a Plan. Returns {"status", "exit_code", "stdout", "stderr", ...}."""
+        start_action()
+        if not self.as_json:
+            self.ui.console.print(f"[comment]── {plan.line_no}:[/comment] {plan.text}", highlight=False)
+
+        if plan.kind == "ERROR":
+            log_action(plan.text, plan.intent or "UNKNOWN", "BATCH", "FAIL", plan.answer)
+            return self._result("ERROR", 1, stderr=plan.answer)
+
+        if plan.kind == "MODE":
+            self.session.set_mode(plan.answer)
+            self.ui.update_mode(self.session.mode)
+            return self._result("SUCCESS", 0, stdout=f"Switched to {self.session.mode} mode")
+
+        if plan.kind == "ANSWER":
+            return self._result("SUCCESS", 0, stdout=plan.answer)
+
+        if plan.kind == "BACKUP":
+            return self._run_backup(plan)
+
+        if plan.kind == "HISTORY":
+            query, entries = history.search(plan.text)
+            if not self.as_json and entries:
+                self.ui.stream_output(format_history(entries, query))
+            elif not self.as_json:
+                self.ui.print_info("Nothing in the history matches that.")
+            return self._result("SUCCESS", 0, data=[e._asdict() for e in entries])
+
+        if plan.kind == "INTERNAL":
+            log_action(plan.text, plan.intent, "PLUGIN_EXEC", "SUCCESS", plan.answer)
+            return self._result("SUCCESS", 0, stdout=plan.answer)
+
+        if plan.intent in DESTRUCTIVE_INTENTS:
+            blocked = self._check_destructive(plan)
+            if blocked:
+                return blocked
+
+        if plan.kind == "METRICS":
+            return self._run_metrics(plan)
+        return self._run_command(plan)
+
+    def _check_destructive(self, plan):
+        name = plan.entities.get("name")
+        if not is_safe(name):
+            log_action(plan.text, plan.intent, "BLOCKED", "FAIL", "Strict safety block")
+            return self._result("BLOCKED", 1, stderr="Action blocked by strict safety rules (system path protections).")
+
+        if confirmation_prompt(f"{plan.intent} on {name}", self.session.mode.lower()) and not self.assume_yes:
+            log_action(plan.text, plan.intent, "ABORTED", "CANCEL", "No confirmation in batch mode")
+            return self._result("SKIPPED", 1, stderr="Needs confirmation: rerun with --yes (or add 'mode expert')")
+
+        if plan.intent == "DELETE_FILE" and name and self.backup_manager.backup_file(name):
+            if not self.as_json:
+                self.ui.print_success(f"📦 Backup created for {name}")
+
+        if plan.intent == "DELETE_FOLDER" and name and os.path.isdir(name):
+            stats = self.backup_manager.snapshot_dir(name)
+            if stats is None:
+                log_action(plan.text, plan.intent, "ABORTED", "FAIL", "Snapshot failed")
+                return self._result("ERROR", 1, stderr="Could not back up the folder, so it was not deleted.")
+            if not self.as_json:
+                self.ui.print_success(f"📦 Snapshot of {name}: {transfer_summary(stats)}")
+        return None
+
+    def _run_backup(self, plan):
+        if plan.intent == "ROLLBACK":
+            msg = self.backup_manager.restore_last()
+            log_action(plan.text, plan.intent, "ROLLBACK", "SUCCESS", msg)
+            return self._result("SUCCESS", 0, stdout=msg)
+
+        target = backup_target(plan.entities.get("name"))
+        if plan.intent == "LIST_BACKUPS":
+            entries = self.backup_manager.list_backups(target)
+            log_action(plan.text, plan.intent, "LIST_BACKUPS", "SUCCESS", f"{len(entries)} entries")
+            if not self.as_json and entries:
+                self.ui.stream_output(format_backup_list(entries, target if target and not os.path.isfile(target) else None))
+            return self._result("SUCCESS", 0, data=[e._asdict() for e in entries])
+
+        if not target:
+            return self._result("ERROR", 1, stderr="Which file? e.g. restore notes.txt as of 10:30")
+        when = parse_when(plan.entities["when"]) if plan.entities.get("when") else None
+        if plan.entities.get("when") and when is None:
+            return self._result("ERROR", 1, stderr=f"Couldn't read the time '{plan.entities['when']}'")
+        msg = self.backup_manager.restore_as_of(target, when)
+        ok = msg.startswith("Restored")
+        log_action(plan.text, plan.intent, "RESTORE", "SUCCESS" if ok else "FAIL", msg)
+        return self._result("SUCCESS", 0, stdout=msg) if ok else self._result("ERROR", 1, stderr=msg)
+
+    def _run_metrics(self, plan):
+        sort_by = "mem" if any(w in plan.text.lower().split() for w in ["memory", "mem", "ram"]) else "cpu"
+        try:
+            data = sys_metrics.query(plan.intent, sort_by)
+        except (OSError, ValueError, IndexError) as e:
+            log_action(plan.text, plan.intent, "PROC_METRICS", "ERROR", message=str(e)[:100])
+            return self._result("ERROR", 1, stderr=f"Could not read system metrics: {e}")
+
+        log_action(plan.text, plan.intent, "PROC_METRICS", "SUCCESS", message="OK")
+        if not self.as_json:
+            self.ui.stream_output(format_metrics(plan.intent, data))
+        return self._result("SUCCESS", 0, data=data)
+
+    def _run_command(self, plan):
+        streaming = not self.as_json and plan.intent not in FORMATTED_INTENTS
+        if not self.as_json:
+            self.ui.print_command_execution(plan.command)
+
+        out, err, returncode = stream_command(plan.command, self.ui.stream_line if streaming else None)
+        try:
+            if streaming:
+                self.ui.end_stream()
+            stdout, stderr = out.text(), err.text()
+        finally:
+            out.close()
+            err.close()
+
+        status = "SUCCESS" if returncode == 0 else "ERROR"
+        log_action(plan.text, plan.intent, plan.command, status, message=stderr[:100] if stderr else "OK", exit_code=returncode)
+
+        if not self.as_json and not streaming:
+            formatted = format_output(plan.intent, stdout, self.os_type) if stdout else None
+            if formatted or stdout:
+                self.ui.stream_output(formatted or stdout)
+            if stderr:
+                self.ui.print_error(stderr)
+        return self._result(status, returncode, stdout=stdout, stderr=stderr, command=plan.command)
+
+    @staticmethod
+    def _result(status, exit_code, stdout="", stderr="", **extra):
+        result = {"status": status, "exit_code": exit_code, "stdout": stdout, "stderr": stderr}
+        result.update(extra)
+        return result
+
+    # --- reporting -------------------------------------------------------
+
+    def report(self, plan, result):
+        if self.as_json:
+            record = {"line": plan.line_no, "input": plan.text, "intent": plan.intent, "command": plan.command}
+            record.update(result)
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+            return
+
+        if plan.kind in ["MODE", "ANSWER", "BACKUP", "INTERNAL"] and result["stdout"]:
+            self.ui.console.print(result["stdout"], markup=False, highlight=False)
+        elif plan.kind == "ERROR" or result["status"] in ["BLOCKED", "SKIPPED"]:
+            self.ui.print_error(result["stderr"])
+
+        style = "success" if result["exit_code"] == 0 else "error"
+        self.ui.console.print(
+            f"[{style}]→ exit {result['exit_code']}[/{style}] [comment]({result['seconds']:.2f}s)[/comment]"
+        )
+
+
+def run_batch(source, os_type, intent_catalog, **options):
+    """Entry point for `main.py --batch <file|->`. Returns the process exit code."""
+    try:
+        lines = read_lines(source)
+    except OSError as e:
+        print(f"Cannot read batch file: {e}", file=sys.stderr)
+        return 2
+    return BatchRunner(os_type, intent_catalog, **options).run(lines)
@@ -0,0 +1,141 @@
+"""
+Backup/undo latency with a long history: the old JSON index vs. the content-addressed store.
+
+    python benchmarks/bench_backup.py [--entries 100000] [--rounds 50] [--size-kb 64]
+
+Both stores are pre-filled with `--entries` history entries in a temp
+directory, then one file is backed up and restored `--rounds` times. The
+store's point-in-time lookup and directory listing are timed on the same
+history.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backup_manager import BackupManager, _hash_file  # noqa: E402
+
+
+class LegacyStore:
+    """What backup_manager did before: a uuid copy per backup and the whole index.json rewritten each time."""
+
+    def __init__(self, backup_dir, entries):
+        self.backup_dir = backup_dir
+        self.index_file = os.path.join(backup_dir, "index.json")
+        now = datetime.now().isoformat()
+        index = [{"id": str(uuid.uuid4()), "original_path": f"/tmp/file{i}.txt", "timestamp": now, "filename": f"file{i}.txt"}
+                 for i in range(entries)]
+        with open(self.index_file, "w") as f:
+            json.dump(index, f, indent=2)
+
+    def backup_file(self, filepath):
+        backup_id = str(uuid.uuid4())
+        shutil.copy2(filepath, os.path.join(self.backup_dir, backup_id))
+        with open(self.index_file, "r") as f:
+            index = json.load(f)
+        index.append({"id": backup_id, "original_path": filepath,
+                      "timestamp": datetime.now().isoformat(), "filename": os.path.basename(filepath)})
+        with open(self.index_file, "w") as f:
+            json.dump(index, f, indent=2)
+
+    def restore_last(self):
+        with open(self.index_file, "r") as f:
+            index = json.load(f)
+        entry = index.pop()
+        backup_path = os.path.join(self.backup_dir, entry["id"])
+        shutil.copy2(backup_path, entry["original_path"])
+        os.remove(backup_path)
+        with open(self.index_file, "w") as f:
+            json.dump(index, f, indent=2)
+
+
+def fill_store(manager, entries, sample):
+    """Bulk-inserts history rows pointing at one blob (the store doesn't care how many there are)."""
+    digest = _hash_file(sample)
+    manager._store_blob(sample, digest)
+    st = os.stat(sample)
+    start = datetime.now() - timedelta(seconds=entries)
+    # 1000 paths over 100 directories, one backup per second of history
+    rows = (
+        (f"/tmp/d{i % 100}/file{i % 1000}.txt", f"file{i % 1000}.txt", (start + timedelta(seconds=i)).isoformat(),
+         digest, st.st_size, 0o644, st.st_mtime)
+        for i in range(entries)
+    )
+    with manager._lock:
+        manager._db.execute("BEGIN")
+        manager._db.executemany(
+            "INSERT INTO backups (original_path, filename, timestamp, blob, size, mode, mtime) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        manager._db.execute("COMMIT")
+
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = os.path.join(tmp, "notes.txt")
+        with open(sample, "wb") as f:
+            f.write(os.urandom(args.size_kb * 1024))
+
+        legacy_dir = os.path.join(tmp, "legacy")
+        os.makedirs(legacy_dir)
+        start = time.perf_counter()
+        legacy = LegacyStore(legacy_dir, args.entries)
+        legacy_fill = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = BackupManager(os.path.join(tmp, "store"))
+        fill_store(store, args.entries, sample)
+        store_fill = time.perf_counter() - start
+
+        def store_round():
+            store.backup_file(sample)
+            store.restore_last()
+
+        def legacy_round():
+            legacy.backup_file(sample)
+            legacy.restore_last()
+
+        # One round of each first, so both run with a warm page cache
+        store_round()
+        legacy_round()
+        rounds = {
+            "store": timed(store_round, args.rounds),
+            "legacy": timed(legacy_round, max(1, args.rounds // 10)),
+        }
+        middle = datetime.now() - timedelta(seconds=args.entries // 2)
+        rounds["find (as of)"] = timed(lambda: store.find("/tmp/d7/file507.txt", middle), args.rounds)
+        rounds["list_backups (dir)"] = timed(lambda: store.list_backups("/tmp/d7"), args.rounds)
+        blobs = sum(len(files) for _, _, files in os.walk(store.objects_dir))
+        store.close()
+
+    print(f"{args.entries} history entries, {args.size_kb} KB file "
+          f"(fill: legacy {legacy_fill:.1f}s, store {store_fill:.1f}s)")
+    print(f"{'':<10}{'backup+restore ms':>20}")
+    print(f"{'legacy':<10}{rounds['legacy']:>20.2f}")
+    print(f"{'store':<10}{rounds['store']:>20.2f}")
+    print(f"speedup: {rounds['legacy'] / rounds['store']:.1f}x, blobs in the store: {blobs}")
+    print(f"{'find (as of)':<20}{rounds['find (as of)']:>10.3f} ms")
+    print(f"{'list_backups (dir)':<20}{rounds['list_backups (dir)']:>10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
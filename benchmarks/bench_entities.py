@@ -0,0 +1,86 @@
+"""
+Entity extraction throughput: the old regex cascade vs. the intent-selected grammar.
+
+    python benchmarks/bench_entities.py [--sentences 5000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_parser import detect_intent, extract_entities  # noqa: E402
+
+TEMPLATES = [
+    "create folder {a}", "make folder '{a} {b}'", "delete file {a}.txt", "remove file \"{a} {b}.md\"",
+    "move file {a}.log to {b}", "copy file {a}.csv to {b}/{a}", "rename file {a}.py to {b}.py",
+    "go to {a}/{b}", "upgrade {a}", "kill process {a}", "end task {a}.exe", "create file {a}.json",
+]
+WORDS = ["Reports", "notes", "Q3_Budget", "photos", "build", "chrome", "numpy", "Archive", "tmp",
+         "README", "src", "Desktop", "requests", "node_modules", "Invoice-2024"]
+
+
+def legacy_extract(sentence):
+    """Copy of the cascade intent_parser.extract_entities used to run."""
+    sentence = sentence.lower()
+    entities = {"name": None, "source": None, "destination": None}
+    move_match = re.search(r'(?:move|copy|rename)\s+(.*?)\s+to\s+(.*)', sentence)
+    if move_match:
+        entities["source"] = move_match.group(1).strip()
+        entities["destination"] = move_match.group(2).strip()
+        return entities
+    quoted = re.search(r'["\'](.*?)["\']', sentence)
+    if quoted:
+        start, end = quoted.span()
+        entities["name"] = sentence[start:end]
+        return entities
+    match = re.search(r'(?:file|folder|dir|directory)\s+([a-zA-Z0-9_\-\.]+(?:\.[a-z]+)?)', sentence)
+    if match:
+        entities["name"] = match.group(1)
+    upgrade_match = re.search(r'(?:upgrade|update|install update)\s+([a-zA-Z0-9_\-\.]+)', sentence)
+    if upgrade_match:
+        entities["name"] = upgrade_match.group(1).strip()
+        return entities
+    kill_match = re.search(r'(?:kill process|stop program|end task|terminate|kill|stop)\s+(.*)', sentence)
+    if kill_match:
+        entities["name"] = kill_match.group(1).strip()
+        return entities
+    return entities
+
+
+def corpus(count, seed=3):
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(a=rng.choice(WORDS), b=rng.choice(WORDS)) for _ in range(count)]
+
+
+def bench(label, fn, items, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            fn(*item)
+    elapsed = time.perf_counter() - start
+    rate = len(items) * rounds / elapsed
+    print(f"{label:<30} {rate:>12,.0f} sentences/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    sentences = corpus(args.sentences)
+    # Routing happens before extraction in the REPL, so the intent is an input here
+    with_intents = [(s, detect_intent(s)) for s in sentences]
+
+    old = bench("legacy cascade", legacy_extract, [(s,) for s in sentences], args.rounds)
+    new = bench("intent-selected grammar", extract_entities, with_intents, args.rounds)
+    print(f"\nspeedup: {new / old:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
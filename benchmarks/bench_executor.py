@@ -0,0 +1,54 @@
+"""
+Executor throughput: a fresh `shell=True` process per command vs. the persistent shell session.
+
+    python benchmarks/bench_executor.py [--commands 300]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shell_session import ShellSession  # noqa: E402
+
+COMMANDS = ["true", "echo hello", "pwd", "ls / > /dev/null", "echo err >&2"]
+
+
+def legacy_execute(command):
+    """What executor.execute did before the shell session existed."""
+    result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return result.stdout.decode("utf-8", errors="ignore"), result.stderr.decode("utf-8", errors="ignore")
+
+
+def bench(label, fn, count):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(COMMANDS[i % len(COMMANDS)])
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed
+    print(f"{label:<28} {rate:>10,.0f} commands/s   ({elapsed * 1000 / count:.2f} ms/command)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commands", type=int, default=300)
+    args = parser.parse_args()
+
+    if os.name != "posix":
+        print("The persistent shell session is POSIX-only.")
+        return
+
+    session = ShellSession()
+    session.run("true")  # spawn outside the timed loop
+
+    old = bench("subprocess per command", legacy_execute, args.commands)
+    new = bench("persistent shell session", session.run, args.commands)
+    session.close()
+    print(f"\nspeedup: {new / old:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+History search latency over a large synthetic history.
+
+    python benchmarks/bench_history.py [--rows 1000000] [--rounds 20] [--db /tmp/bench_history.db]
+
+The history is generated once into --db (reused on later runs with the same
+--rows), spread over the last 365 days with ~5% failures.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import History  # noqa: E402
+
+COMMANDS = [
+    ("list files", "LIST_FILES", "ls"), ("where am i", "CURRENT_DIR", "pwd"),
+    ("git status", "RAW_COMMAND", "git status"), ("git push origin main", "RAW_COMMAND", "git push origin main"),
+    ("docker ps", "RAW_COMMAND", "docker ps"), ("docker compose up -d", "RAW_COMMAND", "docker compose up -d"),
+    ("install package requests", "UPGRADE_PACKAGE", "pip install --upgrade requests"),
+    ("delete file notes.txt", "DELETE_FILE", "rm notes.txt"), ("check ram", "CHECK_RAM", "free -h"),
+    ("npm run build", "RAW_COMMAND", "npm run build"), ("make test", "RAW_COMMAND", "make test"),
+]
+
+QUERIES = [
+    "history",
+    "history docker failed last week",
+    "history git push",
+    "history failed today",
+    "history pip errors in the last 3 days",
+    "history npm build last 100",
+    "history kubectl",
+]
+
+
+def fill(history, rows):
+    rng = random.Random(7)
+    start = datetime.now() - timedelta(days=365)
+    step = 365 * 86400 / rows
+    batch = []
+    for i in range(rows):
+        text, intent, command = rng.choice(COMMANDS)
+        failed = rng.random() < 0.05
+        batch.append({
+            "ts": (start + timedelta(seconds=i * step)).isoformat(timespec="milliseconds"),
+            "input": f"{text} {i % 97}" if intent == "RAW_COMMAND" else text,
+            "intent": intent, "command": command,
+            "status": "ERROR" if failed else "SUCCESS",
+            "message": "command not found" if failed else "OK",
+            "elapsed_ms": round(rng.uniform(1, 500), 2), "exit_code": 1 if failed else 0,
+        })
+        if len(batch) == 50_000:
+            history.add_records(batch)
+            batch = []
+    if batch:
+        history.add_records(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--db", default=os.path.join("/tmp" if os.name == "posix" else ".", "bench_history.db"))
+    args = parser.parse_args()
+
+    history = History(args.db)
+    if history.count() != args.rows:
+        history.close()
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        history = History(args.db)
+        start = time.perf_counter()
+        fill(history, args.rows)
+        print(f"indexed {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'query':<48}{'rows':>6}{'ms':>10}")
+    for text in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            _, rows = history.search(text)
+        elapsed = (time.perf_counter() - start) / args.rounds * 1000
+        print(f"{text:<48}{len(rows):>6}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+System metrics latency: shelling out to free/top/df/ps vs. reading /proc in-process.
+
+    python benchmarks/bench_metrics.py [--rounds 50]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sys_metrics  # noqa: E402
+
+# What command_mapper runs for each intent on Linux
+LEGACY_COMMANDS = {
+    "CHECK_RAM": "free -h",
+    "CHECK_CPU": "top -bn1 | grep 'Cpu(s)'",
+    "CHECK_DISK": "df -h",
+    "LIST_PROCESSES": "ps aux",
+}
+
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    if not sys_metrics.available():
+        sys.exit("/proc not available on this system")
+    sys_metrics.prime()
+
+    print(f"{'intent':<16}{'subprocess ms':>15}{'/proc ms':>12}{'speedup':>10}")
+    for intent, command in LEGACY_COMMANDS.items():
+        legacy = timed(lambda: subprocess.run(command, shell=True, capture_output=True), args.rounds)
+        native = timed(lambda: sys_metrics.query(intent), args.rounds)
+        print(f"{intent:<16}{legacy:>15.2f}{native:>12.3f}{legacy / native:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Router benchmark: the old multi-scan routing loops vs. the single-pass automaton.
+
+    python benchmarks/bench_router.py [--phrases 3000] [--inputs 2000]
+
+A synthetic phrase bank of a few thousand phrases is added on top of
+intents.json, then the same inputs are routed both ways.
+"""
+import argparse
+import os
+import random
+import shlex
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from executor import INTERACTIVE_COMMANDS  # noqa: E402
+from input_router import InputRouter, NL_KEYWORDS  # noqa: E402
+from intent_parser import BASE_INTENTS  # noqa: E402
+
+VERBS = ["open", "close", "show", "list", "sync", "archive", "scan", "rotate", "purge", "index",
+         "mount", "unmount", "compress", "export", "import", "audit", "trace", "restart"]
+NOUNS = ["logs", "backups", "images", "containers", "volumes", "cache", "keys", "tokens",
+         "reports", "users", "groups", "ports", "routes", "queues", "jobs", "tables", "builds"]
+QUALIFIERS = ["", "all", "old", "remote", "local", "stale", "failed", "pending", "large"]
+
+
+def synthetic_intents(count, seed=7):
+    rng = random.Random(seed)
+    intents = {}
+    seen = set()
+    while len(seen) < count:
+        phrase = " ".join(w for w in (rng.choice(VERBS), rng.choice(QUALIFIERS), rng.choice(NOUNS)) if w)
+        phrase += f" v{len(seen) // 50}"
+        if phrase in seen:
+            continue
+        seen.add(phrase)
+        intents.setdefault(f"SYNTH_{len(seen) // 3}", []).append(phrase)
+    return intents
+
+
+def make_inputs(phrase_bank, count, seed=11):
+    rng = random.Random(seed)
+    phrases = [p for ps in phrase_bank.values() for p in ps]
+    fillers = ["please", "now", "for me", "in this folder", "quickly", "ls -la", "git status"]
+    inputs = []
+    for i in range(count):
+        if i % 4 == 0:
+            inputs.append(rng.choice(fillers) + " " + rng.choice(fillers))
+        else:
+            inputs.append(f"{rng.choice(fillers)} {rng.choice(phrases)} {rng.choice(fillers)}")
+    return inputs
+
+
+def legacy_route(user_input, intents):
+    """Copy of the routing that used to live in main.run_ui + intent_parser.detect_intent."""
+    lower = user_input.lower()
+    if lower.startswith("mode") or "change mode" in lower or "switch" in lower or "set mode" in lower:
+        return "MODE", None
+    if lower.startswith("explain"):
+        return "EXPLAIN", None
+    if lower.startswith(("teach me", "learn", "how to")):
+        return "LEARN", None
+    try:
+        parts = shlex.split(user_input)
+        if parts and parts[0].lower() in INTERACTIVE_COMMANDS:
+            return "INTERACTIVE", None
+    except Exception:
+        pass
+    if any(k in lower for k in NL_KEYWORDS):
+        sentence = user_input.lower()
+        for intent, phrases in intents.items():
+            for phrase in phrases:
+                if phrase in sentence:
+                    return "NL", intent
+        return "NL", "UNKNOWN"
+    return "RAW", None
+
+
+def bench(label, fn, inputs, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in inputs:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    ops = len(inputs) * rounds / elapsed
+    print(f"{label:<28} {ops:>12,.0f} inputs/s   ({elapsed * 1e6 / (len(inputs) * rounds):.1f} us/input)")
+    return ops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--phrases", type=int, default=3000)
+    parser.add_argument("--inputs", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    intents = dict(BASE_INTENTS)
+    intents.update(synthetic_intents(args.phrases))
+    inputs = make_inputs(intents, args.inputs)
+    total = sum(len(p) for p in intents.values())
+
+    t0 = time.perf_counter()
+    router = InputRouter(intents)
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"{total} phrases, {len(inputs)} inputs, automaton built in {build_ms:.1f} ms\n")
+
+    old = bench("legacy loops", lambda t: legacy_route(t, intents), inputs, args.rounds)
+    new = bench("single-pass automaton", router.route, inputs, args.rounds)
+    print(f"\nspeedup: {new / old:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
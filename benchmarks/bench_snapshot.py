@@ -0,0 +1,71 @@
+"""
+Folder snapshot throughput: serial shutil.copytree vs. BackupManager.snapshot_dir.
+
+    python benchmarks/bench_snapshot.py [--files 2000] [--size-kb 32] [--workers 8]
+
+Builds a synthetic tree (half text-like, half random bytes) in a temp
+directory and snapshots it with every compression setting.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backup_manager import BackupManager  # noqa: E402
+
+WORDS = b"the quick brown fox jumps over lazy dog log error warning info debug".split()
+
+
+def build_tree(root, files, size):
+    rng = random.Random(42)
+    total = 0
+    for i in range(files):
+        folder = os.path.join(root, f"d{i % 40}", f"s{i % 7}")
+        os.makedirs(folder, exist_ok=True)
+        if i % 2:
+            data = os.urandom(size)
+        else:
+            data = b" ".join(rng.choice(WORDS) for _ in range(size // 4))[:size]
+        with open(os.path.join(folder, f"f{i}.dat"), "wb") as f:
+            f.write(data)
+        total += len(data)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = os.path.join(tmp, "tree")
+        total = build_tree(tree, args.files, args.size_kb * 1024)
+        print(f"{args.files} files, {total / 1e6:.1f} MB")
+        print(f"{'method':<28}{'seconds':>10}{'MB/s':>10}{'stored MB':>12}")
+
+        start = time.perf_counter()
+        shutil.copytree(tree, os.path.join(tmp, "copy"))
+        seconds = time.perf_counter() - start
+        print(f"{'copytree (serial)':<28}{seconds:>10.2f}{total / 1e6 / seconds:>10.1f}{total / 1e6:>12.1f}")
+
+        for compression in [None, "zlib", "lzma"]:
+            store = os.path.join(tmp, f"store-{compression}")
+            manager = BackupManager(store, compression=compression, workers=args.workers)
+            stats = manager.snapshot_dir(tree)
+            manager.close()
+            stored = sum(
+                os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(manager.objects_dir) for f in fs
+            )
+            label = f"snapshot {compression or 'raw'}"
+            print(f"{label:<28}{stats['seconds']:>10.2f}{stats['mb_per_s']:>10.1f}{stored / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold start: time from `python main.py` to the first prompt, plus the slowest imports.
+
+    python benchmarks/bench_startup.py [--runs 10] [--target-ms 150] [--top 15]
+
+Time-to-first-prompt is measured on a pseudo-terminal (POSIX only) until the
+"➜ BEGINNER" prompt is drawn; the import breakdown comes from
+`python -X importtime -c "import main"`. Exits 1 if the median misses the target.
+"""
+import argparse
+import os
+import pty
+import select
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = "➜ BEGINNER".encode("utf-8")
+
+
+def time_to_prompt(timeout=10.0):
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.chdir(ROOT)
+        # Point the AI probe at a closed port so it can't touch a real server
+        os.environ["OLLAMA_HOST"] = "http://127.0.0.1:9"
+        os.execv(sys.executable, [sys.executable, "main.py"])
+
+    start = time.perf_counter()
+    seen = b""
+    elapsed = None
+    try:
+        while time.perf_counter() - start < timeout:
+            ready, _, _ = select.select([fd], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                chunk = os.read(fd, 4096)
+            except OSError:
+                break
+            if not chunk:
+                break
+            seen += chunk
+            if PROMPT in seen[-4096:]:
+                elapsed = time.perf_counter() - start
+                break
+        if elapsed is not None:
+            os.write(fd, b"exit\n")
+            time.sleep(0.05)
+    finally:
+        try:
+            os.kill(pid, 9)
+        except OSError:
+            pass
+        os.waitpid(pid, 0)
+        os.close(fd)
+    return elapsed
+
+
+def bare_interpreter(runs):
+    """Median start-up of `python -c pass`: the floor nothing in main.py can beat."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def import_breakdown(top):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        if self_us.isdigit():
+            rows.append((int(cumulative_us), int(self_us), name))
+    total = next((row for row in reversed(rows) if row[2] == "main"), None)
+    rows.sort(reverse=True)
+    return total, rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=150.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total, rows = import_breakdown(args.top)
+    if total:
+        print(f"import main: {total[0] / 1000:.1f} ms (with -X importtime overhead)")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative, self_us, name in rows:
+        print(f"{cumulative / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+    time_to_prompt()  # warm the OS page cache and __pycache__
+    samples = [t for t in (time_to_prompt() for _ in range(args.runs)) if t is not None]
+    if not samples:
+        sys.exit("The prompt never appeared")
+
+    median = statistics.median(samples) * 1000
+    baseline = bare_interpreter(args.runs)
+    print(f"\ntime to first prompt: median {median:.1f} ms, min {min(samples) * 1000:.1f} ms, "
+          f"max {max(samples) * 1000:.1f} ms over {len(samples)} runs "
+          f"(bare interpreter: {baseline * 1000:.1f} ms)")
+    print(f"target {args.target_ms:.0f} ms: {'OK' if median <= args.target_ms else 'MISSED'}")
+    sys.exit(0 if median <= args.target_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Microbenchmarks for the per-input hot paths, with stored baselines.
+
+    python benchmarks/microbench.py                  # run and compare against benchmarks/baselines.json
+    python benchmarks/microbench.py --save           # run and store the results as the new baseline
+    python benchmarks/microbench.py -k format --quick --threshold 0.3
+
+Every case runs a function over a fixed corpus from benchmarks/corpora:
+3000 recorded-style NL sentences, plus captured ps aux / df -h / free -h /
+wmic / tasklist outputs. Synthetic huge outputs (tens of thousands of rows)
+are built from those captures. Each case reports ops/sec (best of
+--rounds), its speed relative to a fixed pure-Python reference loop timed
+alongside it ("vs ref", median over the rounds) and the peak bytes one
+call allocates (tracemalloc, averaged over the corpus).
+
+The exit status is 1 when a case's relative speed drops, or its
+allocation grows, past --threshold of the baseline; a case that looks
+slower is measured a second time before it counts. Comparing relative
+speed rather than raw ops/sec keeps a busy or throttled machine from
+reading as a regression, but baselines are still best saved on the
+machine that checks them; the file records which machine that was.
+
+Nothing here talks to Ollama. Learned phrases are isolated in a temp
+file, and tracing is switched off, so user state and instrumentation
+don't skew the numbers.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+
+config.TRACE_ENABLED = False
+_scratch = tempfile.TemporaryDirectory(prefix="nl-microbench-")  # removed at exit
+config.PHRASE_MEMORY_FILE = os.path.join(_scratch.name, "learned_phrases.json")
+
+from intent_parser import detect_intent, route_input, extract_entities, classify_intent  # noqa: E402
+from command_mapper import map_command  # noqa: E402
+from safety import is_safe  # noqa: E402
+from output_formatter import format_output  # noqa: E402
+
+CORPORA = os.path.join(ROOT, "benchmarks", "corpora")
+BASELINES = os.path.join(ROOT, "benchmarks", "baselines.json")
+ALLOC_SLACK = 256  # bytes; tracemalloc noise below this never counts as a regression
+
+
+def corpus(name):
+    with open(os.path.join(CORPORA, name), "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def grow(text, rows, header_lines=1, newline="\n"):
+    """A capture repeated up to `rows` data rows, keeping its header (a "huge" output)."""
+    lines = text.strip("\r\n").split(newline)
+    header, body = lines[:header_lines], lines[header_lines:]
+    return newline.join(header + [body[i % len(body)] for i in range(rows)]) + newline
+
+
+def build_cases():
+    """{name: (function, [argument tuples])}: each tuple is one op."""
+    sentences = [s for s in corpus("sentences.txt").splitlines() if s.strip()]
+    with_intents = [(s, detect_intent(s)) for s in sentences]
+    entities = [(s, i, extract_entities(s, i)) for s, i in with_intents]
+    unknown = [s for s, i in with_intents if i == "UNKNOWN"]
+    names = [e["name"] or e["source"] or "" for _, _, e in entities]
+
+    ps, df, free = corpus("ps_aux.txt"), corpus("df_h.txt"), corpus("free_h.txt")
+    wmic_os, wmic_cpu, wmic_disk = corpus("wmic_os.txt"), corpus("wmic_cpu.txt"), corpus("wmic_logicaldisk.txt")
+    tasklist = corpus("tasklist.txt")
+
+    return {
+        "route_input": (route_input, [(s,) for s in sentences]),
+        "detect_intent": (detect_intent, [(s,) for s in sentences]),
+        "extract_entities": (extract_entities, with_intents),
+        "classify_intent": (classify_intent, [(s,) for s in unknown[:300]]),
+        "map_command[LINUX]": (map_command, [(i, "LINUX", e) for _, i, e in entities]),
+        "map_command[WINDOWS]": (map_command, [(i, "WINDOWS", e) for _, i, e in entities]),
+        "is_safe": (is_safe, [(n,) for n in names]),
+        "format_output[ps aux]": (format_output, [("LIST_PROCESSES", ps, "LINUX")]),
+        "format_output[df -h]": (format_output, [("CHECK_DISK", df, "LINUX")]),
+        "format_output[free -h]": (format_output, [("CHECK_RAM", free, "LINUX")]),
+        "format_output[wmic os]": (format_output, [("CHECK_RAM", wmic_os, "WINDOWS")]),
+        "format_output[wmic cpu]": (format_output, [("CHECK_CPU", wmic_cpu, "WINDOWS")]),
+        "format_output[wmic disk]": (format_output, [("CHECK_DISK", wmic_disk, "WINDOWS")]),
+        "format_output[tasklist]": (format_output, [("LIST_PROCESSES", tasklist, "WINDOWS")]),
+        "format_output[ps aux 50k]": (format_output, [("LIST_PROCESSES", grow(ps, 50_000), "LINUX")]),
+        "format_output[df -h 20k]": (format_output, [("CHECK_DISK", grow(df, 20_000), "LINUX")]),
+        "format_output[tasklist 50k]": (format_output, [("LIST_PROCESSES", grow(tasklist, 50_000, 3, "\r\n"), "WINDOWS")]),
+    }
+
+
+def reference():
+    """A fixed pure-Python workload, timed next to every case as a yardstick for the machine's current speed."""
+    d = {}
+    for i in range(200):
+        d[str(i)] = i * 2
+    return sum(d.values())
+
+
+def rate(fn, calls, seconds):
+    """Calls per second over whole passes of `calls`, for at least `seconds`."""
+    done = 0
+    start = time.perf_counter()
+    while True:
+        for args in calls:
+            fn(*args)
+        done += len(calls)
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return done / elapsed
+
+
+def measure(fn, calls, rounds, min_seconds):
+    """
+    (ops/sec, relative speed, peak bytes allocated per call). Each round times
+    the case and then the reference workload; the relative speed (median of
+    the per-round ratios) cancels out a machine that is slower for a while,
+    which raw ops/sec on a shared or throttled CPU does not.
+    """
+    fn(*calls[0])  # first-call setup (imports, lazily built tables) isn't the hot path
+    best, ratios = 0.0, []
+    for _ in range(rounds):
+        ops = rate(fn, calls, min_seconds)
+        ratios.append(ops / rate(reference, [()], min_seconds / 2))
+        best = max(best, ops)
+
+    tracemalloc.start()
+    peaks = 0
+    for args in calls:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn(*args)
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return best, statistics.median(ratios), peaks / len(calls)
+
+
+def machine():
+    return f"{platform.node()} {platform.machine()} {platform.python_implementation()} {platform.python_version()}"
+
+
+def compare(name, result, baseline, threshold):
+    """Regression messages for one case (empty when it is within the threshold)."""
+    problems = []
+    if result["relative"] < baseline["relative"] * (1 - threshold):
+        problems.append(f"{name}: {result['relative'] / baseline['relative'] - 1:+.0%} relative speed "
+                        f"({result['ops_per_sec']:,.0f} ops/s, baseline {baseline['ops_per_sec']:,.0f})")
+    if result["peak_bytes"] > baseline["peak_bytes"] * (1 + threshold) + ALLOC_SLACK:
+        problems.append(f"{name}: {result['peak_bytes']:,.0f} B/op vs {baseline['peak_bytes']:,.0f} baseline")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", dest="pattern", help="only cases whose name matches this regex")
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per round")
+    parser.add_argument("--quick", action="store_true", help="3 rounds of 0.05 s (smoke run)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown / extra allocation (0.25 = 25%%)")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--baselines", default=BASELINES)
+    args = parser.parse_args()
+    if args.quick:
+        args.rounds, args.min_time = 3, 0.05
+
+    try:
+        with open(args.baselines, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {"machine": None, "cases": {}}
+
+    cases = build_cases()
+    if args.pattern:
+        cases = {name: case for name, case in cases.items() if re.search(args.pattern, name)}
+
+    print(f"{'case':<30}{'ops/sec':>14}{'vs ref':>10}{'B/op':>12}{'baseline':>10}{'change':>9}")
+    results, problems = {}, []
+    for name, (fn, calls) in cases.items():
+        ops, relative, peak = measure(fn, calls, args.rounds, args.min_time)
+        results[name] = {"ops_per_sec": round(ops, 1), "relative": round(relative, 5), "peak_bytes": round(peak)}
+        baseline = stored["cases"].get(name)
+        if baseline and not args.save and compare(name, results[name], baseline, args.threshold):
+            # A regression has to show up twice before it counts
+            again = measure(fn, calls, args.rounds, args.min_time)
+            ops, relative = max(ops, again[0]), max(relative, again[1])
+            results[name].update(ops_per_sec=round(ops, 1), relative=round(relative, 5))
+        change = f"{relative / baseline['relative'] - 1:+.0%}" if baseline else "new"
+        base_rel = f"{baseline['relative']:.4g}" if baseline else "-"
+        print(f"{name:<30}{ops:>14,.0f}{relative:>10.4g}{peak:>12,.0f}{base_rel:>10}{change:>9}")
+        if baseline and not args.save:
+            problems += compare(name, results[name], baseline, args.threshold)
+
+    if args.save:
+        stored["cases"].update(results)
+        stored["machine"] = machine()
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {os.path.relpath(args.baselines)}")
+        return 0
+
+    if stored["machine"] and stored["machine"] != machine():
+        print(f"note: baseline was saved on {stored['machine']}; re-run with --save on this machine for a fair comparison")
+    if problems:
+        print(f"\n{len(problems)} regression(s) past {args.threshold:.0%}:")
+        for problem in problems:
+            print("  " + problem)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
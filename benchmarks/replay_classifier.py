@@ -0,0 +1,107 @@
+"""
+LLM calls the nearest-phrase classifier saves, replayed over past inputs.
+
+    python benchmarks/replay_classifier.py [--db logs/history.db] [--sample]
+
+Every natural-language input in the command history goes through the
+same tiers as in the REPL: exact phrase, learned phrasing, classifier,
+LLM. The script counts where each one was resolved. When the history
+also recorded the intent that was acted on, it also reports how often
+the classifier agreed with it. Nothing is executed, and the model is
+never called. --sample replays a built-in set of paraphrases instead,
+which is useful on a fresh install.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import HISTORY_DB  # noqa: E402
+from intent_parser import route_input, match_learned, classify_intent, confident_guess  # noqa: E402
+
+# Paraphrases no intents.json phrase matches as written: (sentence, intent a person would mean)
+SAMPLE = [
+    ("list all the files here", "LIST_FILES"),
+    ("show the files", "LIST_FILES"),
+    ("show me running programs", "LIST_PROCESSES"),
+    ("show the processes", "LIST_PROCESSES"),
+    ("what processes are running", "LIST_PROCESSES"),
+    ("make a new directory called reports", "CREATE_FOLDER"),
+    ("make a directory reports", "CREATE_FOLDER"),
+    ("create a new folder reports", "CREATE_FOLDER"),
+    ("remove the directory named logs", "DELETE_FOLDER"),
+    ("delete the file notes.txt", "DELETE_FILE"),
+    ("how much space is left on the disk", "CHECK_DISK"),
+    ("show disk usage", "CHECK_DISK"),
+    ("what's the cpu load", "CHECK_CPU"),
+    ("check the ram", "CHECK_RAM"),
+    ("show my ip", "CHECK_IP"),
+    ("what's the time", "CHECK_TIME"),
+]
+
+
+def history_inputs(db_path):
+    """(input, logged intent) for every history row, oldest first (the legacy text log is imported first)."""
+    from history import History
+    history = History(db_path)
+    history.import_log()
+    with history._lock:
+        rows = history._db.execute("SELECT input, intent FROM history ORDER BY id").fetchall()
+    history.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=HISTORY_DB)
+    parser.add_argument("--sample", action="store_true", help="replay the built-in paraphrases")
+    args = parser.parse_args()
+
+    rows = SAMPLE if args.sample else history_inputs(args.db)
+    tiers = {"phrase": 0, "learned": 0, "classifier": 0, "llm": 0}
+    agreed = judged = 0
+    seconds = 0.0
+    misses = []
+
+    classify_intent("")  # build the matrix outside the timing
+    for text, logged in rows:
+        route = route_input(text)
+        if route.route != "NL":
+            continue
+        if route.intent != "UNKNOWN":
+            tiers["phrase"] += 1
+            continue
+        if match_learned(text, record=False):
+            tiers["learned"] += 1
+            continue
+
+        start = time.perf_counter()
+        guess = confident_guess(text)
+        seconds += time.perf_counter() - start
+        if guess:
+            tiers["classifier"] += 1
+            if logged and logged not in ("UNKNOWN", "RAW_COMMAND"):
+                judged += 1
+                agreed += guess.intent == logged
+                if guess.intent != logged:
+                    misses.append((text, guess.intent, logged))
+        else:
+            tiers["llm"] += 1
+
+    unmatched = tiers["classifier"] + tiers["llm"]
+    print(f"{sum(tiers.values())} natural-language inputs replayed ({len(rows)} in total)")
+    for tier, count in tiers.items():
+        print(f"  {tier:<12}{count:>8}")
+    if unmatched:
+        print(f"LLM calls saved: {tiers['classifier']} of {unmatched} "
+              f"({tiers['classifier'] / unmatched:.0%}), {seconds / unmatched * 1e6:.0f} µs per classification")
+    if judged:
+        print(f"classifier agreed with the recorded intent on {agreed} of {judged} ({agreed / judged:.0%})")
+        for text, guessed, logged in misses[:10]:
+            print(f"  {text!r}: {guessed}, recorded {logged}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,121 +1,167 @@
-from plugin_loader import load_plugins
+import shlex
+import string
+import threading
+from functools import lru_cache
+from plugin_loader import get_registry
 
-PLUGINS = load_plugins()
+ANY_OS = "*"
 
-def map_command(intent, os_type, e):
-    # 🔌 Plugin commands
-    for plugin in PLUGINS:
-        if intent in plugin.intents:
-            return plugin.execute(intent, e, os_type)
+# Core commands per intent and OS. {name}, {source} and {destination} are
+# filled from the entities, quoted for the target shell; an intent whose
+# template needs an entity the parser didn't find doesn't map.
+CORE_COMMANDS = {
+    "LIST_FILES": {"WINDOWS": "dir", "LINUX": "ls"},
+    "CURRENT_DIR": {"WINDOWS": "cd", "LINUX": "pwd"},
+    "GO_BACK": {"WINDOWS": "cd ..", "LINUX": "cd .."},
+    "GO_HOME": {"WINDOWS": "cd %USERPROFILE%", "LINUX": "cd ~"},
+    "SYSTEM_INFO": {"WINDOWS": "systeminfo", "LINUX": "uname -a"},
+    "WHOAMI": {"WINDOWS": "whoami", "LINUX": "whoami"},
+    "GO_TO": {"WINDOWS": "cd {name}", "LINUX": "cd {name}"},
+    "CREATE_FOLDER": {"WINDOWS": "mkdir {name}", "LINUX": "mkdir {name}"},
+    "DELETE_FOLDER": {"WINDOWS": "rmdir /s /q {name}", "LINUX": "rm -rf {name}"},
+    "CREATE_FILE": {"WINDOWS": "type nul > {name}", "LINUX": "touch {name}"},
+    "DELETE_FILE": {"WINDOWS": "del {name}", "LINUX": "rm {name}"},
+    "RENAME_FILE": {"WINDOWS": "ren {source} {destination}", "LINUX": "mv {source} {destination}"},
+    "MOVE_FILE": {"WINDOWS": "move {source} {destination}", "LINUX": "mv {source} {destination}"},
+    "COPY_FILE": {"WINDOWS": "copy {source} {destination}", "LINUX": "cp {source} {destination}"},
+    "CAT_FILE": {"WINDOWS": "type {name}", "LINUX": "cat {name}"},
+    "UPGRADE_PIP": {"WINDOWS": "python -m pip install --upgrade pip", "LINUX": "python3 -m pip install --upgrade pip"},
+    "UPGRADE_PACKAGE": {"WINDOWS": "pip install --upgrade {name}", "LINUX": "pip install --upgrade {name}"},
+
+    # System & Network
+    "CHECK_RAM": {"WINDOWS": "wmic OS get FreePhysicalMemory,TotalVisibleMemorySize /Value", "LINUX": "free -h"},
+    "CHECK_CPU": {"WINDOWS": "wmic cpu get loadpercentage", "LINUX": "top -bn1 | grep 'Cpu(s)'"},
+    "CHECK_DISK": {"WINDOWS": "wmic logicaldisk get size,freespace,caption", "LINUX": "df -h"},
+    "CHECK_IP": {"WINDOWS": "ipconfig", "LINUX": "hostname -I"},
+    "CHECK_INTERNET": {"WINDOWS": "ping 8.8.8.8 -n 1", "LINUX": "ping -c 1 8.8.8.8"},
+    "LIST_PROCESSES": {"WINDOWS": "tasklist", "LINUX": "ps aux"},
+    "KILL_PROCESS": {"WINDOWS": "taskkill /IM {name} /F", "LINUX": "pkill -f {name}"},
+    "CLEAR_SCREEN": {"WINDOWS": "cls", "LINUX": "clear"},
+}
 
+# Characters an argument can be made of and still go into the command
+# unquoted (most file names are). `value.strip(chars)` is empty exactly
+# when every character of `value` is one of them.
+_POSIX_PLAIN = string.ascii_letters + string.digits + "_@%+=:,./-"
+_WINDOWS_PLAIN = string.ascii_letters + string.digits + "_@+:./\\-"
 
-    # Core commands
+@lru_cache(maxsize=None)
+def _parse(template):
+    """`template` as (literal text, field name or None) pairs."""
+    return tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(template))
+
+def _quote(value, os_type):
+    """`value` as one shell argument for `os_type`, or None when it can't be a file/process name."""
+    if not isinstance(value, str):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        value = str(value)
+    if not value.strip(_WINDOWS_PLAIN if os_type == "WINDOWS" else _POSIX_PLAIN):
+        return value or None  # most names: nothing to quote
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        value = value[1:-1]  # quoted by the user (extract_entities keeps the quotes): re-quoted below
+    if not value or "\0" in value or "\r" in value or "\n" in value:
+        return None
     if os_type == "WINDOWS":
-        if intent == "LIST_FILES":
-            return "dir"
-        if intent == "CURRENT_DIR":
-            return "cd"
-        if intent == "GO_BACK":
-            return "cd .."
-        if intent == "GO_HOME":
-            return "cd %USERPROFILE%"
-        if intent == "SYSTEM_INFO":
-            return "systeminfo"
-        if intent == "WHOAMI":
-            return "whoami"
-        if intent == "GO_TO" and e["name"]:
-            return f"cd {e['name']}"
-        if intent == "CREATE_FOLDER" and e["name"]:
-            return f"mkdir {e['name']}"
-        if intent == "DELETE_FOLDER" and e["name"]:
-            return f"rmdir /s /q {e['name']}"
-        if intent == "CREATE_FILE" and e["name"]:
-            return f"type nul > {e['name']}"
-        if intent == "DELETE_FILE" and e["name"]:
-            return f"del {e['name']}"
-        if intent == "RENAME_FILE" and e["source"] and e["destination"]:
-            return f"ren {e['source']} {e['destination']}"
-        if intent == "MOVE_FILE" and e["source"] and e["destination"]:
-            return f"move {e['source']} {e['destination']}"
-        if intent == "COPY_FILE" and e["source"] and e["destination"]:
-            return f"copy {e['source']} {e['destination']}"
-        if intent == "CAT_FILE" and e["name"]:
-            return f"type {e['name']}"
-        if intent == "UPGRADE_PIP":
-            return "python -m pip install --upgrade pip"
-        if intent == "UPGRADE_PACKAGE" and e["name"]:
-            return f"pip install --upgrade {e['name']}"
-
-        # System & Network
-        if intent == "CHECK_RAM":
-            return "wmic OS get FreePhysicalMemory,TotalVisibleMemorySize /Value"
-        if intent == "CHECK_CPU":
-            return "wmic cpu get loadpercentage"
-        if intent == "CHECK_DISK":
-            return "wmic logicaldisk get size,freespace,caption"
-        if intent == "CHECK_IP":
-            return "ipconfig"
-        if intent == "CHECK_INTERNET":
-            return "ping 8.8.8.8 -n 1"
-        if intent == "LIST_PROCESSES":
-            return "tasklist"
-        if intent == "KILL_PROCESS" and e["name"]:
-            return f"taskkill /IM {e['name']} /F"
-        if intent == "CLEAR_SCREEN":
-            return "cls"
-
-    if os_type == "LINUX":
-        if intent == "LIST_FILES":
-            return "ls"
-        if intent == "CURRENT_DIR":
-            return "pwd"
-        if intent == "GO_BACK":
-            return "cd .."
-        if intent == "GO_HOME":
-            return "cd ~"
-        if intent == "SYSTEM_INFO":
-            return "uname -a"
-        if intent == "WHOAMI":
-            return "whoami"
-        if intent == "GO_TO" and e["name"]:
-            return f"cd {e['name']}"
-        if intent == "CREATE_FOLDER" and e["name"]:
-            return f"mkdir {e['name']}"
-        if intent == "DELETE_FOLDER" and e["name"]:
-            return f"rm -rf {e['name']}"
-        if intent == "CREATE_FILE" and e["name"]:
-            return f"touch {e['name']}"
-        if intent == "DELETE_FILE" and e["name"]:
-            return f"rm {e['name']}"
-        if intent == "RENAME_FILE" and e["source"] and e["destination"]:
-            return f"mv {e['source']} {e['destination']}"
-        if intent == "MOVE_FILE" and e["source"] and e["destination"]:
-            return f"mv {e['source']} {e['destination']}"
-        if intent == "COPY_FILE" and e["source"] and e["destination"]:
-            return f"cp {e['source']} {e['destination']}"
-        if intent == "CAT_FILE" and e["name"]:
-            return f"cat {e['name']}"
-        if intent == "UPGRADE_PIP":
-            return "python3 -m pip install --upgrade pip"
-        if intent == "UPGRADE_PACKAGE" and e["name"]:
-            return f"pip install --upgrade {e['name']}"
-
-        # System & Network
-        if intent == "CHECK_RAM":
-            return "free -h"
-        if intent == "CHECK_CPU":
-            return "top -bn1 | grep 'Cpu(s)'"
-        if intent == "CHECK_DISK":
-            return "df -h"
-        if intent == "CHECK_IP":
-            return "hostname -I"
-        if intent == "CHECK_INTERNET":
-            return "ping -c 1 8.8.8.8"
-        if intent == "LIST_PROCESSES":
-            return "ps aux"
-        if intent == "KILL_PROCESS" and e["name"]:
-            return f"pkill -f {e['name']}"
-        if intent == "CLEAR_SCREEN":
-            return "clear"
-
-    return None
+        # Not valid in a Windows path. cmd.exe has no way to escape a quote, and it
+        # expands %VAR% even inside double quotes
+        if '"' in value or "%" in value:
+            return None
+        return f'"{value}"'
+    # Leave a leading ~ outside the quotes so the shell still expands it
+    if value == "~":
+        return value
+    if value.startswith("~/"):
+        rest = value[2:]
+        return "~/" + shlex.quote(rest) if rest else value
+    return shlex.quote(value)
+
+class CommandTable:
+    """
+    (OS, intent) -> command template. `by_os[os_type][intent]` holds the
+    any-OS entries too, so mapping an intent is two dict lookups however many
+    intents are registered; an OS nothing was registered for specifically
+    uses `by_os["*"]`. The core commands go in first, then the plugins,
+    which shadow a core intent of the same name as they always have.
+    """
+
+    def __init__(self):
+        self.by_os = {ANY_OS: {}}
+        self._intents = {}  # insertion-ordered set of every mapped intent
+        self._lock = threading.Lock()
+
+    def register(self, intent, templates):
+        """
+        Adds or replaces the commands for `intent`. `templates` maps an OS
+        type ("WINDOWS", "LINUX", or "*" for any) to a template, or None for
+        "ask the plugin's execute()". An any-OS entry replaces the intent's
+        per-OS ones registered before it.
+        """
+        with self._lock:
+            # Copy on write: map_command reads by_os without the lock
+            by_os = {os_type: dict(commands) for os_type, commands in self.by_os.items()}
+            for os_type in templates:
+                by_os.setdefault(os_type, dict(by_os[ANY_OS]))
+            if ANY_OS in templates:
+                for commands in by_os.values():
+                    commands[intent] = templates[ANY_OS]
+            for os_type, template in templates.items():
+                by_os[os_type][intent] = template
+            self.by_os = by_os
+            self._intents[intent] = None
+
+    def intents(self):
+        return list(self._intents)
+
+def _build_table():
+    table = CommandTable()
+    for intent, templates in CORE_COMMANDS.items():
+        table.register(intent, templates)
+
+    registry = get_registry()
+    for intent in registry.intents():
+        # Plugin templates come from the manifest, so they map without importing the plugin
+        table.register(intent, dict({ANY_OS: None}, **registry.commands(intent)))
+    return table
+
+_table = None
+_table_lock = threading.Lock()
+
+def get_table():
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = _build_table()
+    return _table
+
+def register_command(intent, templates):
+    """Registers commands for `intent` at runtime, e.g. {"LINUX": "du -sh {name}", "WINDOWS": "dir /s {name}"}."""
+    get_table().register(intent, templates)
+
+def supported_intents():
+    """Every intent map_command can turn into a command, core and plugin."""
+    return get_table().intents()
+
+def map_command(intent, os_type, e):
+    by_os = get_table().by_os
+    commands = by_os.get(os_type) or by_os[ANY_OS]
+    if intent not in commands:
+        return None
+    template = commands[intent]
+    # 🔌 Plugin commands (the plugin module is imported on its first use)
+    if template is None:
+        return get_registry().execute(intent, e, os_type)
+    if "{" not in template:
+        return template
+    # Fill the {fields} in from the entities, each quoted for the shell
+    command = ""
+    for literal, field in _parse(template):
+        command += literal
+        if field is not None:
+            value = _quote(e.get(field), os_type)
+            if value is None:
+                return None
+            command += value
+    return command
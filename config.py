@@ -1,9 +1,71 @@
+import os
 
 # Configuration for NL-Terminal
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # AI Configuration
 AI_MODEL = "phi"  # The Ollama model to use
 AI_TIMEOUT = 10   # Seconds to wait for AI response
+AI_BACKEND = "http"  # "http" = Ollama REST API (keep-alive), "cli" = spawn `ollama run` per call
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_POOL_SIZE = 4  # Max idle keep-alive connections kept to the Ollama server
+AI_WARMUP = True       # Load AI_MODEL into memory in the background at startup
+AI_KEEP_ALIVE = 30 * 60  # Seconds Ollama keeps the model loaded after a request (-1 = forever)
+AI_LOAD_TIMEOUT = 120  # Seconds allowed for loading the model (AI_TIMEOUT only covers inference)
+
+# LLM Response Cache (explain / teach / error insight)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "llm")
+LLM_CACHE_TTL = 7 * 24 * 3600          # Seconds an answer stays valid
+LLM_CACHE_MEMORY_ENTRIES = 128         # In-memory LRU size
+LLM_CACHE_MAX_BYTES = 20 * 1024 * 1024 # On-disk budget
+
+# Plugins
+PLUGIN_MANIFEST = os.path.join(BASE_DIR, ".cache", "plugin_manifest.json")  # Cached plugin names/intents/phrases
+
+# Backups (undo / rollback)
+BACKUP_WORKERS = 8          # Threads copying files when a folder is snapshotted or restored
+BACKUP_COMPRESSION = None   # None = store blobs as-is (reflinked where the filesystem allows), "zlib" or "lzma"
+# Retention, enforced by a background GC pass (None disables a policy)
+BACKUP_MAX_BYTES = 2 * 1024 ** 3   # Total size of stored backups; the oldest entries go first
+BACKUP_MAX_AGE_DAYS = 30           # Entries older than this are dropped
+BACKUP_KEEP_PER_PATH = 20          # Newest entries kept for each original path
+BACKUP_GC_INTERVAL = 15 * 60       # Seconds between GC passes (the first runs shortly after startup)
+
+# Action log (logs/command_log.jsonl, written by a background thread)
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate (and gzip) the log past this size
+LOG_BACKUPS = 5                  # Rotated logs kept: command_log.jsonl.1.gz ... .5.gz
+LOG_FLUSH_INTERVAL = 0.5         # Seconds records may wait to be written together
+LOG_QUEUE_SIZE = 10000           # Records buffered before new ones are dropped
+HISTORY_DB = os.path.join(BASE_DIR, "logs", "history.db")  # Searchable index of the action log ("history ...")
+HISTORY_LIMIT = 20               # Rows shown by a history search unless it asks for more ("history last 50")
+
+# Nearest-phrase classifier (NumPy TF-IDF) tried before the LLM for sentences no phrase matched
+INTENT_CLASSIFIER = True
+# Never taken from the classifier alone: a near miss here deletes, kills or overwrites
+# something (in expert mode without a prompt), so these still go to the LLM
+CLASSIFIER_EXCLUDED_INTENTS = {"DELETE_FILE", "DELETE_FOLDER", "KILL_PROCESS", "ROLLBACK", "RESTORE_BACKUP"}
+
+# Learned phrases: sentences the AI resolved are matched locally next time
+PHRASE_LEARNING = True
+PHRASE_MEMORY_FILE = os.path.join(BASE_DIR, ".cache", "learned_phrases.json")
+PHRASE_MAX_ENTRIES = 500       # The least used (after decay) are dropped past this
+PHRASE_HALF_LIFE_DAYS = 30     # A phrase's use count halves for every this many days it goes unused
+PHRASE_MIN_WEIGHT = 0.1        # Phrases that decay below this are forgotten
+
+# Command Execution
+PERSISTENT_SHELL = True   # Reuse one long-lived shell (POSIX) so cd/export persist between commands
+SHELL_PATH = "/bin/sh"
+OUTPUT_MEMORY_LIMIT = 4 * 1024 * 1024  # Bytes of command output kept in RAM before spilling to a temp file
+OUTPUT_TAIL_LINES = 200               # Lines kept in memory once output has spilled
+ERROR_CONTEXT_LINES = 60              # Last stderr lines handed to the AI error explainer
+PAGER_MIN_LINES = 2000                # Longer output opens in the pager instead of flooding the scrollback (0: never)
+BATCH_WORKERS = 4                     # Lines interpreted concurrently in --batch mode (LLM calls in flight)
+
+# Latency tracing ("stats" shows p50/p95/p99 per stage)
+TRACE_ENABLED = True                              # Off: the instrumentation is not even installed
+TRACE_DUMP_FILE = os.environ.get("NL_TRACE_DUMP")  # Write the stats here as JSON on exit (or use --trace-dump)
 
 # Confidence Thresholds
 CONFIDENCE_THRESHOLD = 0.6
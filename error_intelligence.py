@@ -1,7 +1,7 @@
-from local_ai import run_llm
+from local_ai import stream_cached
 
-def explain_error(command, error_output):
-    prompt = f"""
+def _error_prompt(command, error_output):
+    return f"""
 You are a terminal expert assistant.
 
 A command was executed and failed.
@@ -22,7 +22,9 @@ Do NOT execute anything.
 Keep it concise and helpful.
 """
 
+def explain_error_stream(command, error_output, use_cache=True):
+    """The AI's explanation of a failed command, yielded token by token."""
     try:
-        return run_llm(prompt)
+        yield from stream_cached(_error_prompt(command, error_output), use_cache)
     except Exception:
-        return "AI could not analyze the error."
+        yield "AI could not analyze the error."
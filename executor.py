@@ -1,6 +1,10 @@
 import subprocess
-import shlex
 import os
+import threading
+from config import PERSISTENT_SHELL
+from shell_session import ShellSession
+from output_buffer import SpooledOutput
+from tracing import traced
 
 INTERACTIVE_COMMANDS = {
     "vim", "nano", "top", "htop",
@@ -10,17 +14,37 @@ INTERACTIVE_COMMANDS = {
     "cmd", "powershell"
 }
 
-def is_interactive(command):
-    try:
-        parts = shlex.split(command)
-        if not parts:
-            return False
-        return parts[0].lower() in INTERACTIVE_COMMANDS
-    except Exception:
-        return False
 
+_session = None
+
+def get_session():
+    global _session
+    if _session is None:
+        _session = ShellSession()
+    return _session
+
+def use_persistent_shell():
+    return PERSISTENT_SHELL and os.name == "posix"
+
+def _sync_cwd(session):
+    if session.cwd != os.getcwd() and os.path.isdir(session.cwd):
+        os.chdir(session.cwd)
+
+def run_command(command):
+    """
+    Runs a shell command and returns (stdout, stderr, returncode).
+    On POSIX the command goes to the long-lived shell session, so `cd`
+    sticks; Python's own cwd follows the shell so relative paths agree.
+    """
+    if use_persistent_shell():
+        session = get_session()
+        try:
+            stdout, stderr, returncode = session.run(command)
+        except Exception as e:
+            return "", str(e), 1
+        _sync_cwd(session)
+        return stdout, stderr, returncode
 
-def execute(command):
     try:
         result = subprocess.run(
             command,
@@ -32,7 +56,62 @@ def execute(command):
         stdout = result.stdout.decode("utf-8", errors="ignore")
         stderr = result.stderr.decode("utf-8", errors="ignore")
 
-        return stdout, stderr
+        return stdout, stderr, result.returncode
 
     except Exception as e:
-        return "", str(e)
+        return "", str(e), 1
+
+@traced("execute_stream")
+def stream_command(command, on_line=None):
+    """
+    Streaming variant of run_command for commands with unbounded output.
+
+    Both pipes are drained concurrently (no deadlock when one fills up) and
+    each line is passed to `on_line(stream, text)` with stream "out"/"err"
+    as soon as it is read. Returns (stdout, stderr, returncode) where the
+    outputs are SpooledOutput buffers with capped memory.
+    """
+    out, err = SpooledOutput(), SpooledOutput()
+
+    def sink(stream, buffer):
+        def write(text):
+            buffer.append(text)
+            if on_line:
+                on_line(stream, text)
+        return write
+
+    if use_persistent_shell():
+        session = get_session()
+        try:
+            returncode = session.stream(command, sink("out", out), sink("err", err))
+        except Exception as e:
+            err.append(str(e))
+            return out, err, 1
+        _sync_cwd(session)
+        return out, err, returncode
+
+    try:
+        proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except Exception as e:
+        err.append(str(e))
+        return out, err, 1
+
+    def pump(pipe, write):
+        for line in iter(pipe.readline, b""):
+            write(line.decode("utf-8", errors="ignore"))
+        pipe.close()
+
+    readers = [
+        threading.Thread(target=pump, args=(proc.stdout, sink("out", out)), daemon=True),
+        threading.Thread(target=pump, args=(proc.stderr, sink("err", err)), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    return out, err, proc.wait()
+
+@traced("execute")
+def execute(command):
+    stdout, stderr, _ = run_command(command)
+    return stdout, stderr
@@ -0,0 +1,291 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from config import HISTORY_DB, HISTORY_LIMIT
+from logger import LOG_DIR, LEGACY_LOG_FILE, get_logger
+
+# One executed action, newest first in search results
+HistoryEntry = namedtuple("HistoryEntry", [
+    "id", "ts", "input", "intent", "command", "status", "message", "elapsed_ms", "exit_code",
+])
+_ENTRY_COLUMNS = ", ".join(HistoryEntry._fields)
+
+# What "history docker failed last week" asked for
+HistoryQuery = namedtuple("HistoryQuery", ["terms", "statuses", "since", "until", "limit"])
+
+_SCHEMA = """
+-- ids follow time (imported older logs get ids below the live rows), so "newest first" is a rowid scan
+CREATE TABLE IF NOT EXISTS history (
+    id         INTEGER PRIMARY KEY,
+    ts         TEXT NOT NULL,
+    input      TEXT NOT NULL DEFAULT '',
+    intent     TEXT,
+    command    TEXT,
+    status     TEXT,
+    message    TEXT,
+    elapsed_ms REAL,
+    exit_code  INTEGER,
+    source     TEXT  -- log file the row was imported from; NULL when indexed live
+);
+CREATE INDEX IF NOT EXISTS idx_history_ts ON history(ts);
+CREATE INDEX IF NOT EXISTS idx_history_status_ts ON history(status, ts);
+CREATE INDEX IF NOT EXISTS idx_history_source ON history(source) WHERE source IS NOT NULL;
+
+-- Full-text index over the text columns, kept in sync by the triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    input, command, message, content='history', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts(rowid, input, command, message) VALUES (new.id, new.input, new.command, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts(history_fts, rowid, input, command, message)
+    VALUES ('delete', old.id, old.input, old.command, old.message);
+END;
+
+-- How far each imported log file has been read
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    head   TEXT NOT NULL  -- hash of the first line: a different one means the file was replaced
+);
+"""
+
+# --- query parsing ---------------------------------------------------------
+
+STATUS_WORDS = {
+    "failed": ("ERROR", "FAIL"), "failure": ("ERROR", "FAIL"), "failures": ("ERROR", "FAIL"),
+    "failing": ("ERROR", "FAIL"), "error": ("ERROR", "FAIL"), "errors": ("ERROR", "FAIL"),
+    "succeeded": ("SUCCESS",), "successful": ("SUCCESS",), "success": ("SUCCESS",), "worked": ("SUCCESS",),
+    "cancelled": ("CANCEL",), "canceled": ("CANCEL",), "aborted": ("CANCEL",),
+}
+
+_LEAD = re.compile(r"^\s*(?:show\s+(?:me\s+)?)?(?:my\s+)?(?:command\s+)?history\b(?:\s+(?:of|for|with))?", re.IGNORECASE)
+_LIMIT = re.compile(r"\b(?:last|top|latest)\s+(\d+)\b(?!\s*(?:minute|min|hour|day|week|month)s?\b)|\blimit\s+(\d+)\b")
+_AGO = re.compile(r"\b(?:in\s+the\s+)?(?:last|past)\s+(?:(\d+)\s+)?(minute|min|hour|day|week|month)s?\b")
+_SINCE = re.compile(r"\bsince\s+(\d{4}-\d{2}-\d{2}(?:[ t]\d{1,2}:\d{2})?)\b")
+_FILLER = {"the", "that", "which", "were", "was", "commands", "command", "i", "ran", "run", "all", "me", "my"}
+_UNIT = {"minute": 60, "min": 60, "hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+
+def parse_query(text, now=None):
+    """
+    "history docker failed last week" -> HistoryQuery(["docker"], ("ERROR", "FAIL"), <7 days ago>, None, 20).
+    Understands status words, today / yesterday / this week / last N days / since 2026-10-01,
+    and "last 50" for the number of rows. Everything else is searched for.
+    """
+    now = now or datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    text = _LEAD.sub("", text.lower(), count=1)
+    since = until = None
+    limit = HISTORY_LIMIT
+
+    match = _LIMIT.search(text)
+    if match:
+        limit = int(match.group(1) or match.group(2))
+        text = text[:match.start()] + " " + text[match.end():]
+
+    match = _AGO.search(text)
+    if match:
+        since = now - timedelta(seconds=int(match.group(1) or 1) * _UNIT[match.group(2)])
+        text = text[:match.start()] + " " + text[match.end():]
+
+    match = _SINCE.search(text)
+    if match:
+        try:
+            since = datetime.fromisoformat(match.group(1))
+            text = text[:match.start()] + " " + text[match.end():]
+        except ValueError:
+            pass
+
+    words = []
+    statuses = set()
+    for word in text.split():
+        if word == "today":
+            since = midnight
+        elif word == "yesterday":
+            since, until = midnight - timedelta(days=1), midnight
+        elif word in STATUS_WORDS:
+            statuses.update(STATUS_WORDS[word])
+        elif word not in _FILLER and word.strip("\"'"):
+            words.append(word.strip("\"'"))
+
+    # "this week" / "this month" (the words were kept above in case they were search terms)
+    joined = " ".join(words)
+    if "this week" in joined:
+        since = midnight - timedelta(days=now.weekday())
+        joined = joined.replace("this week", " ")
+    if "this month" in joined:
+        since = midnight.replace(day=1)
+        joined = joined.replace("this month", " ")
+
+    return HistoryQuery(joined.split(), tuple(sorted(statuses)), since, until, limit)
+
+def _fts_query(terms):
+    # Each word is a quoted phrase, so FTS syntax can't leak in; "dock*" asks for a prefix match
+    phrases = []
+    for term in terms:
+        prefix = term.endswith("*") and len(term) > 1
+        term = term.rstrip("*").replace('"', '""')
+        phrases.append(f'"{term}"*' if prefix else f'"{term}"')
+    return " ".join(phrases)
+
+# --- legacy log import -----------------------------------------------------
+
+_LEGACY_LINE = re.compile(
+    r"^\[(?P<ts>[^\]]+)\] \| INPUT: (?P<input>.*?) \| INTENT: (?P<intent>\S*) \| COMMAND: (?P<command>.*?)"
+    r" \| STATUS: (?P<status>\S*) \| MESSAGE: (?P<message>.*)$"
+)
+
+def parse_legacy_line(line):
+    """A command_log.txt line -> record dict (as log_action builds them), or None."""
+    match = _LEGACY_LINE.match(line.rstrip("\r\n"))
+    if not match:
+        return None
+    record = match.groupdict()
+    record["ts"] = record["ts"].replace(" ", "T", 1)
+    return record
+
+class History:
+    """
+    Searchable index of everything log_action records: one row per action,
+    plus an FTS5 index over input, command and message. Live records arrive
+    in batches from the logger's writer thread; the old command_log.txt is
+    imported incrementally (only the bytes appended since the last import).
+    """
+
+    def __init__(self, db_path=HISTORY_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _insert(self, records, source=None, first_id=None):
+        ids = range(first_id, first_id + len(records)) if first_id is not None else [None] * len(records)
+        self._db.executemany(
+            "INSERT INTO history (id, ts, input, intent, command, status, message, elapsed_ms, exit_code, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (i, r.get("ts") or datetime.now().isoformat(), r.get("input") or "", r.get("intent"), r.get("command"),
+                 r.get("status"), r.get("message"), r.get("elapsed_ms"), r.get("exit_code"), source)
+                for i, r in zip(ids, records)
+            ],
+        )
+
+    def add_records(self, records):
+        """Indexes log_action records (one transaction per batch)."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._insert(records)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def import_log(self, path=os.path.join(LOG_DIR, LEGACY_LOG_FILE), parse=parse_legacy_line):
+        """Imports the lines appended to `path` since the last call. Returns the number of rows added."""
+        try:
+            size = os.path.getsize(path)
+            with open(path, "rb") as f:
+                head = hashlib.sha1(f.readline()).hexdigest()
+        except OSError:
+            return 0
+
+        source = os.path.abspath(path)
+        with self._lock:
+            row = self._db.execute("SELECT offset, head FROM imports WHERE source = ?", (source,)).fetchone()
+        offset = row[0] if row and row[1] == head and row[0] <= size else 0
+        if row and offset == row[0] == size:
+            return 0
+
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a half-written last line waits for the next import
+        records = [parse(line) for line in data[:end].decode("utf-8", errors="replace").splitlines()]
+        records = [r for r in records if r]
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                if row and offset == 0:
+                    self._db.execute("DELETE FROM history WHERE source = ?", (source,))  # replaced: start over
+                # An older log goes below everything indexed so far, keeping ids in time order
+                lowest = self._db.execute("SELECT MIN(id) FROM history").fetchone()[0]
+                self._insert(records, source, first_id=min(lowest or 1, 1) - len(records))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO imports (source, offset, head) VALUES (?, ?, ?)", (source, offset + end, head)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(records)
+
+    def search(self, text, now=None):
+        """Runs a plain-English history query. Returns (HistoryQuery, [HistoryEntry], newest first)."""
+        query = parse_query(text, now)
+        where, params = [], []
+        if query.terms:
+            # FTS5 hands out matches newest (highest rowid) first and stops at the LIMIT
+            sql = (f"SELECT {', '.join('h.' + c for c in HistoryEntry._fields)} FROM history_fts "
+                   "JOIN history h ON h.id = history_fts.rowid")
+            where.append("history_fts MATCH ?")
+            params.append(_fts_query(query.terms))
+            order = "history_fts.rowid"
+        else:
+            sql = f"SELECT {_ENTRY_COLUMNS} FROM history"
+            order = "id"
+        if query.statuses:
+            where.append(f"status IN ({', '.join('?' * len(query.statuses))})")
+            params.extend(query.statuses)
+        if query.since:
+            where.append("ts >= ?")
+            params.append(query.since.isoformat())
+        if query.until:
+            where.append("ts < ?")
+            params.append(query.until.isoformat())
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, params + [query.limit]).fetchall()
+        return query, [HistoryEntry(*row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history():
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = History()
+    return _history
+
+def search(text):
+    """What SHOW_HISTORY runs: picks up anything new in the old text log, then searches."""
+    history = get_history()
+    history.import_log()
+    return history.search(text)
+
+def _index(records):
+    get_history().add_records(records)
+
+# Every record the logger writes is indexed as well (on its writer thread)
+get_logger().add_sink(_index)
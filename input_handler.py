@@ -0,0 +1,473 @@
+import asyncio
+import os
+import threading
+
+from intent_parser import route_input, extract_entities, match_learned, learn_phrase, classify_intent, confident_guess, BASE_INTENTS
+from local_ai import (
+    ai_interpret_ranked,
+    ai_explain_stream,
+    ai_teach_stream,
+    build_intent_catalog,
+)
+from command_mapper import map_command, supported_intents
+from executor import execute, stream_command
+from pty_executor import run_interactive
+from safety import is_safe, confirmation_prompt
+from logger import log_action, start_action
+from error_intelligence import explain_error_stream
+from backup_manager import BackupManager, transfer_summary, backup_target, parse_when
+from config import CONFIDENCE_THRESHOLD, LOW_CONFIDENCE_FLOOR, ERROR_CONTEXT_LINES, PAGER_MIN_LINES
+from response_cache import get_cache
+from model_manager import get_model, LOADING
+import sys_metrics
+from output_formatter import (
+    FORMATTED_INTENTS,
+    format_output, 
+    format_metrics,
+    format_ai_insight, 
+    format_ai_explanation, 
+    format_ai_lesson,
+    format_backup_list,
+    format_history,
+    format_learned_phrases,
+    format_trace_stats
+)
+import history
+from phrase_memory import get_phrase_memory
+from tracing import get_tracer
+from pager import page_output, spool_text
+
+# Everything behind the prompt: what happens to one line of input.
+# main.py imports this module in the background while the first prompt is
+# already up, so none of it costs startup time.
+
+# Intents handled by the REPL itself rather than by command_mapper
+INTERNAL_INTENTS = ["ROLLBACK", "RESTORE_BACKUP", "LIST_BACKUPS", "SHOW_HISTORY"]
+
+def thinking_message():
+    model = get_model()
+    if model.state == LOADING:
+        return f"Loading {model.model} into memory..."
+    return "AI is thinking..."
+
+def warm_up():
+    """Work that can happen before the first input arrives (runs on a worker thread)."""
+    # Baseline /proc samples so the first CPU/process query shows current usage
+    sys_metrics.prime()
+    # Import NumPy and build the intent classifier's matrix now rather than on the first unmatched sentence
+    classify_intent("")
+
+class ReplState:
+    """Everything one REPL session shares between the prompt loop and its tasks."""
+
+    def __init__(self, os_type, session, ui, reader):
+        self.os_type = os_type
+        self.session = session
+        self.ui = ui
+        self.backup_manager = BackupManager()
+        self.backup_manager.start_gc()
+        self.reader = reader
+        self.current = None          # task handling the latest input
+        self.cancel = threading.Event()  # tells worker threads (AI streams) to stop early
+        self.insights = set()        # background error-insight tasks
+        self.insight_cancel = threading.Event()  # stops the threads streaming them
+        self.intent_catalog = build_intent_catalog(BASE_INTENTS, supported_intents() + INTERNAL_INTENTS)
+
+    def cancel_insights(self):
+        for task in list(self.insights):
+            task.cancel()
+        # The streaming threads outlive their tasks until they see this; later insights get a fresh event
+        self.insight_cancel.set()
+        self.insight_cancel = threading.Event()
+
+async def ask_confirmation(state, action_desc):
+    prompt = confirmation_prompt(action_desc, state.session.mode)
+    if prompt is None:
+        return True
+    answer = await state.reader.read(lambda: state.ui.print_prompt(f"{prompt} [y/n]"))
+    return answer.strip().lower() in ["y", "yes"]
+
+async def show_insight(state, command, err, use_cache):
+    """Streams the AI error analysis in as it is generated, without holding the prompt."""
+    await asyncio.to_thread(
+        state.ui.print_async_stream, explain_error_stream(command, err, use_cache), format_ai_insight,
+        state.insight_cancel,
+    )
+
+def schedule_insight(state, command, err, use_cache):
+    task = asyncio.create_task(show_insight(state, command, err, use_cache))
+    state.insights.add(task)
+    task.add_done_callback(state.insights.discard)
+
+async def restore_backup(state, user_input, entities):
+    """"restore notes.txt as of 10:30": the version of a file/folder at a point in time (latest without one). True if it was restored."""
+    ui = state.ui
+    target = backup_target(entities.get("name"))
+    if not target:
+        ui.print_warning("Which file? e.g. restore notes.txt as of 10:30")
+        return False
+    when = None
+    if entities.get("when"):
+        when = parse_when(entities["when"])
+        if when is None:
+            ui.print_error(f"Couldn't read the time '{entities['when']}' (try 10:30, 9pm, yesterday 18:00, 2 hours ago)")
+            return False
+
+    msg = await asyncio.to_thread(state.backup_manager.restore_as_of, target, when)
+    ok = msg.startswith("Restored")
+    (ui.print_success if ok else ui.print_error)(msg)
+    log_action(user_input, "RESTORE_BACKUP", "RESTORE", "SUCCESS" if ok else "FAIL", msg)
+    return ok
+
+async def handle_input(state, user_input):
+    session, ui, backup_manager = state.session, state.ui, state.backup_manager
+    start_action()
+
+    # LLM CACHE: "--no-cache" forces a fresh answer, "cache stats|clear" manage it
+    use_cache = "--no-cache" not in user_input
+    if not use_cache:
+        user_input = " ".join(user_input.replace("--no-cache", " ").split())
+
+    lower = user_input.lower()
+
+    if lower in ["cache stats", "cache status"]:
+        stats = get_cache().stats()
+        ui.print_info(
+            f"LLM cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+            f"{stats['misses']} misses, hit rate {stats['hit_rate']:.0%}, "
+            f"{stats['memory_entries']} in memory, {stats['disk_bytes'] / 1024:.1f} KB on disk"
+        )
+        return
+
+    if lower in ["model status", "ai status"]:
+        s = get_model().status()
+        line = f"Model {s['model']}: {s['state']}"
+        if s["error"]:
+            line += f" ({s['error']})"
+        if s["load_seconds"] is not None:
+            line += f", loaded in {s['load_seconds']:.2f}s (server load {s['server_load_seconds']:.2f}s)"
+        line += f", keep-alive {s['keep_alive']}s"
+        if s["requests"]:
+            rate = s["tokens"] / s["inference_seconds"] if s["inference_seconds"] else 0
+            line += (
+                f"; {s['requests']} queries, {s['inference_seconds']:.2f}s inference "
+                f"({s['inference_seconds'] / s['requests']:.2f}s avg, {rate:.0f} tok/s)"
+            )
+        ui.print_info(line)
+        return
+
+    if lower in ["backup gc", "backups gc", "clean backups"]:
+        freed = await asyncio.to_thread(backup_manager.collect_garbage)
+        ui.print_success(
+            f"Backups cleaned: {freed['entries']} expired entries, {freed['blobs']} blobs, "
+            f"{freed['bytes'] / 1024 / 1024:.1f} MB freed"
+        )
+        return
+
+    if lower in ["stats", "show stats", "stats reset"]:
+        tracer = get_tracer()
+        if not tracer.enabled:
+            ui.print_warning("Tracing is off (TRACE_ENABLED in config.py).")
+        elif lower == "stats reset":
+            tracer.reset()
+            ui.print_success("Latency stats cleared")
+        else:
+            ui.stream_output(format_trace_stats(tracer.stats(), tracer.started))
+        return
+
+    if lower in ["learned phrases", "list learned phrases", "show learned phrases"]:
+        phrases = get_phrase_memory().phrases()
+        if phrases:
+            ui.stream_output(format_learned_phrases(phrases))
+        else:
+            ui.print_info("No learned phrases yet.")
+        return
+
+    if lower.startswith(("forget phrase ", "forget learned ")):
+        forgotten = get_phrase_memory().forget(user_input.split(None, 2)[2])
+        if forgotten:
+            ui.print_success("Forgot: " + ", ".join(f"'{p.template}'" for p in forgotten))
+        else:
+            ui.print_warning("No learned phrase like that (see 'learned phrases').")
+        return
+
+    if lower in ["cache clear", "clear cache", "cache flush"]:
+        get_cache().clear()
+        ui.print_success("LLM response cache cleared")
+        return
+
+    # One pass over the input decides the branch and the intent
+    route = route_input(user_input)
+
+    # MODE SWITCH
+    if route.route == "MODE":
+        for m in ["beginner", "expert", "safe"]:
+            if m in lower:
+                session.set_mode(m)
+                ui.update_mode(session.mode)
+                ui.print_success(f"Switched to {session.mode} mode")
+                break
+        else:
+            ui.print_warning("Specify mode: beginner | expert | safe")
+        return
+
+    # EXPLAIN / TEACH
+    if route.route == "EXPLAIN":
+        ui.print_ai_thinking(thinking_message())
+        topic = user_input.replace("explain", "", 1).strip()
+        await asyncio.to_thread(
+            ui.print_ai_stream, ai_explain_stream(topic, use_cache), format_ai_explanation, state.cancel
+        )
+        return
+
+    if route.route == "LEARN":
+        ui.print_ai_thinking(thinking_message())
+        topic = lower.replace("teach me", "").replace("learn", "").replace("how to", "")
+        await asyncio.to_thread(
+            ui.print_ai_stream, ai_teach_stream(topic.strip(), use_cache), format_ai_lesson, state.cancel
+        )
+        return
+
+    # INTERACTIVE
+    if route.route == "INTERACTIVE":
+        ui.print_info(f"Launching interactive session: {user_input}")
+        run_interactive(user_input)
+        return
+
+    # NL COMMANDS
+    if route.route == "NL":
+        intent = route.intent
+        entities = extract_entities(user_input, intent)
+        learn = None  # who read the phrase ("ai" / "user") when it's worth learning
+
+        if intent == "UNKNOWN":
+            learned = match_learned(user_input)
+            if learned:
+                intent, entities = learned
+
+        if intent == "UNKNOWN":
+            guess = confident_guess(user_input)
+            if guess:
+                intent = guess.intent
+                entities = extract_entities(user_input, intent)
+                ui.print_info(f"Reading this as '{guess.phrase}' ({guess.confidence:.0%} sure)")
+
+        if intent == "UNKNOWN":
+            ui.print_ai_thinking(thinking_message())
+            ai_result = await asyncio.to_thread(ai_interpret_ranked, user_input, state.intent_catalog)
+            ui.stop_ai_thinking()
+            confidence = ai_result["confidence"]
+
+            # One round-trip gave us the top pick and its ranked alternatives; decide locally
+            if confidence >= CONFIDENCE_THRESHOLD:
+                intent = ai_result["intent"]
+                entities = ai_result["entities"]
+                learn = "ai"
+            else:
+                options = [
+                    c for c in [ai_result] + ai_result["alternatives"]
+                    if c["confidence"] >= LOW_CONFIDENCE_FLOOR
+                ]
+                if not options:
+                    ui.print_warning(f"Too ambiguous (Confidence: {confidence:.2f}). Please rephrase.")
+                    return
+
+                ui.print_info("Did you mean:")
+                for i, opt in enumerate(options, 1):
+                    ui.stream_output(
+                        f"[bold cyan]{i})[/bold cyan] {opt['description']} "
+                        f"[comment]({opt['confidence']:.0%})[/comment]"
+                    )
+
+                choice = await state.reader.read(ui.print_prompt)
+                if not choice.isdigit():
+                    return
+                idx = int(choice) - 1
+                if 0 <= idx < len(options):
+                    selected = options[idx]
+                    intent = selected["intent"]
+                    entities = selected["entities"]
+                    learn = "user"
+                else:
+                    return
+
+        if await run_intent(state, user_input, intent, entities, use_cache) and learn:
+            # Only a reading the user went through with, and that worked, maps this phrase from now on
+            learn_phrase(user_input, intent, entities, source=learn)
+        return
+
+    # RAW COMMAND
+    await run_and_display(state, user_input, "RAW_COMMAND", user_input, use_cache)
+
+async def run_intent(state, user_input, intent, entities, use_cache):
+    """Carries out an NL intent. True if it ran and succeeded; False if it was blocked, declined or failed."""
+    os_type, ui, backup_manager = state.os_type, state.ui, state.backup_manager
+
+    # 🛡️ ROLLBACK
+    if intent == "ROLLBACK":
+        msg = backup_manager.restore_last()
+        ui.print_success(msg)
+        log_action(user_input, intent, "ROLLBACK", "SUCCESS", msg)
+        return msg.startswith("Restored")
+
+    if intent == "RESTORE_BACKUP":
+        return await restore_backup(state, user_input, entities)
+
+    if intent == "SHOW_HISTORY":
+        query, entries = await asyncio.to_thread(history.search, user_input)
+        if entries:
+            ui.stream_output(format_history(entries, query))
+        else:
+            ui.print_info("Nothing in the history matches that.")
+        return True
+
+    if intent == "LIST_BACKUPS":
+        target = backup_target(entities.get("name"))
+        entries = await asyncio.to_thread(backup_manager.list_backups, target)
+        if entries:
+            ui.stream_output(format_backup_list(entries, target if target and not os.path.isfile(target) else None))
+        else:
+            ui.print_info(f"No backups for {target}." if target else "No backups yet.")
+        log_action(user_input, intent, "LIST_BACKUPS", "SUCCESS", f"{len(entries)} entries")
+        return True
+
+    # 🛡️ SAFETY & CONFIRMATION
+    if intent in ["DELETE_FILE", "DELETE_FOLDER", "KILL_PROCESS"]:
+        # Check basic safety
+        if not is_safe(entities.get("name")):
+            ui.print_error("Action blocked by strict safety rules (system path protections).")
+            log_action(user_input, intent, "BLOCKED", "FAIL", "Strict safety block")
+            return False
+
+        # Check user confirmation
+        action_desc = f"{intent} on {entities.get('name')}"
+        if not await ask_confirmation(state, action_desc):
+            ui.print_warning("Action aborted by user.")
+            log_action(user_input, intent, "ABORTED", "CANCEL", "User denied confirmation")
+            return False
+
+        # 🛡️ AUTO-BACKUP
+        if intent == "DELETE_FILE" and entities.get("name"):
+            if backup_manager.backup_file(entities.get("name")):
+                 ui.print_success(f"📦 Backup created for {entities.get('name')}")
+
+        if intent == "DELETE_FOLDER" and entities.get("name") and os.path.isdir(entities.get("name")):
+            stats = await asyncio.to_thread(backup_manager.snapshot_dir, entities.get("name"))
+            if stats is None:
+                ui.print_error("Could not back up the folder, so it was not deleted.")
+                log_action(user_input, intent, "ABORTED", "FAIL", "Snapshot failed")
+                return False
+            ui.print_success(f"📦 Snapshot of {entities.get('name')}: {transfer_summary(stats)}")
+
+    # Native metrics straight from /proc instead of free/top/df/ps
+    if intent in sys_metrics.METRIC_INTENTS and os_type == "LINUX" and sys_metrics.available():
+        return await show_metrics(state, user_input, intent)
+
+    command = map_command(intent, os_type, entities)
+    if not command:
+        ui.print_error(f"Could not map command for intent: {intent}")
+        return False
+
+    # Handle Plugin Internal Commands
+    if command.startswith("INTERNAL:"):
+        response = command.split("INTERNAL:", 1)[1]
+        ui.print_success(response)
+        log_action(user_input, intent, "PLUGIN_EXEC", "SUCCESS", response)
+        return True
+
+    return await run_and_display(state, user_input, intent, command, use_cache)
+
+async def show_metrics(state, user_input, intent):
+    lower = user_input.lower()
+    sort_by = "mem" if any(w in lower.split() for w in ["memory", "mem", "ram"]) else "cpu"
+    try:
+        data = sys_metrics.query(intent, sort_by)
+    except (OSError, ValueError, IndexError) as e:
+        state.ui.print_error(f"Could not read system metrics: {e}")
+        log_action(user_input, intent, "PROC_METRICS", "ERROR", message=str(e)[:100])
+        return False
+
+    log_action(user_input, intent, "PROC_METRICS", "SUCCESS", message="OK")
+    formatted = format_metrics(intent, data)
+    if formatted:
+        state.ui.stream_output(formatted)
+    return True
+
+def use_pager(state):
+    # Only a real terminal can page; piped output keeps everything
+    return PAGER_MIN_LINES > 0 and state.ui.console.is_terminal
+
+def capped_echo(ui, limit):
+    """
+    ui.stream_line for the first `limit` lines of stdout. The rest is only
+    captured, to be read in the pager once the command is done, instead of
+    pushing everything before it out of the scrollback.
+    """
+    shown = 0
+
+    def on_line(stream, text):
+        nonlocal shown
+        if stream == "out":
+            shown += 1
+            if shown > limit:
+                if shown == limit + 1:
+                    ui.end_stream()
+                    ui.print_info(f"Output passed {limit:,} lines; the rest opens in the pager when the command finishes.")
+                return
+        ui.stream_line(stream, text)
+
+    return on_line
+
+async def run_and_display(state, user_input, intent, command, use_cache):
+    """Runs `command` and shows its output. True if it succeeded (exit code 0, nothing on stderr)."""
+    ui = state.ui
+    ui.print_command_execution(command)
+
+    if intent in FORMATTED_INTENTS:
+        # Small, structured output: capture it whole and hand it to the formatter
+        out, err = await asyncio.to_thread(execute, command)
+
+        # LOGGING
+        status = "SUCCESS" if not err else "ERROR"
+        log_action(user_input, intent, command, status, message=err[:100] if err else "OK")
+
+        if out:
+            formatted = await asyncio.to_thread(format_output, intent, out, state.os_type)
+            if formatted:
+                ui.stream_output(formatted)
+            elif use_pager(state) and out.count("\n") > PAGER_MIN_LINES:
+                spooled = spool_text(out)
+                try:
+                    await page_output(state, spooled, command)
+                finally:
+                    spooled.close()
+            else:
+                ui.stream_output(out)
+
+        if err:
+            ui.print_error(err)
+            schedule_insight(state, command, err, use_cache)
+        return not err
+
+    # Anything else streams line by line as it is produced, with bounded memory
+    paging = use_pager(state)
+    on_line = capped_echo(ui, PAGER_MIN_LINES) if paging else ui.stream_line
+    out, err, returncode = await asyncio.to_thread(stream_command, command, on_line)
+    ui.end_stream()
+    try:
+        if paging and out.line_count > PAGER_MIN_LINES:
+            await page_output(state, out, command)
+        err_context = err.tail(ERROR_CONTEXT_LINES)
+
+        status = "SUCCESS" if not err else "ERROR"
+        log_action(user_input, intent, command, status, message=err_context[:100] if err else "OK", exit_code=returncode)
+        ok = not err and not returncode
+
+        if err:
+            if returncode:
+                ui.print_error(f"Command exited with code {returncode}")
+            schedule_insight(state, command, err_context, use_cache)
+    finally:
+        out.close()
+        err.close()
+    return ok
@@ -0,0 +1,208 @@
+import shutil
+from collections import deque, namedtuple
+from functools import lru_cache
+
+from executor import INTERACTIVE_COMMANDS
+
+# A routed input: which branch of the REPL handles it, the best intent
+# (or "UNKNOWN") and the (start, end) span of the phrase that decided it.
+Route = namedtuple("Route", ["route", "intent", "span"])
+
+NL_KEYWORDS = [
+    "create", "delete", "remove", "make", "move", "copy",
+    "show", "list", "where", "go", "open",
+    "explain", "teach", "how",
+    "change", "switch", "set", "read", "check", "what",
+    "install", "update", "upgrade"
+]
+
+# Single verbs that name an intent only as the first word: "undo", "restore
+# notes.txt as of 10:30". Anywhere else ("ls restore/") they are just words.
+LEAD_WORDS = {
+    "undo": "ROLLBACK",
+    "revert": "ROLLBACK",
+    "rollback": "ROLLBACK",
+    "undelete": "ROLLBACK",
+    "restore": "RESTORE_BACKUP",
+    "recover": "RESTORE_BACKUP",
+}
+
+MODE_PHRASES = ["change mode", "set mode", "switch mode"]
+PREFIX_ROUTES = {
+    "mode": "MODE",
+    "switch": "MODE",
+    "explain": "EXPLAIN",
+    "teach me": "LEARN",
+    "learn": "LEARN",
+    "how to": "LEARN",
+}
+
+# Checked in this order, mirroring the original if-chain in main.run_ui
+ROUTE_PRIORITY = ["MODE", "EXPLAIN", "LEARN", "INTERACTIVE", "NL"]
+
+# Shell built-ins a raw command can start with that aren't found on PATH
+SHELL_BUILTINS = {
+    "cd", "echo", "export", "source", "alias", "unset", "pushd", "popd",
+    "type", "dir", "cls", "del", "ren", "md", "rd", "set",
+}
+
+
+@lru_cache(maxsize=1024)
+def runs_program(word):
+    """True when the shell would run `word` as argv[0]: a path, a built-in or an executable on PATH."""
+    return "/" in word or "\\" in word or word in SHELL_BUILTINS or shutil.which(word) is not None
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over whole-word phrases.
+
+    All phrases are matched in one left-to-right scan of the input,
+    independent of how many phrases were added. A match only counts when it
+    sits on word boundaries, so "go" no longer fires inside "google".
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+
+    def add(self, phrase, payload):
+        phrase = phrase.lower().strip()
+        if not phrase:
+            return
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(phrase), payload))
+        self._built = False
+
+    def build(self):
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def find_all(self, text):
+        """Yields (start, end, payload) for every word-bounded phrase in `text` (lowercased)."""
+        if not self._built:
+            self.build()
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            for length, payload in out[state]:
+                start = end - length
+                if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                    continue
+                if end < n and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                    continue
+                yield start, end, payload
+
+
+class InputRouter:
+    """
+    Classifies a line of input in a single pass over one precompiled automaton
+    built from intents.json, plugin phrases and the REPL's routing keywords.
+    """
+
+    def __init__(self, base_intents, plugins=()):
+        self.automaton = PhraseAutomaton()
+        order = 0
+
+        orders = {}
+        for intent, phrases in base_intents.items():
+            for phrase in phrases:
+                self.automaton.add(phrase, ("intent", intent, order))
+            orders[intent] = order
+            order += 1
+        for word, intent in LEAD_WORDS.items():
+            if intent in orders:
+                self.automaton.add(word, ("lead", intent, orders[intent]))
+
+        for plugin in plugins:
+            for intent, phrases in getattr(plugin, "phrases", {}).items():
+                for phrase in phrases:
+                    self.automaton.add(phrase, ("intent", intent, order))
+                order += 1
+
+        for keyword in NL_KEYWORDS:
+            self.automaton.add(keyword, ("nl", None, 0))
+        for phrase in MODE_PHRASES:
+            self.automaton.add(phrase, ("route", "MODE", 0))
+        for phrase, route in PREFIX_ROUTES.items():
+            self.automaton.add(phrase, ("prefix", route, 0))
+        for command in INTERACTIVE_COMMANDS:
+            self.automaton.add(command, ("command", "INTERACTIVE", 0))
+
+        self.automaton.build()
+
+    def route(self, sentence):
+        text = sentence.lower()
+        routes = {}
+        nl = False    # an NL keyword was seen
+        lead = False  # an intent phrase opens the input ("undo", "make folder x")
+        best = None  # (length, -start, -order) ranks longest, then leftmost, then first-defined
+
+        for start, end, (kind, value, order) in self.automaton.find_all(text):
+            if kind == "intent" or (kind == "lead" and start == 0):
+                lead = lead or start == 0
+                rank = (end - start, -start, -order)
+                if best is None or rank > best[0]:
+                    best = (rank, value, (start, end))
+            elif kind == "nl":
+                nl = True
+            elif kind == "route":
+                routes.setdefault(value, (start, end))
+            elif start == 0:
+                # Prefix routes and interactive programs only count as the first word;
+                # a program name must be followed by whitespace (argv[0], not "vim.txt")
+                if kind == "command" and end < len(text) and not text[end].isspace():
+                    continue
+                routes.setdefault(value, (start, end))
+
+        intent, intent_span = ("UNKNOWN", None) if best is None else (best[1], best[2])
+        # A phrase further in only makes it natural language when the rest reads
+        # like it, and never when it starts with a program: "cat history.txt",
+        # "echo undo" and "git log --since=today" are shell commands.
+        if lead or (nl and not runs_program(text.split(None, 1)[0])):
+            routes.setdefault("NL", intent_span)
+
+        for route in ROUTE_PRIORITY:
+            if route in routes:
+                span = intent_span if route == "NL" else routes[route]
+                return Route(route, intent, span)
+        return Route("RAW", intent, None)
+
+    def detect_intent(self, sentence):
+        return self.route(sentence).intent
@@ -0,0 +1,155 @@
+import math
+import re
+import threading
+from collections import Counter, namedtuple
+
+# The classifier's answer for one sentence: the best intent, how likely it is
+# to be right (calibrated, comparable to CONFIDENCE_THRESHOLD), the raw cosine
+# score, its lead over the runner-up intent, and the bank phrase it was closest to.
+Guess = namedtuple("Guess", ["intent", "confidence", "score", "margin", "phrase"])
+
+# Handled by the router's prefix routes, never by an NL intent
+ROUTED_INTENTS = {"EXPLAIN", "LEARN"}
+
+_WORD = re.compile(r"[a-z0-9]+")
+_NGRAMS = (3, 4)
+# Words that say nothing about the intent but would dilute every match
+_STOPWORDS = {"a", "an", "the", "this", "that", "of", "for", "is", "i", "me", "all", "some", "here", "now", "please"}
+
+def _features(text):
+    """Sublinear TF over whole words and the char 3/4-grams inside each word ("folders" ~ "folder")."""
+    counts = Counter()
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        counts["w:" + word] += 1
+        padded = f" {word} "
+        for n in _NGRAMS:
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+    return {f: 1.0 + math.log(c) for f, c in counts.items()}
+
+class IntentClassifier:
+    """
+    Nearest-phrase intent classifier over the phrase bank (intents.json,
+    plugin phrases, learned phrasings), for sentences no phrase matched
+    exactly.
+
+    Every bank phrase is a TF-IDF row in one L2-normalized matrix, so
+    scoring a sentence is one matrix-vector product; an intent scores as
+    its best phrase. The confidence is a logistic fit of P(correct) on the
+    top score and the margin over the runner-up, trained leave-one-out on
+    the bank itself (each phrase classified against all the others), which
+    is what an unseen paraphrase looks like.
+    """
+
+    def __init__(self, bank):
+        import numpy as np
+        self._np = np
+
+        # Rows grouped by intent, so per-intent maxima are one reduceat
+        bank = sorted(((intent, phrase) for intent, phrase in bank if intent not in ROUTED_INTENTS),
+                      key=lambda ip: ip[0])
+        self.phrases = [phrase for _, phrase in bank]
+        labels = [intent for intent, _ in bank]
+        self.intents = sorted(set(labels))
+        self._starts = np.array([labels.index(i) for i in self.intents], dtype=np.intp)
+        self._labels = np.array([self.intents.index(i) for i in labels], dtype=np.intp)
+
+        docs = [_features(p) for p in self.phrases]
+        df = Counter(f for doc in docs for f in doc)
+        self.vocab = {f: j for j, f in enumerate(df)}
+        n = len(docs)
+        self._idf = np.array([math.log((1 + n) / (1 + df[f])) + 1 for f in self.vocab], dtype=np.float32)
+        self._oov_idf = math.log(1 + n) + 1
+
+        matrix = np.zeros((n, len(self.vocab)), dtype=np.float32)
+        for i, doc in enumerate(docs):
+            for f, tf in doc.items():
+                matrix[i, self.vocab[f]] = tf
+        matrix *= self._idf
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        self._matrix = matrix
+        self._weights = self._calibrate()
+
+    def _vector(self, text):
+        np = self._np
+        q = np.zeros(len(self.vocab), dtype=np.float32)
+        oov = 0.0
+        for f, tf in _features(text).items():
+            j = self.vocab.get(f)
+            if j is None:
+                oov += (tf * self._oov_idf) ** 2  # unknown words still dilute the match
+            else:
+                q[j] = tf * self._idf[j]
+        norm = math.sqrt(float(q @ q) + oov)
+        return q / norm if norm else q
+
+    def _intent_scores(self, scores):
+        return self._np.maximum.reduceat(scores, self._starts, axis=-1)
+
+    def _top2(self, intent_scores):
+        """(best intent, its score, its lead over the runner-up), for one row or many."""
+        ordered = self._np.sort(intent_scores, axis=-1)
+        top = ordered[..., -1]
+        second = ordered[..., -2] if intent_scores.shape[-1] > 1 else self._np.zeros_like(top)
+        return intent_scores.argmax(axis=-1), top, top - second
+
+    def _calibrate(self):
+        """Logistic regression of "nearest intent was right" on (score, margin), by Newton's method."""
+        np = self._np
+        sims = self._matrix @ self._matrix.T
+        np.fill_diagonal(sims, -1.0)  # leave the phrase itself out
+        best, top, margin = self._top2(self._intent_scores(sims))
+        y = (best == self._labels).astype(np.float64)
+        x = np.column_stack([np.ones_like(top), top, margin]).astype(np.float64)
+        w = np.zeros(3)
+        if 0 < y.sum() < len(y):
+            for _ in range(50):
+                p = 1 / (1 + np.exp(-x @ w))
+                hessian = x.T @ (x * (p * (1 - p))[:, None]) + 1e-3 * np.eye(3)
+                step = np.linalg.solve(hessian, x.T @ (y - p) - 1e-3 * w)
+                w += step
+                if np.abs(step).max() < 1e-6:
+                    break
+        else:
+            # Nothing to learn from (a tiny bank): trust the raw score, discounted by a tie
+            w = np.array([-4.0, 4.0, 8.0])
+        return w
+
+    def classify(self, sentence):
+        """Guess for `sentence`, or None when it shares nothing with the bank."""
+        q = self._vector(sentence)
+        if not q.any():
+            return None
+        scores = self._matrix @ q
+        best, top, margin = self._top2(self._intent_scores(scores))
+        best, top, margin = int(best), float(top), float(margin)
+        w = self._weights
+        confidence = 1 / (1 + math.exp(-(w[0] + w[1] * top + w[2] * margin)))
+        start = self._starts[best]
+        end = self._starts[best + 1] if best + 1 < len(self._starts) else len(self.phrases)
+        phrase = self.phrases[start + int(scores[start:end].argmax())]
+        return Guess(self.intents[best], confidence, top, margin, phrase)
+
+_classifier = None
+_classifier_key = None
+_classifier_lock = threading.Lock()
+
+def get_classifier(key, bank):
+    """
+    The classifier for the current phrase bank: `bank()` returns
+    [(intent, phrase)], and is only called to rebuild (a few ms) when `key`
+    changes, i.e. when phrases were learned or forgotten. None without NumPy.
+    """
+    global _classifier, _classifier_key
+    if _classifier is not None and key == _classifier_key:
+        return _classifier
+    with _classifier_lock:
+        if _classifier is None or key != _classifier_key:
+            try:
+                _classifier = IntentClassifier(bank())
+            except ImportError:
+                return None
+            _classifier_key = key
+    return _classifier
@@ -1,91 +1,202 @@
 import json
+import os
 import re
-from plugin_loader import load_plugins
+from collections import namedtuple
+from config import BASE_DIR, PHRASE_LEARNING, INTENT_CLASSIFIER, CONFIDENCE_THRESHOLD, CLASSIFIER_EXCLUDED_INTENTS
+from plugin_loader import get_registry
+from input_router import InputRouter
+from phrase_memory import get_phrase_memory, literal_text
+from intent_classifier import get_classifier
+from tracing import traced
 
-with open("intents.json") as f:
+with open(os.path.join(BASE_DIR, "intents.json")) as f:
     BASE_INTENTS = json.load(f)
 
-PLUGINS = load_plugins()
+# One automaton over every base and plugin phrase, built once at import.
+# Plugin phrases come from the registry manifest; no plugin is imported here.
+ROUTER = InputRouter(BASE_INTENTS, get_registry().specs)
+
+@traced("route")
+def route_input(sentence):
+    """Single-pass classification of a REPL line -> Route(route, intent, span)."""
+    return ROUTER.route(sentence)
 
 def detect_intent(sentence):
-    sentence = sentence.lower()
+    intent = ROUTER.detect_intent(sentence)
+    if intent == "UNKNOWN":
+        learned = match_learned(sentence, record=False)
+        if learned:
+            intent = learned[0]
+    return intent
+
+# --- Learned phrasings -----------------------------------------------------
+#
+# Sentences no phrase matched but the AI (or the user's pick from its
+# suggestions) resolved are remembered as templates; the next sentence of
+# the same shape resolves here, without a model call.
+
+@traced("learned")
+def match_learned(sentence, record=True):
+    """(intent, entities) from a learned phrasing, or None."""
+    if not PHRASE_LEARNING:
+        return None
+    return get_phrase_memory().match(sentence, record)
+
+def learn_phrase(sentence, intent, entities, source="ai"):
+    if PHRASE_LEARNING:
+        get_phrase_memory().learn(sentence, intent, entities, source)
+
+# --- Entity extraction -----------------------------------------------------
+#
+# One grammar per family of intents, compiled once at import. The detected
+# intent picks its grammar, so a sentence costs a single regex search.
+# Matching runs on the original text (case-insensitive flags only), so
+# "Report.PDF" stays "Report.PDF" and quoted spans survive intact.
+
+Entity = namedtuple("Entity", ["slot", "type", "value", "start", "end", "quoted"])
 
-    # Base intents
-    for intent, phrases in BASE_INTENTS.items():
-        for phrase in phrases:
-            if phrase in sentence:
-                return intent
+_QUOTED = r'"[^"]*"|\'[^\']*\''
+_PATH = r'[^\s"\']+'
+_NOUN = r'(?:the\s+)?(?:file|folder|dir|directory)'
 
-    # Plugin intents
-    for plugin in PLUGINS:
-        for phrase in plugin.get("phrases", []):
-            if phrase in sentence:
-                return plugin.get("intent")
+# Group names are the entity slot; a "_suffix" distinguishes alternatives for the same slot
+_GRAMMARS = {
+    "TRANSFER": (
+        rf'\b(?:move|copy|rename)\s+(?:{_NOUN}\s+)?(?P<source>{_QUOTED}|.+?)'
+        rf'\s+(?:to|into|as)\s+(?:{_NOUN}\s+)?(?P<destination>{_QUOTED}|.+?)\s*$',
+        "path",
+    ),
+    "PATH": (
+        rf'\b(?:file|folder|dir|directory)\s+(?:named\s+|called\s+)?(?P<name>{_QUOTED}|{_PATH})'
+        rf'|(?P<name_quoted>{_QUOTED})',
+        "path",
+    ),
+    "NAVIGATE": (
+        rf'\b(?:go\s+to|open|cd)\s+(?:the\s+)?(?:(?:folder|dir|directory)\s+)?(?P<name>{_QUOTED}|{_PATH})',
+        "path",
+    ),
+    "PACKAGE": (
+        r'\b(?:install\s+update|upgrade|update)\s+(?:package\s+)?(?P<name>[\w\-.]+)',
+        "package",
+    ),
+    "RESTORE": (
+        rf'\b(?:restore|recover|revert)\s+(?:(?:the\s+)?(?:backup|version)\s+of\s+)?(?:{_NOUN}\s+)?(?P<name>{_QUOTED}|.+?)'
+        rf'(?:\s+from\s+(?:the\s+)?backups?)?(?:\s+(?:as\s+of|as\s+it\s+was\s+at|at)\s+(?P<when>.+?))?\s*$',
+        "path",
+    ),
+    "BACKUPS": (
+        rf'\bbackups?\s+(?:for|of|in|under)\s+(?:(?P<name_here>this\s+(?:dir|directory|folder)|here)\b'
+        rf'|(?:{_NOUN}\s+)?(?P<name>{_QUOTED}|{_PATH}))',
+        "path",
+    ),
+    "PROCESS": (
+        rf'\b(?:kill\s+process|stop\s+program|end\s+task|terminate|kill|stop)\s+(?P<name>{_QUOTED}|.+?)\s*$',
+        "process",
+    ),
+}
 
-    return "UNKNOWN"
+INTENT_GRAMMAR = {
+    "MOVE_FILE": "TRANSFER",
+    "COPY_FILE": "TRANSFER",
+    "RENAME_FILE": "TRANSFER",
+    "CREATE_FOLDER": "PATH",
+    "DELETE_FOLDER": "PATH",
+    "CREATE_FILE": "PATH",
+    "DELETE_FILE": "PATH",
+    "CAT_FILE": "PATH",
+    "GO_TO": "NAVIGATE",
+    "UPGRADE_PACKAGE": "PACKAGE",
+    "KILL_PROCESS": "PROCESS",
+    "RESTORE_BACKUP": "RESTORE",
+    "LIST_BACKUPS": "BACKUPS",
+}
 
-def extract_entities(sentence):
+def _compile_grammar(pattern, etype, prefix=""):
+    if prefix:
+        pattern = re.sub(r'\(\?P<(\w+)>', rf'(?P<{prefix}__\1>', pattern)
+    regex = re.compile(pattern, re.IGNORECASE)
+    slots = {g: (g.rsplit("__", 1)[-1].split("_")[0], etype) for g in regex.groupindex}
+    return regex, slots
+
+_COMPILED = {key: _compile_grammar(p, t) for key, (p, t) in _GRAMMARS.items()}
+
+def _compile_generic():
+    """Unknown / unmapped intents: every grammar as one alternation (transfers first)."""
+    parts, slots = [], {}
+    for i, (pattern, etype) in enumerate(_GRAMMARS.values()):
+        regex, part_slots = _compile_grammar(pattern, etype, f"g{i}")
+        parts.append(f"(?:{regex.pattern})")
+        slots.update(part_slots)
+    return re.compile("|".join(parts), re.IGNORECASE), slots
+
+_GENERIC = _compile_generic()
+
+def extract_entity_spans(sentence, intent=None):
     """
-    Extracts entities using Regex patterns for meaningful capture.
+    Returns typed entities as Entity(slot, type, value, start, end, quoted).
+    `value` has surrounding quotes removed; start/end index the original
+    sentence and include the quotes.
     """
-    sentence = sentence.lower()
-    entities = {"name": None, "source": None, "destination": None}
+    regex, slots = _COMPILED.get(INTENT_GRAMMAR.get(intent), _GENERIC)
+    match = regex.search(sentence)
+    if not match:
+        return []
 
-    # 1. Movement/Copying (Source -> Destination)
-    # create specific patterns first because they are more complex
-    
-    move_match = re.search(r'(?:move|copy|rename)\s+(.*?)\s+to\s+(.*)', sentence)
-    if move_match:
-        entities["source"] = move_match.group(1).strip()
-        entities["destination"] = move_match.group(2).strip()
-        
-        # We DO NOT strip quotes here. 
-        # If the user typed 'move "folder a" to b', we want source='"folder a"'.
-        # This ensures the shell command receives the quotes it needs for spaces.
-        
-        # Clean up "file"/"folder" prefixes if they were inside the capture (unlikely due to regex greedy, but possible)
-        # But we must be careful not to strip "file" from "file.txt"
-        # Regex: remove prefix "file " or "folder " ONLY if valid
-        
-        for key in ["source", "destination"]:
-            val = entities[key]
-            # optional: clean up "file " prefix if not inside quotes?
-            # For now, let's just keep it simple. User input is respected.
-            pass
-            
-        return entities
-
-    # 2. Single Name Operations (Create/Delete/Open)
-    
-    # Check for quoted name specifically for single-argument commands
-    quoted = re.search(r'["\'](.*?)["\']', sentence)
-    if quoted:
-        # Use group(0) to keep the quotes!
-        # "My File" -> "My File"
-        start, end = quoted.span()
-        # Ensure it's not just a fragment? No, we trust the quote.
-        entities["name"] = sentence[start:end] 
-        return entities 
-
-    # Fallback: capture last word or phrase after keywords
-    # create folder X
-    match = re.search(r'(?:file|folder|dir|directory)\s+([a-zA-Z0-9_\-\.]+(?:\.[a-z]+)?)', sentence)
-    if match:
-        entities["name"] = match.group(1)
-    
-    # Upgrade/Update Packages
-    upgrade_match = re.search(r'(?:upgrade|update|install update)\s+([a-zA-Z0-9_\-\.]+)', sentence)
-    if upgrade_match:
-        name = upgrade_match.group(1).strip()
-        # prevent capturing "pip" here if possible, but command_mapper will prefer UPGRADE_PIP if intent matches
-        entities["name"] = name
-        return entities
-
-    # Process Killing
-    # Match longer phrases first to avoid capturing 'process' as part of the name
-    kill_match = re.search(r'(?:kill process|stop program|end task|terminate|kill|stop)\s+(.*)', sentence)
-    if kill_match:
-        entities["name"] = kill_match.group(1).strip()
-        return entities
+    entities = []
+    for group, (slot, etype) in slots.items():
+        start, end = match.span(group)
+        if start < 0:
+            continue
+        raw = sentence[start:end]
+        quoted = len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in "\"'"
+        entities.append(Entity(slot, etype, raw[1:-1] if quoted else raw, start, end, quoted))
+    return entities
 
+@traced("entities")
+def extract_entities(sentence, intent=None):
+    """
+    Extracts name / source / destination for the given intent.
+    Quoted values keep their quotes so the shell receives names with spaces intact.
+    """
+    entities = {"name": None, "source": None, "destination": None}
+    for entity in extract_entity_spans(sentence, intent):
+        entities[entity.slot] = sentence[entity.start:entity.end]
     return entities
+
+# --- Nearest-phrase classifier ---------------------------------------------
+#
+# The tier between the phrase matcher and the LLM: paraphrases close enough
+# to a known phrase ("how much memory is free" ~ "how much memory") resolve
+# locally when its calibrated confidence clears CONFIDENCE_THRESHOLD.
+
+def _phrase_bank():
+    bank = [(intent, phrase) for intent, phrases in BASE_INTENTS.items() for phrase in phrases]
+    for spec in get_registry().specs:
+        bank += [(intent, phrase) for intent, phrases in spec.phrases.items() for phrase in phrases]
+    if PHRASE_LEARNING:
+        bank += [(p.intent, literal_text(p.template)) for p in get_phrase_memory().phrases()]
+    return bank
+
+@traced("classifier")
+def classify_intent(sentence):
+    """
+    Guess(intent, confidence, score, margin, phrase) from the classifier, or
+    None (disabled, NumPy missing, or no word in common with any phrase).
+    Entity values are cut out first, so "notes.txt" doesn't dilute the match.
+    """
+    if not INTENT_CLASSIFIER:
+        return None
+    classifier = get_classifier(get_phrase_memory().version if PHRASE_LEARNING else 0, _phrase_bank)
+    if classifier is None:
+        return None
+    text = sentence
+    for entity in sorted(extract_entity_spans(sentence), key=lambda e: e.start, reverse=True):
+        text = text[:entity.start] + " " + text[entity.end:]
+    return classifier.classify(text)
+
+def confident_guess(sentence):
+    """The classifier's guess when it may be acted on without asking the LLM, else None."""
+    guess = classify_intent(sentence)
+    if guess is None or guess.confidence < CONFIDENCE_THRESHOLD or guess.intent in CLASSIFIER_EXCLUDED_INTENTS:
+        return None
+    return guess
@@ -1,9 +1,30 @@
 import subprocess
 import json
 import re
-from config import AI_MODEL, AI_TIMEOUT
+import codecs
+import threading
+from config import AI_MODEL, AI_TIMEOUT, AI_BACKEND, LLM_CACHE_ENABLED
+from ollama_client import get_client, OllamaError, OllamaUnavailable
+from model_manager import get_model
+from response_cache import get_cache
+from tracing import traced, traced_stream
 
+@traced("llm")
 def run_llm(prompt):
+    if AI_BACKEND == "http":
+        # Sent mid warm-up, the query would spend its AI_TIMEOUT waiting for the weights
+        get_model().wait()
+        try:
+            return get_client().generate(prompt).strip()
+        except OllamaUnavailable:
+            # Server not reachable over HTTP -> fall back to the CLI below
+            pass
+        except OllamaError:
+            return ""
+
+    return _run_llm_cli(prompt)
+
+def _run_llm_cli(prompt):
     try:
         # Check if ollama is running first (simple ping check could be added in main, 
         # but here we just try-except properly)
@@ -22,6 +43,114 @@ def run_llm(prompt):
     except Exception:
         return ""
 
+@traced_stream("llm_stream")
+def stream_llm(prompt):
+    """
+    Yields the model's answer token by token as soon as it is generated.
+    Mirrors run_llm: HTTP first, CLI fallback, and silence instead of exceptions.
+    The generator's return value is True only when the answer was complete
+    (Ollama sent "done", or the CLI exited 0 within AI_TIMEOUT).
+    """
+    if AI_BACKEND == "http":
+        get_model().wait()
+        started = False
+        try:
+            for token in get_client().generate_stream(prompt):
+                started = True
+                yield token
+            return True
+        except OllamaUnavailable:
+            if started:
+                return False
+        except OllamaError:
+            return False
+
+    return (yield from _stream_llm_cli(prompt))
+
+def _stream_llm_cli(prompt):
+    try:
+        proc = subprocess.Popen(
+            ["ollama", "run", AI_MODEL],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+    except Exception:
+        return False
+
+    # Same budget as the blocking call: kill the model run after AI_TIMEOUT
+    timer = threading.Timer(AI_TIMEOUT, proc.kill)
+    timer.start()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    try:
+        proc.stdin.write(prompt.encode("utf-8"))
+        proc.stdin.close()
+        while True:
+            chunk = proc.stdout.read1(1024)
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        # Killed by the AI_TIMEOUT timer, the run exits non-zero
+        return proc.wait() == 0
+    except Exception:
+        return False
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+
+def cached_llm(prompt, use_cache=True):
+    """
+    run_llm behind the response cache.
+    use_cache=False skips the lookup but still stores the fresh answer.
+    """
+    if not LLM_CACHE_ENABLED:
+        return run_llm(prompt)
+
+    cache = get_cache()
+    if use_cache:
+        hit = cache.get(prompt)
+        if hit is not None:
+            return hit
+
+    response = run_llm(prompt)
+    cache.put(prompt, response)
+    return response
+
+def stream_cached(prompt, use_cache=True):
+    """stream_llm behind the response cache; a hit is yielded in one piece."""
+    if not LLM_CACHE_ENABLED:
+        yield from stream_llm(prompt)
+        return
+
+    cache = get_cache()
+    if use_cache:
+        hit = cache.get(prompt)
+        if hit is not None:
+            yield hit
+            return
+
+    parts = []
+    stream = stream_llm(prompt)
+    try:
+        while True:
+            try:
+                token = next(stream)
+            except StopIteration as end:
+                complete = end.value
+                break
+            parts.append(token)
+            yield token
+    finally:
+        stream.close()
+    # An answer cut off by an error or the timeout would be replayed as if it were whole
+    if complete:
+        cache.put(prompt, "".join(parts).strip())
+
 def extract_json(text):
     """
     Robustly extract JSON object or array from LLM output using regex.
@@ -41,62 +170,113 @@ def extract_json(text):
     except json.JSONDecodeError:
         return None
 
-def ai_interpret(sentence):
+def build_intent_catalog(base_intents, supported_intents):
+    """
+    Lines like "CREATE_FOLDER (e.g. create folder, make folder)" for every
+    intent the terminal can actually act on, in intents.json order first.
+    """
+    lines = []
+    for intent in list(base_intents) + [i for i in supported_intents if i not in base_intents]:
+        if intent not in supported_intents:
+            continue
+        examples = ", ".join(base_intents.get(intent, [])[:3])
+        lines.append(f"{intent} (e.g. {examples})" if examples else intent)
+    return "\n".join(lines)
+
+def _normalize_candidate(raw, allowed):
+    if not isinstance(raw, dict):
+        return None
+    intent = str(raw.get("intent", "")).strip().upper()
+    if intent not in allowed:
+        return None
+    try:
+        confidence = min(max(float(raw.get("confidence", 0.0)), 0.0), 1.0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    entities = raw.get("entities") if isinstance(raw.get("entities"), dict) else {}
+    # The mapper expects these three keys; partial LLM output must not break it
+    for key in ["name", "source", "destination"]:
+        entities[key] = entities.get(key) or None
+    return {
+        "intent": intent,
+        "entities": entities,
+        "confidence": confidence,
+        "description": raw.get("description") or intent.replace("_", " ").lower(),
+    }
+
+def ai_interpret_ranked(sentence, intent_catalog, max_alternatives=3):
+    """
+    One LLM round-trip returning the best interpretation plus up to
+    `max_alternatives` ranked alternatives, each with its own confidence:
+
+        {"intent", "entities", "confidence", "description", "alternatives": [...]}
+
+    The caller decides offline whether to run the top pick or offer a menu.
+    """
+    allowed = {line.split(" ", 1)[0] for line in intent_catalog.splitlines() if line.strip()}
     prompt = f"""
 You are an NLP engine for a terminal assistant.
-Extract intent and entities from the user's sentence.
+Interpret the user's sentence and rank the most likely intents.
 
 Allowed intents:
-CREATE_FOLDER, DELETE_FOLDER,
-CREATE_FILE, DELETE_FILE,
-RENAME_FILE, MOVE_FILE, COPY_FILE,
-LIST_FILES, CURRENT_DIR,
-GO_TO, GO_BACK, GO_HOME,
-CAT_FILE, WHOAMI, SYSTEM_INFO
+{intent_catalog}
 
 Sentence: "{sentence}"
 
-Return ONLY valid JSON with this structure:
+Return ONLY valid JSON with this structure, best candidate first,
+at most {max_alternatives + 1} candidates:
 {{
-  "intent": "INTENT_NAME",
-  "entities": {{
-    "name": "filename or foldername",
-    "source": "source_path",
-    "destination": "dest_path"
-  }},
-  "confidence": 0.0 to 1.0 (float)
+  "candidates": [
+    {{
+      "intent": "INTENT_NAME",
+      "entities": {{
+        "name": "filename or foldername",
+        "source": "source_path",
+        "destination": "dest_path"
+      }},
+      "confidence": 0.0 to 1.0 (float),
+      "description": "Short human readable description"
+    }}
+  ]
 }}
 """
-    response = run_llm(prompt)
-    data = extract_json(response)
-    
-    if data:
-        return data
-        
-    return {"intent": "UNKNOWN", "entities": {}, "confidence": 0.0}
+    data = extract_json(run_llm(prompt))
 
-def ai_suggest_options(sentence):
-    prompt = f"""
-A user entered the following ambiguous command: "{sentence}"
-
-Suggest up to 3 possible intended actions.
-Return ONLY a JSON array:
-[
-  {{
-    "intent": "INTENT_NAME",
-    "entities": {{ "source": "", "destination": "", "name": "" }},
-    "description": "Short human readable description"
-  }}
-]
-"""
-    response = run_llm(prompt)
-    data = extract_json(response)
-    return data if data else []
+    if isinstance(data, dict):
+        raw_candidates = data.get("candidates", [data])
+    elif isinstance(data, list):
+        raw_candidates = data
+    else:
+        raw_candidates = []
+
+    candidates = []
+    for raw in raw_candidates:
+        candidate = _normalize_candidate(raw, allowed)
+        if candidate and all(c["intent"] != candidate["intent"] or c["entities"] != candidate["entities"] for c in candidates):
+            candidates.append(candidate)
+    candidates.sort(key=lambda c: c["confidence"], reverse=True)
+
+    if not candidates:
+        return {"intent": "UNKNOWN", "entities": {}, "confidence": 0.0, "description": "", "alternatives": []}
+
+    top = dict(candidates[0])
+    top["alternatives"] = candidates[1:max_alternatives + 1]
+    return top
+
+def _explain_prompt(topic):
+    return f"Explain the terminal command '{topic}' simply and briefly."
+
+def _teach_prompt(topic):
+    return f"Teach a beginner how to use '{topic}' in the terminal. Provide examples."
+
+def ai_explain(topic, use_cache=True):
+    return cached_llm(_explain_prompt(topic), use_cache)
+
+def ai_teach(topic, use_cache=True):
+    return cached_llm(_teach_prompt(topic), use_cache)
 
-def ai_explain(topic):
-    prompt = f"Explain the terminal command '{topic}' simply and briefly."
-    return run_llm(prompt)
+def ai_explain_stream(topic, use_cache=True):
+    return stream_cached(_explain_prompt(topic), use_cache)
 
-def ai_teach(topic):
-    prompt = f"Teach a beginner how to use '{topic}' in the terminal. Provide examples."
-    return run_llm(prompt)
+def ai_teach_stream(topic, use_cache=True):
+    return stream_cached(_teach_prompt(topic), use_cache)
@@ -1,30 +1,184 @@
 from datetime import datetime
+import atexit
+import contextvars
+import gzip
+import json
 import os
+import queue
+import shutil
+import threading
+import time
+from config import BASE_DIR, LOG_MAX_BYTES, LOG_BACKUPS, LOG_FLUSH_INTERVAL, LOG_QUEUE_SIZE
 
-LOG_DIR = "logs"
-LOG_FILE = "command_log.txt"
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+LOG_FILE = "command_log.jsonl"
+LEGACY_LOG_FILE = "command_log.txt"  # the old pipe-delimited log; no longer written
 
-def log_action(user_input, intent, command, status, message=""):
-    # 🔒 Defensive filesystem handling
-    if os.path.exists(LOG_DIR):
-        if not os.path.isdir(LOG_DIR):
+_BATCH = 512  # records written per write() call at most
+_STOP = object()
+
+# perf_counter() when the current input arrived; log_action adds elapsed_ms from it
+_action_started = contextvars.ContextVar("action_started", default=None)
+
+def start_action():
+    """Marks the start of handling one input (per asyncio task / thread), for elapsed_ms."""
+    _action_started.set(time.perf_counter())
+
+class ActionLogger:
+    """
+    Writes action records as JSON lines from a background thread.
+
+    log() only puts a dict on a bounded queue, so the REPL never waits for
+    the disk; if the writer ever falls LOG_QUEUE_SIZE records behind, new
+    records are dropped (and counted) instead. The writer keeps the file
+    open and writes what queued up within LOG_FLUSH_INTERVAL seconds in one
+    go, so at most that much is lost if the process is killed; atexit
+    writes out the rest. Past LOG_MAX_BYTES the file is rotated to
+    command_log.jsonl.1.gz (gzip), keeping LOG_BACKUPS of them.
+    """
+
+    def __init__(self, log_dir=LOG_DIR, filename=LOG_FILE, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 flush_interval=LOG_FLUSH_INTERVAL, queue_size=LOG_QUEUE_SIZE):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, filename)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._thread = None
+        self._sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, callback):
+        """Registers callback(records), called on the writer thread with every batch after it is written."""
+        self._sinks.append(callback)
+
+    def log(self, record):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="nl-logger", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # --- writer thread ---------------------------------------------------
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect for up to one flush interval, so a burst costs one write + flush
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < _BATCH and batch[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = any(r is _STOP for r in batch)
+            records = [r for r in batch if r is not _STOP]
+            self._write(records)
+            for sink in list(self._sinks):
+                try:
+                    if records:
+                        sink(records)
+                except Exception:
+                    self.errors += 1
+            if stop:
+                self._close_file()
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        lines = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+        try:
+            if self._file is None:
+                self._open()
+            self._file.write(lines)
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except (OSError, ValueError):
+            self.errors += 1  # disk full, log dir gone...: lose this batch, never the REPL
+            self._close_file()
+
+    def _open(self):
+        # 🔒 Defensive filesystem handling
+        if os.path.exists(self.log_dir) and not os.path.isdir(self.log_dir):
             # 'logs' exists but is a FILE → remove it
-            os.remove(LOG_DIR)
+            os.remove(self.log_dir)
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def rotated_path(self, n):
+        return f"{self.path}.{n}.gz"
+
+    def _rotate(self):
+        self._close_file()
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(self.rotated_path(n)):
+                os.replace(self.rotated_path(n), self.rotated_path(n + 1))
+        if self.backups > 0:
+            tmp = self.rotated_path(1) + ".tmp"
+            with open(self.path, "rb") as src, gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, self.rotated_path(1))
+        os.remove(self.path)
 
-    os.makedirs(LOG_DIR, exist_ok=True)
+    # --- shutdown --------------------------------------------------------
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def close(self, timeout=2.0):
+        """Writes out everything queued so far (registered with atexit once the writer starts)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
 
-    log_entry = (
-        f"[{timestamp}] | "
-        f"INPUT: {user_input} | "
-        f"INTENT: {intent} | "
-        f"COMMAND: {command} | "
-        f"STATUS: {status} | "
-        f"MESSAGE: {message}\n"
-    )
+_logger = ActionLogger()
 
-    log_path = os.path.join(LOG_DIR, LOG_FILE)
+def get_logger():
+    return _logger
 
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(log_entry)
+def log_action(user_input, intent, command, status, message="", **fields):
+    """
+    Queues one action record. Extra keyword arguments (exit_code=..., etc.)
+    become extra fields; elapsed_ms is filled in after start_action().
+    """
+    record = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "input": user_input,
+        "intent": intent,
+        "command": command,
+        "status": status,
+        "message": message,
+    }
+    started = _action_started.get()
+    if started is not None:
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    record.update(fields)
+    _logger.log(record)
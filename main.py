@@ -1,41 +1,28 @@
+import os
 import sys
+import asyncio
+import signal
 import subprocess
-import time
 import logging
 
 from os_detector import get_os
-from intent_parser import detect_intent, extract_entities
-from local_ai import (
-    ai_interpret,
-    ai_suggest_options,
-    ai_explain,
-    ai_teach,
-)
-from command_mapper import map_command
-from executor import execute, is_interactive
-from pty_executor import run_interactive
-from safety import is_safe, confirm_action
-from logger import log_action
-from error_intelligence import explain_error
 from session import Session
 from ui import TerminalUI
-from backup_manager import BackupManager
-from config import CONFIDENCE_THRESHOLD, LOW_CONFIDENCE_FLOOR, AI_MODEL
-from output_formatter import (
-    format_output, 
-    format_ai_insight, 
-    format_ai_explanation, 
-    format_ai_lesson
-)
+from config import AI_BACKEND, BASE_DIR, TRACE_DUMP_FILE
+from async_input import AsyncInput
+from tracing import span, dump_on_exit
 
 # Setup logging
 logging.basicConfig(
-    filename="nl_terminal.log",
+    filename=os.path.join(BASE_DIR, "nl_terminal.log"),
     level=logging.ERROR,
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
 def is_ollama_running():
+    from ollama_client import get_client
+    if AI_BACKEND == "http" and get_client().is_available():
+        return True
     try:
         # Just check if 'ollama list' returns 0, fast check
         subprocess.run(["ollama", "list"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
@@ -43,203 +30,153 @@ def is_ollama_running():
     except (subprocess.CalledProcessError, FileNotFoundError):
         return False
 
-def looks_like_nl(sentence):
-    keywords = [
-        "create", "delete", "remove", "make", "move", "copy",
-        "show", "list", "where", "go", "open",
-        "explain", "teach", "how",
-        "change", "switch", "set", "read", "check", "what",
-        "install", "update", "upgrade"
-    ]
-    return any(k in sentence.lower() for k in keywords)
-
-
-def run_ui():
+async def probe_ollama(ui):
+    if not await asyncio.to_thread(is_ollama_running):
+        ui.print_async_response(
+            "[warning]⚠ Warning:[/warning] Ollama is not running. AI features will fail.\n"
+            "[info]ℹ Info:[/info] Please start Ollama in another terminal."
+        )
+        return
+    start_model_warmup(ui, asyncio.get_running_loop())
+
+def start_model_warmup(ui, loop):
+    """Loads the model in the background and reports when it's ready (or couldn't be loaded)."""
+    from model_manager import get_model, READY, FAILED
+
+    def report(model):
+        if model.state == READY and model.load_seconds >= 1:
+            # Only worth a line if it actually had to be read into memory
+            message = f"[info]ℹ Info:[/info] Model {model.model} loaded in {model.load_seconds:.1f}s"
+        elif model.state == FAILED:
+            message = f"[warning]⚠ Warning:[/warning] Could not preload model {model.model}: {model.error}"
+        else:
+            return
+        loop.call_soon_threadsafe(ui.print_async_response, message)
+
+    model = get_model()
+    model.on_change(report)
+    model.start()
+
+def load_input_handler():
+    """Imports the input pipeline (intent matching, AI client, executor...); runs on a worker thread."""
+    import input_handler
+    input_handler.warm_up()
+    return input_handler
+
+async def run_ui_async():
     os_type = get_os()
     session = Session()
     ui = TerminalUI(session.mode, os_type)
-    backup_manager = BackupManager()
+    reader = AsyncInput()
+    state = None  # created once the input pipeline has loaded
+
+    handler = probe = None
 
     ui.welcome_screen()
-    
-    if not is_ollama_running():
-        ui.print_warning("Ollama is not running. AI features will fail.")
-        ui.print_info("Please start Ollama in another terminal.")
 
-    # ui.add_output("Type 'exit' to quit") # Included in welcome screen
+    loop = asyncio.get_running_loop()
+    terminate = loop.create_future()
+
+    def on_interrupt():
+        # Ctrl-C cancels whatever is in flight; only an idle prompt ends the session
+        if state is not None and state.current is not None and not state.current.done():
+            state.cancel.set()
+            state.current.cancel()
+        elif state is not None and state.insights:
+            state.cancel_insights()
+            ui.print_info("AI insight cancelled.")
+            ui.print_prompt()
+        elif not terminate.done():
+            terminate.set_result(None)
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, on_interrupt)
+    except (NotImplementedError, RuntimeError):
+        pass  # Windows: Ctrl-C raises KeyboardInterrupt and ends the session as before
 
     while True:
+        read = asyncio.ensure_future(reader.read(ui.print_prompt))
+        if handler is None:
+            # The first prompt goes up right away: the input pipeline loads and the
+            # Ollama probe (which can take seconds) runs in the background meanwhile
+            await asyncio.sleep(0)
+            handler = asyncio.ensure_future(asyncio.to_thread(load_input_handler))
+            probe = asyncio.create_task(probe_ollama(ui))
+        done, _ = await asyncio.wait({read, terminate}, return_when=asyncio.FIRST_COMPLETED)
+        if terminate in done:
+            read.cancel()
+            ui.print_info("\nUser terminated session.")
+            break
+
         try:
-            user_input = ui.get_input().strip()
-
-            if not user_input:
-                continue
-
-            if user_input.lower() in ["exit", "quit"]:
-                ui.print_info("Goodbye!")
-                break
-
-            lower = user_input.lower()
-
-            # MODE SWITCH
-            if (
-                lower.startswith("mode")
-                or "change mode" in lower
-                or "switch" in lower
-                or "set mode" in lower
-            ):
-                for m in ["beginner", "expert", "safe"]:
-                    if m in lower:
-                        session.set_mode(m)
-                        ui.update_mode(session.mode)
-                        ui.print_success(f"Switched to {session.mode} mode")
-                        break
-                else:
-                    ui.print_warning("Specify mode: beginner | expert | safe")
-                continue
-
-            # EXPLAIN / TEACH
-            if lower.startswith("explain"):
-                ui.print_ai_thinking()
-                topic = user_input.replace("explain", "", 1).strip()
-                explanation = ai_explain(topic)
-                ui.print_ai_response(format_ai_explanation(explanation))
-                continue
-
-            if lower.startswith(("teach me", "learn", "how to")):
-                ui.print_ai_thinking()
-                topic = lower.replace("teach me", "").replace("learn", "").replace("how to", "")
-                lesson = ai_teach(topic.strip())
-                ui.print_ai_response(format_ai_lesson(lesson))
-                continue
-
-            # INTERACTIVE
-            if is_interactive(user_input):
-                ui.print_info(f"Launching interactive session: {user_input}")
-                run_interactive(user_input)
-                continue
-
-            # NL COMMANDS
-            if looks_like_nl(user_input):
-                intent = detect_intent(user_input)
-                entities = extract_entities(user_input)
-
-                if intent == "UNKNOWN":
-                    ui.print_ai_thinking()
-                    ai_result = ai_interpret(user_input)
-                    confidence = ai_result["confidence"]
-
-                    if confidence < LOW_CONFIDENCE_FLOOR:
-                        ui.print_warning(f"Too ambiguous (Confidence: {confidence:.2f}). Please rephrase.")
-                        continue
-
-                    if confidence < CONFIDENCE_THRESHOLD:
-                        options = ai_suggest_options(user_input)
-                        ui.stop_ai_thinking()
-                        if not options:
-                            ui.print_warning("AI was unsure and could not suggest options.")
-                            continue
-                            
-                        ui.print_info("Did you mean:")
-                        for i, opt in enumerate(options, 1):
-                            ui.stream_output(f"[bold cyan]{i})[/bold cyan] {opt.get('description', 'Unknown action')}")
-                        
-                        choice = ui.get_input()
-                        if not choice.isdigit():
-                            continue
-                        idx = int(choice) - 1
-                        if 0 <= idx < len(options):
-                            selected = options[idx]
-                            intent = selected["intent"]
-                            entities = selected["entities"]
-                        else:
-                            continue
-                    else:
-                        intent = ai_result["intent"]
-                        entities = ai_result["entities"]
-                        ui.stop_ai_thinking()
-
-                # 🛡️ ROLLBACK
-                if intent == "ROLLBACK":
-                    msg = backup_manager.restore_last()
-                    ui.print_success(msg)
-                    log_action(user_input, intent, "ROLLBACK", "SUCCESS", msg)
-                    continue
-
-                # 🛡️ SAFETY & CONFIRMATION
-                if intent in ["DELETE_FILE", "DELETE_FOLDER", "KILL_PROCESS"]:
-                    # Check basic safety
-                    if not is_safe(entities.get("name")):
-                        ui.print_error("Action blocked by strict safety rules (system path protections).")
-                        log_action(user_input, intent, "BLOCKED", "FAIL", "Strict safety block")
-                        continue
-                    
-                    # Check user confirmation
-                    action_desc = f"{intent} on {entities.get('name')}"
-                    if not confirm_action(action_desc, session.mode):
-                        ui.print_warning("Action aborted by user.")
-                        log_action(user_input, intent, "ABORTED", "CANCEL", "User denied confirmation")
-                        continue
-
-                    # 🛡️ AUTO-BACKUP (Files only)
-                    if intent == "DELETE_FILE" and entities.get("name"):
-                        if backup_manager.backup_file(entities.get("name")):
-                             ui.print_success(f"📦 Backup created for {entities.get('name')}")
-
-                command = map_command(intent, os_type, entities)
-                if not command:
-                    ui.print_error(f"Could not map command for intent: {intent}")
-                    continue
-
-                # Handle Plugin Internal Commands
-                if command.startswith("INTERNAL:"):
-                    response = command.split("INTERNAL:", 1)[1]
-                    ui.print_success(response)
-                    log_action(user_input, intent, "PLUGIN_EXEC", "SUCCESS", response)
-                    continue
-
-                ui.print_command_execution(command)
-                out, err = execute(command)
-                
-                # LOGGING
-                status = "SUCCESS" if not err else "ERROR"
-                log_action(user_input, intent, command, status, message=err[:100] if err else "OK")
-
-                if out:
-                    formatted = format_output(intent, out, os_type)
-                    if formatted:
-                        ui.stream_output(formatted)
-                    else:
-                        ui.stream_output(out)
-
-                if err:
-                    ui.print_error(err)
-                    # ui.print_ai_thinking() # fast check usually
-                    ui.print_ai_response(format_ai_insight(explain_error(command, err)))
-                continue
-
-            # RAW COMMAND
-            ui.print_command_execution(user_input)
-            out, err = execute(user_input)
-            
-            status = "SUCCESS" if not err else "ERROR"
-            log_action(user_input, "RAW_COMMAND", user_input, status, message=err[:100] if err else "OK")
-            
-            if out:
-                ui.stream_output(out)
-            if err:
-                ui.print_error(err)
-                ui.print_ai_response(format_ai_insight(explain_error(user_input, err)))
-
-        except KeyboardInterrupt:
+            user_input = read.result().strip()
+        except (EOFError, KeyboardInterrupt):
             ui.print_info("\nUser terminated session.")
             break
+
+        if not user_input:
+            continue
+
+        if user_input.lower() in ["exit", "quit"]:
+            ui.print_info("Goodbye!")
+            break
+
+        if state is None:
+            input_handler = await handler
+            state = input_handler.ReplState(os_type, session, ui, reader)
+
+        # A new input supersedes insights still pending for the previous one
+        state.cancel_insights()
+        state.cancel.clear()
+        state.current = asyncio.create_task(input_handler.handle_input(state, user_input))
+        try:
+            with span("turn"):
+                await state.current
+        except asyncio.CancelledError:
+            ui.stop_ai_thinking()
+            ui.print_warning("Cancelled.")
         except Exception as e:
+            ui.stop_ai_thinking()
             logging.error("Crash in main loop", exc_info=True)
             ui.print_error(f"An unexpected error occurred: {str(e)}")
             ui.print_info("The error has been logged. The terminal will not crash.")
+        finally:
+            state.current = None
+
+    if state is not None:
+        state.cancel_insights()
+    probe.cancel()
+    if "model_manager" in sys.modules:
+        sys.modules["model_manager"].get_model().stop()
+
+def run_ui():
+    try:
+        asyncio.run(run_ui_async())
+    except KeyboardInterrupt:
+        print("\nUser terminated session.")
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="NL-Terminal: use your terminal in plain English.")
+    parser.add_argument("--batch", metavar="FILE", help="run the lines of FILE ('-' for stdin) instead of the interactive prompt")
+    parser.add_argument("--yes", action="store_true", help="batch: run deletions/kills without confirmation")
+    parser.add_argument("--json", action="store_true", help="batch: print one JSON result per line")
+    parser.add_argument("--fail-fast", action="store_true", help="batch: stop at the first failing line")
+    parser.add_argument("--trace-dump", metavar="FILE", default=TRACE_DUMP_FILE,
+                        help="write per-stage latency stats to FILE as JSON on exit")
+    return parser.parse_args(argv)
 
 def main():
+    args = parse_args()
+    if args.trace_dump:
+        dump_on_exit(args.trace_dump)
+    if args.batch:
+        from batch_runner import run_batch
+        from input_handler import INTERNAL_INTENTS, BASE_INTENTS, build_intent_catalog, supported_intents
+        os_type = get_os()
+        intent_catalog = build_intent_catalog(BASE_INTENTS, supported_intents() + INTERNAL_INTENTS)
+        sys.exit(run_batch(args.batch, os_type, intent_catalog, assume_yes=args.yes, as_json=args.json, fail_fast=args.fail_fast))
+
     try:
         run_ui()
     except KeyboardInterrupt:
@@ -0,0 +1,139 @@
+import threading
+
+from config import AI_MODEL, AI_BACKEND, AI_WARMUP, AI_KEEP_ALIVE, AI_LOAD_TIMEOUT
+from ollama_client import get_client, OllamaError
+
+# Load states shown to the user
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelManager:
+    """
+    Keeps AI_MODEL loaded in the Ollama server for the whole session.
+
+    start() loads the model on a background thread so the first real query
+    doesn't spend its AI_TIMEOUT waiting for weights to be read from disk;
+    queries that arrive during the load wait for it (wait()) instead. While
+    the session lives, a heartbeat re-sends the keep-alive before it expires.
+    Load time is tracked here, inference time by the client's timing_stats().
+    """
+
+    def __init__(self, model=AI_MODEL, keep_alive=AI_KEEP_ALIVE, client=None):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.state = IDLE
+        self.error = None
+        self.load_seconds = None         # wall time of the warm-up request
+        self.server_load_seconds = None  # what the server reported for reading the weights
+        self._client = client
+        self._ready = threading.Event()
+        self._ready.set()  # nothing to wait for until a load starts
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._listeners = []
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    def on_change(self, callback):
+        """Registers callback(manager), called (from the loader thread) whenever the state changes."""
+        self._listeners.append(callback)
+
+    def _set_state(self, state, error=None):
+        self.state = state
+        self.error = error
+        for callback in list(self._listeners):
+            try:
+                callback(self)
+            except Exception:
+                pass
+
+    # --- loading ---------------------------------------------------------
+
+    def start(self):
+        """Starts the background load (once). No-op for the CLI backend or with AI_WARMUP off."""
+        if not AI_WARMUP or AI_BACKEND != "http":
+            return
+        with self._lock:
+            if self.state in (LOADING, READY):
+                return
+            self._ready.clear()
+            self.state = LOADING
+        threading.Thread(target=self._load, name="nl-model-warmup", daemon=True).start()
+
+    def _load(self):
+        self._set_state(LOADING)
+        try:
+            result = self.client.load_model(self.model, self.keep_alive, timeout=AI_LOAD_TIMEOUT)
+        except OllamaError as e:
+            self._set_state(FAILED, str(e))
+        else:
+            self.load_seconds = result["seconds"]
+            self.server_load_seconds = result["load_seconds"]
+            self._set_state(READY)
+            self._schedule_heartbeat()
+        finally:
+            self._ready.set()
+
+    def wait(self, timeout=AI_LOAD_TIMEOUT):
+        """Blocks while a load is in progress. Returns True if the model is ready."""
+        self._ready.wait(timeout)
+        return self.state == READY
+
+    # --- keep-alive ------------------------------------------------------
+
+    def _schedule_heartbeat(self):
+        if self.keep_alive is None or self.keep_alive < 0:
+            return  # -1: the server keeps it loaded forever
+        interval = max(30, self.keep_alive / 2)
+        timer = threading.Timer(interval, self._refresh)
+        timer.daemon = True
+        self._heartbeat = timer
+        timer.start()
+
+    def _refresh(self):
+        try:
+            # Cheap when the model is resident; reloads it if something evicted it
+            self.client.load_model(self.model, self.keep_alive, timeout=AI_LOAD_TIMEOUT)
+        except OllamaError:
+            pass
+        self._schedule_heartbeat()
+
+    def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    # --- reporting -------------------------------------------------------
+
+    def status(self):
+        """The load state plus the client's inference timings, for `model status`."""
+        stats = self.client.timing_stats()
+        return {
+            "model": self.model,
+            "state": self.state,
+            "error": self.error,
+            "keep_alive": self.keep_alive,
+            "load_seconds": self.load_seconds,
+            "server_load_seconds": self.server_load_seconds,
+            "requests": stats["requests"],
+            "inference_seconds": stats["inference_seconds"],
+            "tokens": stats["tokens"],
+        }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_model():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ModelManager()
+    return _manager
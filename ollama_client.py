@@ -0,0 +1,261 @@
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from config import AI_MODEL, AI_TIMEOUT, AI_KEEP_ALIVE, AI_LOAD_TIMEOUT, OLLAMA_HOST, OLLAMA_POOL_SIZE
+
+
+class OllamaError(Exception):
+    """Raised when the Ollama server answered badly or too slowly."""
+
+
+class OllamaUnavailable(OllamaError):
+    """Raised when no connection to the Ollama server could be made."""
+
+
+class OllamaClient:
+    """
+    Small keep-alive HTTP client for the Ollama REST API.
+
+    Connections are pooled and reused across calls, so a request only pays
+    for the HTTP round-trip instead of a fork + CLI startup + new socket.
+    The host is injectable, which lets any local HTTP server stand in for Ollama.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, timeout=AI_TIMEOUT, pool_size=OLLAMA_POOL_SIZE):
+        if "://" not in host:
+            host = "http://" + host
+        parts = urlsplit(host)
+        self.scheme = parts.scheme or "http"
+        self.hostname = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.scheme == "https" else 11434)
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=max(1, pool_size))
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "loads": 0, "load_seconds": 0.0, "inference_seconds": 0.0, "tokens": 0}
+
+    # --- connection pool -------------------------------------------------
+
+    def _new_connection(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.hostname, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.hostname, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    @staticmethod
+    def _set_timeout(conn, timeout):
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+
+    def _release(self, conn):
+        self._set_timeout(conn, self.timeout)
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # --- transport -------------------------------------------------------
+
+    def _request(self, method, path, payload=None, timeout=None):
+        """
+        Sends one request over a pooled connection and returns the open response.
+        A reused connection the server already closed is retried once on a fresh one.
+        `timeout` overrides the client's socket timeout for this request only.
+        """
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+        for attempt in range(2):
+            conn, reused = self._acquire()
+            self._set_timeout(conn, timeout or self.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise OllamaUnavailable(f"Connection to {self.hostname}:{self.port} was dropped")
+            except socket.timeout:
+                conn.close()
+                raise OllamaError("Ollama request timed out")
+            except OSError as e:
+                conn.close()
+                raise OllamaUnavailable(f"Cannot reach Ollama at {self.hostname}:{self.port}: {e}")
+
+            if response.status >= 400:
+                detail = response.read().decode("utf-8", errors="ignore")
+                self._release(conn)
+                raise OllamaError(f"Ollama returned HTTP {response.status}: {detail.strip()}")
+            return conn, response
+
+        raise OllamaUnavailable("Ollama connection failed")
+
+    def _json(self, method, path, payload=None, timeout=None):
+        conn, response = self._request(method, path, payload, timeout)
+        try:
+            raw = response.read()
+        except socket.timeout:
+            conn.close()
+            raise OllamaError("Ollama request timed out")
+        except OSError as e:
+            conn.close()
+            raise OllamaError(f"Ollama response was interrupted: {e}")
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+        try:
+            data = json.loads(raw.decode("utf-8", errors="ignore") or "{}")
+        except json.JSONDecodeError:
+            raise OllamaError("Ollama returned invalid JSON")
+        self._record(data)
+        return data
+
+    def _stream(self, path, payload):
+        """
+        Iterates over the NDJSON objects of a streaming response.
+        The connection only goes back to the pool if the stream was read to the end.
+        """
+        conn, response = self._request("POST", path, payload)
+        finished = False
+        try:
+            while True:
+                try:
+                    line = response.readline()
+                except socket.timeout:
+                    raise OllamaError("Ollama stopped producing tokens")
+                except OSError as e:
+                    raise OllamaError(f"Ollama stream was interrupted: {e}")
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line.decode("utf-8", errors="ignore"))
+                except json.JSONDecodeError:
+                    continue
+                if chunk.get("error"):
+                    raise OllamaError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    self._record(chunk)
+                    response.read()
+                    finished = True
+                    break
+            if not finished:
+                raise OllamaError("Ollama stream ended before the answer was done")
+        finally:
+            if finished and not response.will_close:
+                self._release(conn)
+            else:
+                conn.close()
+
+    # --- timings ---------------------------------------------------------
+
+    def _record(self, data):
+        """
+        Accumulates the durations Ollama reports (nanoseconds) on a finished
+        request, keeping model load time apart from actual inference.
+        """
+        if not isinstance(data, dict) or not data.get("done"):
+            return
+        load = data.get("load_duration", 0) / 1e9
+        inference = (data.get("prompt_eval_duration", 0) + data.get("eval_duration", 0)) / 1e9
+        with self._stats_lock:
+            if data.get("done_reason") != "load":  # a prompt-less warm-up isn't a query
+                self._stats["requests"] += 1
+            self._stats["inference_seconds"] += inference
+            self._stats["tokens"] += data.get("eval_count", 0)
+            # Every response reports a few ms of "load" even when the model was resident
+            if load >= 0.5:
+                self._stats["loads"] += 1
+                self._stats["load_seconds"] += load
+
+    def timing_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    # --- API -------------------------------------------------------------
+
+    @staticmethod
+    def _payload(model, options, **fields):
+        payload = {"model": model, "keep_alive": AI_KEEP_ALIVE}
+        payload.update(fields)
+        payload.update(options)
+        return payload
+
+    def load_model(self, model=AI_MODEL, keep_alive=AI_KEEP_ALIVE, timeout=AI_LOAD_TIMEOUT):
+        """
+        Loads `model` into memory without generating anything (a prompt-less
+        /api/generate) and returns {"seconds", "load_seconds"}: wall time and
+        the server-reported load time. Also refreshes the keep-alive timer.
+        """
+        start = time.monotonic()
+        data = self._json("POST", "/api/generate", {"model": model, "keep_alive": keep_alive}, timeout=timeout)
+        return {"seconds": time.monotonic() - start, "load_seconds": data.get("load_duration", 0) / 1e9}
+
+    def generate(self, prompt, model=AI_MODEL, **options):
+        payload = self._payload(model, options, prompt=prompt, stream=False)
+        return self._json("POST", "/api/generate", payload).get("response", "")
+
+    def generate_stream(self, prompt, model=AI_MODEL, **options):
+        """Yields response tokens as the server produces them."""
+        payload = self._payload(model, options, prompt=prompt, stream=True)
+        for chunk in self._stream("/api/generate", payload):
+            token = chunk.get("response", "")
+            if token:
+                yield token
+
+    def chat(self, messages, model=AI_MODEL, **options):
+        payload = self._payload(model, options, messages=messages, stream=False)
+        data = self._json("POST", "/api/chat", payload)
+        return data.get("message", {}).get("content", "")
+
+    def chat_stream(self, messages, model=AI_MODEL, **options):
+        payload = self._payload(model, options, messages=messages, stream=True)
+        for chunk in self._stream("/api/chat", payload):
+            token = chunk.get("message", {}).get("content", "")
+            if token:
+                yield token
+
+    def is_available(self):
+        try:
+            self._json("GET", "/api/tags")
+            return True
+        except OllamaError:
+            return False
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide client so every caller shares one connection pool."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient()
+    return _client
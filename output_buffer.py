@@ -0,0 +1,153 @@
+import os
+import tempfile
+from collections import deque
+from itertools import islice
+
+from config import OUTPUT_MEMORY_LIMIT, OUTPUT_TAIL_LINES
+
+
+class SpooledOutput:
+    """
+    Captures a command's output line by line with a fixed memory budget.
+
+    Up to `memory_limit` bytes stay in memory. Past that, everything is
+    spilled to a temp file and only the last `tail_lines` lines are kept in
+    a ring buffer, so RSS stays flat however much the command prints.
+    Readers (formatters, the error explainer) pull what they need lazily
+    through head()/tail()/iter_lines() instead of one giant string; the
+    pager reads arbitrary windows through lines()/scan().
+    """
+
+    INDEX_EVERY = 256  # spilled output: one byte offset remembered per this many lines
+
+    def __init__(self, memory_limit=OUTPUT_MEMORY_LIMIT, tail_lines=OUTPUT_TAIL_LINES):
+        self.memory_limit = memory_limit
+        self.line_count = 0
+        self.byte_count = 0
+        self.path = None
+        self._lines = []
+        self._tail = deque(maxlen=tail_lines)
+        self._file = None
+        self._offsets = [0]  # byte offset of line 0, INDEX_EVERY, 2 * INDEX_EVERY, ... in the spill file
+
+    def __bool__(self):
+        return self.byte_count > 0
+
+    def __len__(self):
+        return self.byte_count
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def append(self, text):
+        if not text:
+            return
+        self.line_count += 1
+        # The budget is in UTF-8 bytes (what the spill file holds), not characters
+        self.byte_count += len(text) if text.isascii() else len(text.encode("utf-8", errors="ignore"))
+
+        if self._file is not None:
+            self._file.write(text)
+            self._tail.append(text)
+            return
+
+        self._lines.append(text)
+        if self.byte_count > self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        fd, self.path = tempfile.mkstemp(prefix="nlt-output-", suffix=".log")
+        self._file = os.fdopen(fd, "w", encoding="utf-8", errors="ignore")
+        self._file.writelines(self._lines)
+        self._tail.extend(self._lines)
+        self._lines = []
+
+    # --- lazy readers ----------------------------------------------------
+
+    def iter_lines(self):
+        if self._file is None:
+            yield from self._lines
+            return
+        self._file.flush()
+        with open(self.path, "r", encoding="utf-8", errors="ignore") as f:
+            yield from f
+
+    def head(self, n_lines):
+        lines = []
+        for line in self.iter_lines():
+            if len(lines) >= n_lines:
+                break
+            lines.append(line)
+        return "".join(lines)
+
+    def tail(self, n_lines):
+        if self._file is None:
+            return "".join(self._lines[-n_lines:]) if n_lines else ""
+        return "".join(list(self._tail)[-n_lines:]) if n_lines else ""
+
+    def scan(self, start=0):
+        """
+        Yields (line number, line without its line end) from line `start` on.
+        Spilled output is read from the temp file: a seek to the nearest
+        indexed offset and a short skip, never a read from the top. The
+        offset index is extended as lines are passed, so it only ever covers
+        the part of the output somebody looked at (and stays tiny: one
+        integer per INDEX_EVERY lines).
+        """
+        start = max(0, start)
+        if self._file is None:
+            for number, line in enumerate(islice(self._lines, start, None), start):
+                yield number, line.rstrip("\r\n")
+            return
+
+        self._file.flush()
+        every = self.INDEX_EVERY
+        offsets = self._offsets
+        known = min(start // every, len(offsets) - 1)
+        number = known * every
+        with open(self.path, "rb") as f:
+            f.seek(offsets[known])
+            # Whole index blocks up to `start` are skipped without decoding a line
+            while number + every <= start:
+                if sum(1 for _ in islice(f, every)) < every:
+                    return
+                number += every
+                if number // every == len(offsets):
+                    offsets.append(f.tell())
+            for line in f:
+                if number % every == 0 and number // every == len(offsets):
+                    offsets.append(f.tell() - len(line))
+                if number >= start:
+                    yield number, line.decode("utf-8", errors="ignore").rstrip("\r\n")
+                number += 1
+
+    def lines(self, start, count):
+        """Up to `count` lines from line `start`, without their line ends."""
+        return [line for _, line in islice(self.scan(start), count)]
+
+    def text(self, limit=None):
+        """The whole output (or its first `limit` characters)."""
+        if self._file is None:
+            data = "".join(self._lines)
+            return data if limit is None else data[:limit]
+        self._file.flush()
+        with open(self.path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read() if limit is None else f.read(limit)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self._lines = []
+        self._tail.clear()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
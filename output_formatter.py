@@ -1,19 +1,30 @@
-from rich.table import Table
+import os
+from itertools import islice
 from rich.panel import Panel
 from rich.text import Text
-from rich.layout import Layout
 from rich import box
-from rich.markdown import Markdown
+from rich.markup import escape
+from tracing import traced
+
+# Table and Markdown pull in a lot of Rich (markdown-it, pygments...); they are
+# imported on first use so they don't slow down startup.
 
 def format_ai_insight(text):
+    from rich.markdown import Markdown
     return Panel(Markdown(text), title="🧠 AI Insight", border_style="magenta", expand=False)
 
 def format_ai_explanation(text):
+    from rich.markdown import Markdown
     return Panel(Markdown(text), title="📖 Explanation", border_style="cyan", expand=False)
 
 def format_ai_lesson(text):
+    from rich.markdown import Markdown
     return Panel(Markdown(text), title="🎓 AI Tutor", border_style="yellow", expand=False)
 
+# Intents whose output format_output turns into a table/panel
+FORMATTED_INTENTS = {"CHECK_RAM", "CHECK_CPU", "CHECK_DISK", "CHECK_IP", "LIST_PROCESSES"}
+
+@traced("format")
 def format_output(intent, stdout, os_type):
     """
     Routes raw output to specific formatters based on intent.
@@ -36,6 +47,7 @@ def format_output(intent, stdout, os_type):
     return None
 
 def format_ram(stdout, os_type):
+    from rich.table import Table
     try:
         table = Table(title="Memory Status", box=box.SIMPLE_HEAD)
         table.add_column("Metric", style="cyan")
@@ -102,6 +114,7 @@ def format_cpu(stdout, os_type):
     return None
 
 def format_disk(stdout, os_type):
+    from rich.table import Table
     try:
         table = Table(title="Disk Usage", box=box.SIMPLE)
         table.add_column("Drive/Mount")
@@ -149,7 +162,22 @@ def format_ip(stdout, os_type):
     return Panel(Text(stdout.strip(), style="bold yellow"), title="Network Info", border_style="blue")
 
 
+def _nonblank_lines(stdout, block=64 * 1024):
+    """The non-blank lines of an output, split a block at a time: a huge ps aux is never split (or copied) whole."""
+    start, size = 0, len(stdout)
+    while start < size:
+        end = stdout.find("\n", start + block)
+        end = size if end < 0 else end + 1
+        for line in stdout[start:end].split("\n"):
+            if line.strip():
+                yield line.rstrip("\r")
+        start = end
+
+def _cpu(row):
+    return float(row[2]) if row[2].replace('.', '', 1).isdigit() else 0.0
+
 def format_processes(stdout, os_type):
+    from rich.table import Table
     try:
         table = Table(title="Top Processes", box=box.SIMPLE_HEAD)
         
@@ -159,7 +187,7 @@ def format_processes(stdout, os_type):
             # Parsing this is hard because spaces in names. 
             # We will just take the first N lines and make them a generic table row
             
-            lines = stdout.strip().split('\n')
+            lines = list(islice(_nonblank_lines(stdout), 18))
             # Header is usually lines[0], separator lines[1]
             if len(lines) > 3:
                 # Add columns based on visual length? Hard.
@@ -168,16 +196,205 @@ def format_processes(stdout, os_type):
                 # Fallback: Just return header + top 10 rows
                 
                 table.add_column("Process Output (Top 15)")
-                for line in lines[:18]: # Header + sep + 15 rows
+                for line in lines: # Header + sep + 15 rows
                     table.add_row(line)
                 return table
         else:
-            lines = stdout.strip().split('\n')
-            table.add_column("Output (Top 15)")
-            for line in lines[:16]:
-                table.add_row(line)
+            # ps aux: USER PID %CPU %MEM VSZ RSS TTY STAT START TIME COMMAND
+            # Sort on %CPU so "top" means top, not "lowest PIDs". Rows are cut back
+            # to the top 15 every few thousand, however many processes there are.
+            lines = _nonblank_lines(stdout)
+            header = next(lines, "").split(None, 10)
+            top, count = [], 0
+            if len(header) == 11:
+                for line in lines:
+                    row = line.split(None, 10)
+                    if len(row) == 11:
+                        top.append(row)
+                        count += 1
+                        if len(top) >= 4096:
+                            top.sort(key=_cpu, reverse=True)
+                            del top[15:]
+                top.sort(key=_cpu, reverse=True)
+                del top[15:]
+            if not top:
+                table.add_column("Output (Top 15)")
+                for line in islice(_nonblank_lines(stdout), 16):
+                    table.add_row(line)
+                return table
+
+            for name in ["USER", "PID", "%CPU", "%MEM", "COMMAND"]:
+                table.add_column(name, justify="right" if name in ["PID", "%CPU", "%MEM"] else "left")
+            for r in top:
+                table.add_row(escape(r[0]), r[1], r[2], r[3], escape(r[10][:60]))
+            table.caption = f"Top 15 of {count} by CPU"
             return table
             
     except Exception:
         return None
     return None
+
+
+# --- native metrics (sys_metrics records) -----------------------------------
+
+def _size(n_bytes):
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if abs(n_bytes) < 1024 or unit == "TB":
+            return f"{n_bytes:.1f} {unit}" if unit != "B" else f"{n_bytes} B"
+        n_bytes /= 1024
+
+def _bar(percent, width=20):
+    filled = int(round(min(max(percent, 0), 100) / 100 * width))
+    color = "green" if percent < 70 else "yellow" if percent < 90 else "red"
+    return f"[{color}]{'█' * filled}[/{color}]{'░' * (width - filled)} {percent:5.1f}%"
+
+@traced("format")
+def format_metrics(intent, data):
+    """
+    Renders the structured records returned by sys_metrics.query().
+    Returns a Rich renderable or None.
+    """
+    if data is None:
+        return None
+    if intent == "CHECK_RAM":
+        return format_memory_info(data)
+    if intent == "CHECK_CPU":
+        return format_cpu_usage(data)
+    if intent == "CHECK_DISK":
+        return format_disk_usage(data)
+    if intent == "LIST_PROCESSES":
+        return format_process_table(data)
+    return None
+
+def format_memory_info(mem):
+    from rich.table import Table
+    table = Table(title="Memory Status", box=box.SIMPLE_HEAD)
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green")
+    table.add_row("Total", _size(mem["total"]))
+    table.add_row("Used", _size(mem["used"]))
+    table.add_row("Free", _size(mem["free"]))
+    table.add_row("Available", _size(mem["available"]))
+    table.add_row("Buff/Cache", _size(mem["buff_cache"]))
+    table.add_row("Usage", _bar(mem["percent"]))
+    if mem["swap_total"]:
+        table.add_row("Swap", f"{_size(mem['swap_used'])} / {_size(mem['swap_total'])}")
+    return table
+
+def format_cpu_usage(cpu):
+    lines = [f"Total  {_bar(cpu['percent'])}"]
+    if cpu["count"] > 1:
+        for i, percent in enumerate(cpu["cores"]):
+            lines.append(f"cpu{i:<3}{_bar(percent)}")
+    if cpu["load_avg"]:
+        lines.append("Load average: " + "  ".join(f"{v:.2f}" for v in cpu["load_avg"]))
+    return Panel("\n".join(lines), title=f"CPU Usage ({cpu['count']} cores)", expand=False)
+
+def format_disk_usage(disks):
+    from rich.table import Table
+    table = Table(title="Disk Usage", box=box.SIMPLE)
+    table.add_column("Drive/Mount", overflow="fold")
+    table.add_column("Type", style="dim")
+    table.add_column("Size", justify="right")
+    table.add_column("Used", justify="right")
+    table.add_column("Free", justify="right")
+    table.add_column("Use%", no_wrap=True)
+    for d in disks:
+        table.add_row(escape(d["mount"]), d["fstype"], _size(d["total"]), _size(d["used"]), _size(d["free"]), _bar(d["percent"], 8))
+    return table
+
+def format_process_table(data):
+    from rich.table import Table
+    label = "Memory" if data["sort_by"] == "mem" else "CPU"
+    table = Table(title=f"Top Processes by {label}", box=box.SIMPLE_HEAD)
+    table.add_column("PID", justify="right", style="cyan")
+    table.add_column("User")
+    table.add_column("%CPU", justify="right")
+    table.add_column("%MEM", justify="right")
+    table.add_column("RSS", justify="right")
+    table.add_column("Thr", justify="right", style="dim")
+    table.add_column("Name", style="green")
+    for p in data["processes"]:
+        table.add_row(
+            str(p["pid"]), p["user"], f"{p['cpu']:.1f}", f"{p['mem']:.1f}",
+            _size(p["rss"]), str(p["threads"]), escape(p["name"]),
+        )
+    table.caption = f"{len(data['processes'])} of {data['total']} processes"
+    return table
+
+def format_backup_list(entries, base=None):
+    """Backup history rows (newest first); paths below `base` are shown relative to it."""
+    from rich.table import Table
+    table = Table(title=escape(f"Backups under {base}" if base else "Backups"), box=box.SIMPLE_HEAD)
+    table.add_column("When", no_wrap=True)
+    table.add_column("Path", overflow="fold")
+    table.add_column("Size", justify="right")
+    table.add_column("Undo", style="dim")
+    for e in entries:
+        path = e.original_path
+        if base and (path == base or path.startswith(base.rstrip(os.sep) + os.sep)):
+            path = os.path.relpath(path, base)
+        if e.kind == "dir":
+            path = path.rstrip(os.sep) + os.sep
+        table.add_row(e.timestamp[:19].replace("T", " "), escape(path), _size(e.size), "restored" if e.restored else "")
+    return table
+
+def format_history(entries, query):
+    """History search results (newest first), with the filters that were applied as the caption."""
+    from rich.table import Table
+    table = Table(title="Command History", box=box.SIMPLE_HEAD)
+    table.add_column("When", no_wrap=True)
+    table.add_column("Status", no_wrap=True)
+    table.add_column("Input", overflow="fold")
+    table.add_column("Command", overflow="fold", style="dim")
+    table.add_column("ms", justify="right", style="dim")
+    for e in entries:
+        color = "green" if e.status == "SUCCESS" else "red" if e.status in ["ERROR", "FAIL"] else "yellow"
+        elapsed = f"{e.elapsed_ms:.0f}" if e.elapsed_ms is not None else ""
+        table.add_row(e.ts[:19].replace("T", " "), f"[{color}]{escape(e.status or '')}[/{color}]",
+                      escape(e.input), escape(e.command or ""), elapsed)
+
+    filters = []
+    if query.terms:
+        filters.append(" ".join(query.terms))
+    if query.statuses:
+        filters.append("/".join(query.statuses))
+    if query.since:
+        filters.append(f"since {query.since:%Y-%m-%d %H:%M}")
+    if query.until:
+        filters.append(f"before {query.until:%Y-%m-%d %H:%M}")
+    table.caption = escape(f"{len(entries)} newest" + (f" · {' · '.join(filters)}" if filters else ""))
+    return table
+
+def format_learned_phrases(phrases):
+    """Learned phrasings, numbered as "forget phrase <n>" expects them."""
+    from datetime import datetime
+    from rich.table import Table
+    table = Table(title="Learned Phrases", box=box.SIMPLE_HEAD)
+    table.add_column("#", justify="right", style="dim")
+    table.add_column("Phrase", style="cyan", overflow="fold")
+    table.add_column("Intent", style="green")
+    table.add_column("Uses", justify="right")
+    table.add_column("Last used", no_wrap=True)
+    table.add_column("From", style="dim")
+    for i, p in enumerate(phrases, 1):
+        table.add_row(str(i), escape(p.template), p.intent, str(p.uses),
+                      datetime.fromtimestamp(p.last_used).strftime("%Y-%m-%d %H:%M"),
+                      "you" if p.source == "user" else "AI")
+    table.caption = "forget phrase <#> | forget phrase all"
+    return table
+
+def format_trace_stats(stats, since):
+    """Per-stage latency percentiles from tracing.Tracer.stats()."""
+    from rich.table import Table
+    table = Table(title=f"Latency by Stage (since {since:%H:%M:%S})", box=box.SIMPLE_HEAD)
+    table.add_column("Stage", style="cyan")
+    for column in ["Count", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Total ms"]:
+        table.add_column(column, justify="right")
+    for stage, s in stats.items():
+        table.add_row(stage, str(s["count"]), f"{s['p50_ms']:.2f}", f"{s['p95_ms']:.2f}", f"{s['p99_ms']:.2f}",
+                      f"{s['max_ms']:.2f}", f"{s['total_ms']:.1f}")
+    if not stats:
+        table.caption = "Nothing recorded yet"
+    return table
+
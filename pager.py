@@ -0,0 +1,172 @@
+import asyncio
+import io
+from collections import deque
+from itertools import islice
+
+from output_buffer import SpooledOutput
+
+HELP = "Enter/b page · g N line · G end · /text ?text n search · f text filter (f: off) · q quit"
+
+
+def spool_text(text):
+    """A captured output string as a SpooledOutput, so the pager reads it the same way."""
+    output = SpooledOutput()
+    for line in io.StringIO(text):
+        output.append(line)
+    return output
+
+
+class Pager:
+    """
+    Pages through a SpooledOutput without ever rendering (or holding) all of it.
+
+    Only the visible window is read and printed: the output's sparse line
+    index makes any window a seek plus a short skip. Search and filter stream
+    through the lines from the current position and stop as soon as they
+    have enough, so memory stays the same for 1k or 10M lines. The one thing
+    that grows is the `back` stack of page starts in filter mode (an integer
+    per page turned).
+    """
+
+    def __init__(self, output, height):
+        self.output = output
+        self.height = max(1, height)
+        self.top = 0           # line number of the first visible line
+        self.shown = []        # (line number, text) of the current window
+        self.filter = None     # lower-cased text every visible line must contain
+        self.back = []         # previous page starts, filter mode only
+        self.search = None     # (lower-cased text, forward?)
+        self.message = None
+
+    @property
+    def total(self):
+        return self.output.line_count
+
+    def _matches(self, text, needle):
+        return needle in text.lower()
+
+    def _visible(self, start):
+        """The lines from `start` on that the filter lets through (all of them without one)."""
+        for number, text in self.output.scan(start):
+            if self.filter is None or self._matches(text, self.filter):
+                yield number, text
+
+    def window(self):
+        lines = self._visible(self.top)
+        self.shown = list(islice(lines, self.height))
+        lines.close()  # releases the spill file
+        return self.shown
+
+    # --- navigation ------------------------------------------------------
+
+    def next_page(self):
+        start = self.shown[-1][0] + 1 if self.shown else self.total
+        if self.filter is not None:
+            lines = self._visible(start)
+            following = next(lines, None)
+            lines.close()
+            start = following[0] if following else self.total
+        if start >= self.total:
+            self.message = "End of output."
+            return
+        if self.filter is not None:
+            self.back.append(self.top)
+        self.top = start
+
+    def previous_page(self):
+        if self.filter is not None:
+            self.top = self.back.pop() if self.back else 0
+        else:
+            self.top = max(0, self.top - self.height)
+
+    def go_to(self, line):
+        """Jumps to 1-based `line` (with a filter: the first match at or after it)."""
+        self.back.clear()
+        self.top = min(max(0, line - 1), max(0, self.total - 1))
+
+    def end(self):
+        self.back.clear()
+        if self.filter is None:
+            self.top = max(0, self.total - self.height)
+            return
+        last = deque(self._visible(self.top), maxlen=self.height)
+        if last:
+            self.top = last[0][0]
+
+    def set_filter(self, text):
+        self.filter = text.lower() if text else None
+        self.back.clear()
+        if self.filter is not None and not self.window():
+            self.message = f"No lines below here contain '{text}'."
+            self.filter = None
+
+    def find(self, text=None, forward=True):
+        """Moves the window to the next (or previous) line containing `text`."""
+        if text:
+            self.search = (text.lower(), forward)
+        if self.search is None:
+            self.message = "Nothing to search for yet: /text"
+            return
+        needle, forward = self.search
+        found = None
+        if forward:
+            for number, line in self._visible(self.top + 1):
+                if self._matches(line, needle):
+                    found = number
+                    break
+        else:
+            for number, line in self._visible(0):
+                if number >= self.top:
+                    break
+                if self._matches(line, needle):
+                    found = number
+        if found is None:
+            self.message = f"'{needle}' not found {'below' if forward else 'above'} line {self.top + 1}."
+            return
+        self.back.clear()
+        self.top = found
+
+    def command(self, line):
+        """Applies one pager command. False once the user quits."""
+        line = line.strip()
+        self.message = None
+        if line in ("q", "quit", "exit"):
+            return False
+        if line in ("", "next") or (line == "n" and self.search is None):
+            self.next_page()
+        elif line == "n":
+            self.find()
+        elif line in ("b", "back", "p"):
+            self.previous_page()
+        elif line.isdigit():
+            self.go_to(int(line))
+        elif line.startswith("g ") and line[2:].strip().isdigit():
+            self.go_to(int(line[2:]))
+        elif line == "g":
+            self.go_to(1)
+        elif line in ("G", "end"):
+            self.end()
+        elif line[:1] in ("/", "?") and line[1:].strip():
+            self.find(line[1:].strip(), forward=line[0] == "/")
+        elif line == "f" or line.startswith("f "):
+            self.set_filter(line[2:].strip())
+        else:
+            self.message = HELP
+        return True
+
+
+async def page_output(state, output, title):
+    """Shows `output` in the pager until the user quits (q) or presses Ctrl-C."""
+    ui = state.ui
+    pager = Pager(output, ui.page_height())
+    with ui.pager_screen():
+        while True:
+            shown = await asyncio.to_thread(pager.window)
+            status = f"{title} · lines {shown[0][0] + 1:,}-{shown[-1][0] + 1:,} of {pager.total:,}" if shown else title
+            if pager.filter is not None:
+                status += f" · filter '{pager.filter}'"
+            ui.show_page([text for _, text in shown], status, pager.message or HELP,
+                         highlight=pager.search[0] if pager.search else pager.filter)
+            line = await state.reader.read(lambda: ui.print_prompt("[comment]pager[/comment]"))
+            if not await asyncio.to_thread(pager.command, line):
+                break
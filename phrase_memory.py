@@ -0,0 +1,270 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import config
+
+# One learned phrasing. `template` is the normalized sentence with entity
+# values replaced by {name} / {source} / {destination}.
+LearnedPhrase = namedtuple("LearnedPhrase", ["template", "intent", "uses", "created", "last_used", "source"])
+
+SLOTS = ["source", "destination", "name"]
+
+_SLOT = re.compile(r"\{(source|destination|name)\}")
+# What a slot matches when the template is used: a quoted span or some text
+_SLOT_VALUE = r"""(?P<{}>"[^"]*"|'[^']*'|\S.*?)"""
+_TRAILING = ".?!"
+
+def normalize(sentence):
+    return " ".join(sentence.split()).rstrip(_TRAILING).strip()
+
+def make_template(sentence, entities):
+    """
+    "zip up 'My Docs' please", {"name": "My Docs"} -> "zip up {name} please".
+    Returns None when an entity value doesn't appear in the sentence (the
+    model rewrote it, so the phrasing can't be generalized) or when nothing
+    but slots would be left.
+    """
+    text = normalize(sentence).lower()
+    values = [(slot, str(entities[slot]).strip()) for slot in SLOTS if entities.get(slot)]
+    # Longest first, so "notes" doesn't eat into "notes.txt"
+    for slot, value in sorted(values, key=lambda sv: len(sv[1]), reverse=True):
+        value = value.lower()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        if not value:
+            return None
+        match = re.search(rf"""(?<![\w.])(["']?){re.escape(value)}\1(?![\w.])""", text)
+        if not match or "{" in text[match.start():match.end()]:
+            return None
+        text = text[:match.start()] + "{" + slot + "}" + text[match.end():]
+
+    literal = _SLOT.sub(" ", text)
+    if not re.search(r"[a-z]", literal) or "{" in literal or "}" in literal:
+        return None
+    return text
+
+def _compile(template):
+    parts, last = [], 0
+    seen = set()
+    for match in _SLOT.finditer(template):
+        parts.append(r"\s+".join(re.escape(w) for w in template[last:match.start()].split(" ")))
+        slot = match.group(1)
+        # A slot used twice must capture the same text again
+        parts.append(f"(?P={slot})" if slot in seen else _SLOT_VALUE.format(slot))
+        seen.add(slot)
+        last = match.end()
+    parts.append(r"\s+".join(re.escape(w) for w in template[last:].split(" ")))
+    return re.compile("".join(parts), re.IGNORECASE)
+
+def literal_text(template):
+    """The words of a template without its slots: "show me pics inside {name}" -> "show me pics inside"."""
+    return " ".join(_SLOT.sub(" ", template).split())
+
+def _valid_template(template):
+    """Guards against a hand-edited file: some literal words and no stray braces."""
+    literal = _SLOT.sub(" ", template) if isinstance(template, str) else "{"
+    return bool(literal.split()) and "{" not in literal and "}" not in literal
+
+def _key(template):
+    """
+    First word with no slot in it: a lookup only tries templates whose key is
+    a word of the input. None (always tried) when every word touches a slot.
+    """
+    for word in template.split():
+        if not _SLOT.search(word):
+            return word
+    return None
+
+class PhraseMemory:
+    """
+    Phrasings the LLM (or the user, through the "Did you mean" menu) has
+    resolved, kept so the same phrasing resolves locally next time.
+
+    Each phrase's weight is its use count halved every
+    PHRASE_HALF_LIFE_DAYS since it was last used; phrases whose weight falls
+    below PHRASE_MIN_WEIGHT are dropped, and past PHRASE_MAX_ENTRIES the
+    lightest go first. Stored as one JSON file, written atomically.
+    """
+
+    def __init__(self, path=None, max_entries=None, half_life_days=None, min_weight=None):
+        self.path = path or config.PHRASE_MEMORY_FILE
+        self.max_entries = max_entries or config.PHRASE_MAX_ENTRIES
+        self.half_life = (half_life_days or config.PHRASE_HALF_LIFE_DAYS) * 86400
+        self.min_weight = min_weight if min_weight is not None else config.PHRASE_MIN_WEIGHT
+        self._lock = threading.Lock()
+        self._phrases = {}  # template -> LearnedPhrase
+        self._index = {}    # first literal word -> [(template, compiled regex)]
+        self._dirty = False
+        self.hits = 0
+        self.version = 0    # bumped whenever the set of phrases changes
+        self._load()
+
+    # --- persistence -----------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            phrases = [LearnedPhrase(**row) for row in rows]
+        except (OSError, ValueError, TypeError):
+            return
+        now = time.time()
+        for phrase in phrases:
+            if _valid_template(phrase.template):
+                self._phrases[phrase.template] = phrase
+        if self._evict(now):
+            self._dirty = True
+        self._reindex()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [p._asdict() for p in self._phrases.values()]
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    # --- matching --------------------------------------------------------
+
+    def _reindex(self):
+        index = {}
+        for template in self._phrases:
+            index.setdefault(_key(template), []).append((template, _compile(template)))
+        # Most literal text first: "show pics in {name}" beats "show {name}"
+        for candidates in index.values():
+            candidates.sort(key=lambda tc: len(_SLOT.sub("", tc[0])), reverse=True)
+        self._index = index
+
+    def match(self, sentence, record=True):
+        """
+        (intent, entities) for a sentence that fits a learned phrasing, else None.
+        Entity values keep their quotes, like intent_parser.extract_entities.
+        record=False looks without counting it as a use.
+        """
+        text = normalize(sentence)
+        index = self._index
+        if not index:
+            return None
+        best = None
+        for word in set(text.lower().split()) | {None}:
+            for template, regex in index.get(word, ()):
+                m = regex.fullmatch(text)
+                if m and (best is None or len(_SLOT.sub("", template)) > len(_SLOT.sub("", best[0]))):
+                    best = (template, m)
+                    break
+        if best is None:
+            return None
+
+        template, m = best
+        with self._lock:
+            phrase = self._phrases.get(template)
+            if phrase is None:
+                return None
+            if record:
+                self._phrases[template] = phrase._replace(uses=phrase.uses + 1, last_used=time.time())
+                self._dirty = True
+                self.hits += 1
+        entities = {slot: None for slot in SLOTS}
+        entities.update(m.groupdict())
+        return phrase.intent, entities
+
+    # --- learning --------------------------------------------------------
+
+    def learn(self, sentence, intent, entities, source="ai"):
+        """Remembers a confirmed resolution. Returns the template, or None if it can't be generalized."""
+        template = make_template(sentence, entities or {})
+        if template is None or intent in (None, "UNKNOWN"):
+            return None
+        now = time.time()
+        with self._lock:
+            old = self._phrases.get(template)
+            if old is not None and old.intent == intent:
+                phrase = old._replace(uses=old.uses + 1, last_used=now)
+                if source == "user":
+                    phrase = phrase._replace(source="user")
+            else:
+                # New, or the same words now mean something else: the latest answer wins
+                phrase = LearnedPhrase(template, intent, 1, now, now, source)
+            self._phrases[template] = phrase
+            self._evict(now)
+            self._reindex()
+            self._dirty = True
+            self.version += 1
+        self.save()
+        return template
+
+    def weight(self, phrase, now=None):
+        age = (now or time.time()) - phrase.last_used
+        return phrase.uses * 0.5 ** (max(age, 0) / self.half_life)
+
+    def _evict(self, now):
+        weights = {t: self.weight(p, now) for t, p in self._phrases.items()}
+        doomed = [t for t, w in weights.items() if w < self.min_weight]
+        overflow = len(self._phrases) - len(doomed) - self.max_entries
+        if overflow > 0:
+            alive = sorted((t for t in weights if weights[t] >= self.min_weight), key=weights.get)
+            doomed += alive[:overflow]
+        for template in doomed:
+            del self._phrases[template]
+        return bool(doomed)
+
+    # --- list / forget ---------------------------------------------------
+
+    def phrases(self):
+        """Learned phrases, most used (decayed) first."""
+        now = time.time()
+        with self._lock:
+            return sorted(self._phrases.values(), key=lambda p: self.weight(p, now), reverse=True)
+
+    def forget(self, what):
+        """
+        Forgets by number (as shown by phrases()), by template, by a sentence it
+        matches, or "all". Returns the forgotten phrases.
+        """
+        what = what.strip()
+        listed = self.phrases()
+        if what.lower() == "all":
+            doomed = listed
+        elif what.isdigit():
+            n = int(what)
+            doomed = listed[n - 1:n] if n >= 1 else []
+        else:
+            text = normalize(what)
+            doomed = [p for p in listed if p.template == text.lower()]
+            if not doomed:
+                doomed = [p for p in listed if _compile(p.template).fullmatch(text)]
+        if not doomed:
+            return []
+        with self._lock:
+            for phrase in doomed:
+                self._phrases.pop(phrase.template, None)
+            self._reindex()
+            self._dirty = True
+            self.version += 1
+        self.save()
+        return doomed
+
+_memory = None
+_memory_lock = threading.Lock()
+
+def get_phrase_memory():
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                import atexit
+                _memory = PhraseMemory()
+                # Use counts are only written with the next learn/forget, or here
+                atexit.register(_memory.save)
+    return _memory
@@ -23,14 +23,34 @@ class Plugin(ABC):
         """List of intents this plugin handles"""
         pass
 
-    @abstractmethod
+    @property
+    def phrases(self) -> dict:
+        """
+        Optional trigger phrases per intent, e.g. {"CHECK_TIME": ["what time is it"]}.
+        They are merged into the intent matcher alongside intents.json.
+        """
+        return {}
+
+    @property
+    def commands(self) -> dict:
+        """
+        Optional command templates per intent and OS, e.g.
+        {"DISK_USAGE": {"LINUX": "du -sh {name}", "WINDOWS": "dir /s {name}"}}
+        ("*" for any OS). {name}, {source} and {destination} are filled from
+        the entities, quoted for the shell. They go into the same table as
+        the core commands, so these intents map without calling execute()
+        (or importing the plugin at all).
+        """
+        return {}
+
     def execute(self, intent: str, entities: dict, os_type: str) -> str:
         """
-        Execute the logic for the given intent.
+        Execute the logic for the given intent (any intent without a command
+        template for the current OS).
         
         Returns:
             str: The command or output to be displayed/executed.
                  If it returns a string starting with "EXEC:", the terminal will run it as a system command.
                  Otherwise, it returns the string as output.
         """
-        pass
+        return None
@@ -1,40 +1,190 @@
 import os
+import json
+import hashlib
 import importlib.util
 import inspect
+import threading
+from collections import namedtuple
 from plugin_interface import Plugin
+from config import BASE_DIR, PLUGIN_MANIFEST
 
-PLUGIN_DIR = "plugins"
+PLUGIN_DIR = os.path.join(BASE_DIR, "plugins")
 
-def load_plugins():
-    plugins = []
+# What the manifest remembers about one Plugin subclass: enough to route to
+# it and list it without importing its module.
+PluginSpec = namedtuple("PluginSpec", ["name", "description", "intents", "phrases", "commands", "file", "class_name"])
 
+def _plugin_files():
     if not os.path.exists(PLUGIN_DIR):
         os.makedirs(PLUGIN_DIR)
-        return plugins
+        return []
+    return sorted(f for f in os.listdir(PLUGIN_DIR) if f.endswith(".py") and not f.startswith("__"))
 
-    for file in os.listdir(PLUGIN_DIR):
-        if file.endswith(".py") and not file.startswith("__"):
-            path = os.path.join(PLUGIN_DIR, file)
-            module_name = file[:-3]
-            
+def _load_module(file):
+    path = os.path.join(PLUGIN_DIR, file)
+    spec = importlib.util.spec_from_file_location(file[:-3], path)
+    if not (spec and spec.loader):
+        raise ImportError(f"cannot load {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _plugin_classes(module):
+    # Find subclasses of Plugin
+    for name, obj in inspect.getmembers(module):
+        if inspect.isclass(obj) and issubclass(obj, Plugin) and obj is not Plugin:
+            yield name, obj
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class PluginRegistry:
+    """
+    The one process-wide view of the plugins folder.
+
+    Startup only reads a manifest (plugin name, intents, phrases per file),
+    keyed by each file's mtime/size and content hash. A plugin file is
+    imported only when it is new or changed, or the first time one of its
+    intents fires. Intent -> plugin lookup is a dict access.
+    """
+
+    def __init__(self, manifest_path=PLUGIN_MANIFEST):
+        self.manifest_path = manifest_path
+        self.specs = []
+        self._by_intent = {}
+        self._instances = {}
+        self._lock = threading.Lock()
+        self._scan()
+
+    # --- manifest --------------------------------------------------------
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp, self.manifest_path)
+        except OSError:
+            pass  # read-only install: we just rescan next time
+
+    def _describe(self, file):
+        """Imports a plugin file and returns its manifest records (keeping the instances)."""
+        module = _load_module(file)
+        records = []
+        for name, cls in _plugin_classes(module):
             try:
-                spec = importlib.util.spec_from_file_location(module_name, path)
-                if spec and spec.loader:
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    
-                    # Find subclasses of Plugin
-                    for name, obj in inspect.getmembers(module):
-                        if (inspect.isclass(obj) 
-                            and issubclass(obj, Plugin) 
-                            and obj is not Plugin):
-                            try:
-                                instance = obj()
-                                plugins.append(instance)
-                            except Exception as e:
-                                print(f"Error instantiating plugin {name}: {e}")
+                instance = cls()
             except Exception as e:
-                print(f"Failed to load plugin {file}: {e}")
+                print(f"Error instantiating plugin {name}: {e}")
+                continue
+            self._instances[(file, name)] = instance
+            records.append({
+                "name": instance.name,
+                "description": instance.description,
+                "intents": list(instance.intents),
+                "phrases": {k: list(v) for k, v in getattr(instance, "phrases", {}).items()},
+                "commands": {k: dict(v) for k, v in getattr(instance, "commands", {}).items()},
+                "class_name": name,
+            })
+        return records
+
+    def _scan(self):
+        old = self._read_manifest()
+        manifest = {}
+
+        for file in _plugin_files():
+            path = os.path.join(PLUGIN_DIR, file)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+
+            entry = old.get(file)
+            if entry and (entry.get("mtime_ns"), entry.get("size")) != (st.st_mtime_ns, st.st_size):
+                # Touched (checkout, copy): only content changes force an import
+                digest = _file_hash(path)
+                entry = dict(entry, mtime_ns=st.st_mtime_ns, size=st.st_size) if entry.get("sha256") == digest else None
+
+            if entry is None:
+                try:
+                    records = self._describe(file)
+                except Exception as e:
+                    print(f"Failed to load plugin {file}: {e}")
+                    continue  # not cached, so it is retried (and reported) next start
+                entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": _file_hash(path), "plugins": records}
+
+            manifest[file] = entry
+
+        if manifest != old:
+            self._write_manifest(manifest)
+
+        for file, entry in manifest.items():
+            for record in entry.get("plugins", []):
+                spec = PluginSpec(
+                    record["name"], record.get("description", ""), record["intents"],
+                    record.get("phrases", {}), record.get("commands", {}), file, record["class_name"],
+                )
+                self.specs.append(spec)
+                for intent in spec.intents:
+                    self._by_intent.setdefault(intent, spec)  # first plugin (by file name) wins
+
+    # --- lookup ----------------------------------------------------------
+
+    def intents(self):
+        return list(self._by_intent)
+
+    def handles(self, intent):
+        return intent in self._by_intent
+
+    def commands(self, intent):
+        """The command templates `intent`'s plugin declares, {os_type: template} ({} if it has none)."""
+        spec = self._by_intent.get(intent)
+        return {} if spec is None else dict(spec.commands.get(intent, {}))
+
+    def get(self, intent):
+        """The plugin instance for `intent`, importing its module on first use. None if there isn't one."""
+        spec = self._by_intent.get(intent)
+        return None if spec is None else self.instance(spec)
+
+    def instance(self, spec):
+        key = (spec.file, spec.class_name)
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if key not in self._instances:
+                try:
+                    module = _load_module(spec.file)
+                    self._instances[key] = getattr(module, spec.class_name)()
+                except Exception as e:
+                    print(f"Failed to load plugin {spec.file}: {e}")
+                    return None
+            return self._instances[key]
+
+    def execute(self, intent, entities, os_type):
+        plugin = self.get(intent)
+        if plugin is None:
+            return None
+        return plugin.execute(intent, entities, os_type)
 
-    return plugins
+_registry = None
+_registry_lock = threading.Lock()
 
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PluginRegistry()
+    return _registry
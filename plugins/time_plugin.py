@@ -14,6 +14,13 @@ class TimePlugin(Plugin):
     def intents(self) -> list:
         return ["CHECK_TIME", "CHECK_DATE"]
 
+    @property
+    def phrases(self) -> dict:
+        return {
+            "CHECK_TIME": ["what time is it", "current time", "show time", "time now"],
+            "CHECK_DATE": ["what is the date", "current date", "show date", "todays date"],
+        }
+
     def execute(self, intent: str, entities: dict, os_type: str) -> str:
         now = datetime.now()
         if intent == "CHECK_TIME":
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM answers.
+
+    - Memory: an LRU of the most recent answers (OrderedDict).
+    - Disk: one JSON file per answer, bounded in bytes, oldest-used evicted first.
+
+    Keys are sha256(model + normalized prompt), so switching config.AI_MODEL
+    never returns answers produced by another model; the disk tier is also
+    wiped the first time a different model is seen.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=None, max_bytes=None, ttl=None):
+        self.cache_dir = cache_dir or config.LLM_CACHE_DIR
+        self.max_entries = max_entries or config.LLM_CACHE_MEMORY_ENTRIES
+        self.max_bytes = max_bytes or config.LLM_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else config.LLM_CACHE_TTL
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self._checked_model = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # --- keys ------------------------------------------------------------
+
+    @staticmethod
+    def normalize(prompt):
+        return " ".join(prompt.split())
+
+    def key(self, prompt, model=None):
+        model = model or config.AI_MODEL
+        raw = f"{model}\0{self.normalize(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    # --- public API ------------------------------------------------------
+
+    def get(self, prompt):
+        model = config.AI_MODEL
+        key = self.key(prompt, model)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry["created"] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry["response"]
+                del self._memory[key]
+
+            entry = self._read_disk(key, model, now)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._remember(key, entry)
+            self.hits += 1
+            self.disk_hits += 1
+            return entry["response"]
+
+    def put(self, prompt, response):
+        if not response:
+            return
+        model = config.AI_MODEL
+        key = self.key(prompt, model)
+        entry = {"model": model, "created": time.time(), "response": response}
+
+        with self._lock:
+            self._remember(key, entry)
+            self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._wipe_disk()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_usage(),
+            }
+
+    # --- memory tier -----------------------------------------------------
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # --- disk tier -------------------------------------------------------
+
+    def _ensure_model(self, model):
+        """Drops every disk entry once the configured model differs from the stored one."""
+        if self._checked_model == model:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        marker = os.path.join(self.cache_dir, "MODEL")
+        try:
+            with open(marker, "r", encoding="utf-8") as f:
+                stored = f.read().strip()
+        except OSError:
+            stored = None
+        if stored != model:
+            self._wipe_disk()
+            with open(marker, "w", encoding="utf-8") as f:
+                f.write(model)
+        self._checked_model = model
+
+    def _read_disk(self, key, model, now):
+        try:
+            self._ensure_model(model)
+            path = self._path(key)
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("model") != model or now - entry.get("created", 0) > self.ttl:
+            self._remove(path)
+            return None
+
+        # Disk eviction is by mtime, so touching the file marks it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write_disk(self, key, entry):
+        try:
+            self._ensure_model(entry["model"])
+            path = self._path(key)
+            # Counted before the write, or a first scan would already see the new file
+            used = self._disk_usage()
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+            self._disk_bytes = used - old_size + os.path.getsize(path)
+        except OSError:
+            return
+        if self._disk_bytes > self.max_bytes:
+            self._evict_disk()
+
+    def _entries(self):
+        try:
+            with os.scandir(self.cache_dir) as it:
+                return [e for e in it if e.is_file() and e.name.endswith(".json")]
+        except OSError:
+            return []
+
+    def _disk_usage(self):
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(e.stat().st_size for e in self._entries())
+        return self._disk_bytes
+
+    def _evict_disk(self):
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        # Evict down to 90% so a full cache doesn't rescan on every write
+        target = self.max_bytes * 0.9
+        for e in entries:
+            if total <= target:
+                break
+            total -= e.stat().st_size
+            self._remove(e.path)
+        self._disk_bytes = total
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _wipe_disk(self):
+        for e in self._entries():
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+        self._disk_bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -1,5 +1,3 @@
-from rich.prompt import Confirm
-
 def is_safe(entity=None):
     dangerous = ["C:\\", "C:/", "Windows", "System32", "/"]
     
@@ -16,18 +14,17 @@ def is_safe(entity=None):
 
     return True
 
-def confirm_action(action_desc, mode):
+def confirmation_prompt(action_desc, mode):
     """
-    Asks for user confirmation based on mode.
+    The question to ask before `action_desc` in the given mode, or None if no confirmation is needed.
     - Safe: Always ask
     - Beginner: Ask for deletions/modifications
     - Expert: Only ask for very dangerous things (system files) - but here mostly trusting logic
     """
     if mode == "safe":
-        return Confirm.ask(f"[bold red]SAFETY CHECK:[/bold red] Are you sure you want to {action_desc}?")
-    
+        return f"[bold red]SAFETY CHECK:[/bold red] Are you sure you want to {action_desc}?"
+
     if mode == "beginner":
-        return Confirm.ask(f"[yellow]Confirm:[/yellow] Do you want to {action_desc}?")
-        
-    return True # Expert mode defaults to yes basically, or handled elsewhere
+        return f"[yellow]Confirm:[/yellow] Do you want to {action_desc}?"
 
+    return None # Expert mode defaults to yes basically, or handled elsewhere
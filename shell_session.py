@@ -0,0 +1,144 @@
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import uuid
+
+from config import SHELL_PATH
+
+
+class ShellSession:
+    """
+    A long-lived POSIX shell driven over pipes.
+
+    Every command is sent as `command eval '<cmd>' < /dev/null` followed by a
+    sentinel on stdout (carrying the exit code and $PWD) and one on stderr.
+    Reading until both sentinels arrive frames each command without forking
+    a new shell, so cd/export persist between commands.
+
+    `command eval` keeps a syntax error from killing the shell, and the INT
+    trap keeps Ctrl-C from killing it while still interrupting the child.
+    If the shell dies anyway (e.g. the user ran `exit`) it is respawned in the
+    last known directory on the next command.
+    """
+
+    def __init__(self, shell=SHELL_PATH, cwd=None):
+        self.shell = shell
+        self.cwd = cwd or os.getcwd()
+        self.respawns = 0
+        self._started = False
+        self._proc = None
+        self._events = None
+        self._lock = threading.Lock()
+
+    # --- process management ----------------------------------------------
+
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _spawn(self):
+        if self._started:
+            self.respawns += 1
+        self._started = True
+        self._proc = subprocess.Popen(
+            [self.shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.cwd if os.path.isdir(self.cwd) else None,
+        )
+        # Bounded, so a fast producer blocks on the pipe instead of growing our memory
+        self._events = queue.Queue(maxsize=4096)
+        for name, pipe in [("out", self._proc.stdout), ("err", self._proc.stderr)]:
+            threading.Thread(
+                target=self._pump, args=(name, pipe, self._events), name=f"shell-{name}", daemon=True
+            ).start()
+        self._write("trap : INT\n")
+
+    @staticmethod
+    def _pump(name, pipe, events):
+        # One reader per pipe: a chatty stderr can never block stdout (or vice versa)
+        for line in iter(pipe.readline, b""):
+            events.put((name, line))
+        events.put((name, None))
+
+    def _write(self, text):
+        self._proc.stdin.write(text.encode("utf-8"))
+        self._proc.stdin.flush()
+
+    def close(self):
+        with self._lock:
+            if self.alive():
+                try:
+                    self._write("exit\n")
+                    self._proc.wait(timeout=1)
+                except Exception:
+                    self._proc.kill()
+            self._proc = None
+
+    # --- commands --------------------------------------------------------
+
+    def run(self, command):
+        """Runs one command and returns (stdout, stderr, returncode)."""
+        chunks = {"out": [], "err": []}
+        returncode = self.stream(command, chunks["out"].append, chunks["err"].append)
+        return "".join(chunks["out"]), "".join(chunks["err"]), returncode
+
+    def stream(self, command, on_stdout, on_stderr):
+        """
+        Runs one command, handing every stdout/stderr line to the callbacks
+        as soon as it is read. Nothing is accumulated here. Returns the exit code.
+        """
+        with self._lock:
+            if not self.alive():
+                self._spawn()
+
+            marker = f"__NLT_{uuid.uuid4().hex}__"
+            script = (
+                f"command eval {shlex.quote(command)} < /dev/null\n"
+                f"printf '{marker} %d %s\\n' \"$?\" \"$PWD\"\n"
+                f"printf '{marker}\\n' >&2\n"
+            )
+            try:
+                self._write(script)
+            except (BrokenPipeError, OSError):
+                self._proc = None
+                self._spawn()
+                self._write(script)
+
+            return self._collect(marker, {"out": on_stdout, "err": on_stderr})
+
+    def _collect(self, marker, sinks):
+        prefix = marker.encode("ascii")
+        done = {"out": False, "err": False}
+        returncode = None
+
+        while not (done["out"] and done["err"]):
+            stream, line = self._events.get()
+            if line is None:
+                # Pipe closed before the sentinel: the shell died mid-command
+                done[stream] = True
+                if returncode is None:
+                    returncode = self._proc.wait()
+                continue
+
+            # Output without a trailing newline puts the sentinel mid-line
+            pos = line.find(prefix)
+            if pos < 0:
+                sinks[stream](line.decode("utf-8", errors="ignore"))
+                continue
+
+            if pos > 0:
+                sinks[stream](line[:pos].decode("utf-8", errors="ignore"))
+            done[stream] = True
+            if stream == "out":
+                parts = line[pos:].decode("utf-8", errors="ignore").rstrip("\n").split(" ", 2)
+                returncode = int(parts[1]) if len(parts) > 1 and parts[1].lstrip("-").isdigit() else 1
+                if len(parts) > 2 and parts[2]:
+                    self.cwd = parts[2]
+
+        if not self.alive():
+            self._proc = None
+
+        return returncode if returncode is not None else 1
@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+
+try:
+    import pwd  # user names for the process list; POSIX only
+except ImportError:
+    pwd = None
+
+# Native Linux metrics read straight from /proc: no subprocesses, no text
+# re-parsing. Every function returns plain dicts for output_formatter.
+
+PROC = "/proc"
+
+# Intents answered in-process when /proc is available
+METRIC_INTENTS = {"CHECK_RAM", "CHECK_CPU", "CHECK_DISK", "LIST_PROCESSES"}
+
+# Mount types that are not real storage (df hides most of them too)
+PSEUDO_FILESYSTEMS = {
+    "proc", "sysfs", "devpts", "cgroup", "cgroup2", "securityfs", "pstore", "debugfs",
+    "tracefs", "mqueue", "hugetlbfs", "configfs", "fusectl", "bpf", "autofs",
+    "binfmt_misc", "nsfs", "rpc_pipefs", "selinuxfs", "efivarfs", "ramfs",
+}
+
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS, PAGE_SIZE = 100, 4096
+
+
+def available():
+    return os.path.isfile(os.path.join(PROC, "meminfo"))
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+# --- memory ---------------------------------------------------------------
+
+def memory_info():
+    values = {}
+    for line in _read(os.path.join(PROC, "meminfo")).splitlines():
+        key, _, rest = line.partition(":")
+        parts = rest.split()
+        if parts and parts[0].isdigit():
+            values[key] = int(parts[0]) * 1024  # kB -> bytes
+
+    total = values.get("MemTotal", 0)
+    # Kernels before 3.14 have no MemAvailable; approximate it like `free` does
+    avail = values.get("MemAvailable", values.get("MemFree", 0) + values.get("Buffers", 0) + values.get("Cached", 0))
+    used = total - avail
+    return {
+        "total": total,
+        "used": used,
+        "free": values.get("MemFree", 0),
+        "available": avail,
+        "buff_cache": values.get("Buffers", 0) + values.get("Cached", 0) + values.get("SReclaimable", 0),
+        "swap_total": values.get("SwapTotal", 0),
+        "swap_used": values.get("SwapTotal", 0) - values.get("SwapFree", 0),
+        "percent": used / total * 100 if total else 0.0,
+    }
+
+
+# --- cpu ------------------------------------------------------------------
+
+def _cpu_times():
+    """{"cpu": (busy, total), "cpu0": ...} from /proc/stat."""
+    times = {}
+    for line in _read(os.path.join(PROC, "stat")).splitlines():
+        if not line.startswith("cpu"):
+            break
+        parts = line.split()
+        fields = [int(v) for v in parts[1:]]
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        # guest time is already counted in user/nice
+        total = sum(fields[:8])
+        times[parts[0]] = (total - idle, total)
+    return times
+
+
+class CpuSampler:
+    """Turns cumulative /proc/stat counters into usage since the previous sample."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = None
+
+    def prime(self):
+        with self._lock:
+            self._last = _cpu_times()
+
+    def sample(self):
+        now = _cpu_times()
+        with self._lock:
+            # First call without prime(): usage since boot
+            last = self._last or {k: (0, 0) for k in now}
+            self._last = now
+
+        def percent(key):
+            busy, total = now[key]
+            prev_busy, prev_total = last.get(key, (0, 0))
+            delta = total - prev_total
+            return (busy - prev_busy) / delta * 100 if delta > 0 else 0.0
+
+        cores = sorted((k for k in now if k != "cpu"), key=lambda k: int(k[3:]))
+        return {"percent": percent("cpu"), "cores": [percent(k) for k in cores]}
+
+
+_cpu_sampler = CpuSampler()
+
+
+def prime():
+    """Takes baseline samples so the first query reports recent (not since-boot) usage."""
+    if available():
+        _cpu_sampler.prime()
+        _process_sampler.prime()
+
+
+def cpu_usage():
+    usage = _cpu_sampler.sample()
+    try:
+        load = [float(v) for v in _read(os.path.join(PROC, "loadavg")).split()[:3]]
+    except (OSError, ValueError):
+        load = []
+    usage["count"] = len(usage["cores"])
+    usage["load_avg"] = load
+    return usage
+
+
+# --- disks ----------------------------------------------------------------
+
+def disk_usage():
+    disks = []
+    seen = set()
+    for line in _read(os.path.join(PROC, "mounts")).splitlines():
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        device, mount, fstype = parts[0], parts[1].replace("\\040", " "), parts[2]
+        if fstype in PSEUDO_FILESYSTEMS or (device, mount) in seen:
+            continue
+        seen.add((device, mount))
+        try:
+            st = os.statvfs(mount)
+        except OSError:
+            continue
+        total = st.f_blocks * st.f_frsize
+        if total == 0:
+            continue
+        free = st.f_bavail * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        disks.append({
+            "device": device,
+            "mount": mount,
+            "fstype": fstype,
+            "total": total,
+            "used": used,
+            "free": free,
+            "percent": used / (used + free) * 100 if used + free else 0.0,
+        })
+    return disks
+
+
+# --- processes ------------------------------------------------------------
+
+def _uptime():
+    return float(_read(os.path.join(PROC, "uptime")).split()[0])
+
+
+_users = {}
+
+
+def _user_name(uid):
+    name = _users.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name if pwd is not None else str(uid)
+        except KeyError:
+            name = str(uid)
+        _users[uid] = name
+    return name
+
+
+def _read_process(pid):
+    path = os.path.join(PROC, pid)
+    raw = _read(os.path.join(path, "stat"))
+    # comm may contain spaces and parentheses: it's everything up to the LAST ')'
+    head, _, tail = raw.rpartition(")")
+    name = head.partition("(")[2]
+    fields = tail.split()
+    return {
+        "pid": int(pid),
+        "name": name,
+        "state": fields[0],
+        "ticks": int(fields[11]) + int(fields[12]),  # utime + stime
+        "threads": int(fields[17]),
+        "start": int(fields[19]) / CLOCK_TICKS,
+        "rss": int(fields[21]) * PAGE_SIZE,
+        "user": _user_name(os.stat(path).st_uid),
+    }
+
+
+class ProcessSampler:
+    """CPU% per process from the tick delta since the previous snapshot (like top)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}
+        self._last_time = None
+
+    def _snapshot(self):
+        procs = []
+        for entry in os.listdir(PROC):
+            if not entry.isdigit():
+                continue
+            try:
+                procs.append(_read_process(entry))
+            except (OSError, IndexError, ValueError):
+                continue  # process exited while we were reading it
+        return procs
+
+    def prime(self):
+        procs = self._snapshot()
+        with self._lock:
+            self._last = {p["pid"]: p["ticks"] for p in procs}
+            self._last_time = time.monotonic()
+
+    def sample(self):
+        procs = self._snapshot()
+        now = time.monotonic()
+        uptime = _uptime()
+        with self._lock:
+            last, last_time = self._last, self._last_time
+            self._last = {p["pid"]: p["ticks"] for p in procs}
+            self._last_time = now
+
+        elapsed = now - last_time if last_time else 0
+        for p in procs:
+            if elapsed > 0.05 and p["pid"] in last:
+                p["cpu"] = (p["ticks"] - last[p["pid"]]) / CLOCK_TICKS / elapsed * 100
+            else:
+                # New process (or no baseline yet): lifetime average, as ps reports it
+                age = uptime - p["start"]
+                p["cpu"] = p["ticks"] / CLOCK_TICKS / age * 100 if age > 0 else 0.0
+        return procs
+
+
+_process_sampler = ProcessSampler()
+
+
+def process_table(sort_by="cpu", limit=15):
+    """The top `limit` processes by "cpu" or "mem", with a real sort over every process."""
+    mem_total = memory_info()["total"]
+    procs = _process_sampler.sample()
+    for p in procs:
+        p["mem"] = p["rss"] / mem_total * 100 if mem_total else 0.0
+    key = "mem" if sort_by == "mem" else "cpu"
+    procs.sort(key=lambda p: (p[key], p["rss"]), reverse=True)
+    return {"sort_by": key, "total": len(procs), "processes": procs[:limit]}
+
+
+def query(intent, sort_by="cpu", limit=15):
+    if intent == "CHECK_RAM":
+        return memory_info()
+    if intent == "CHECK_CPU":
+        return cpu_usage()
+    if intent == "CHECK_DISK":
+        return disk_usage()
+    if intent == "LIST_PROCESSES":
+        return process_table(sort_by, limit)
+    return None
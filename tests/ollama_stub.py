@@ -0,0 +1,134 @@
+"""
+A local stand-in for the Ollama REST API, for tests.
+
+Answers /api/generate (prompt-less model loads, plain and NDJSON-streamed
+generations) and /api/tags over HTTP/1.1 keep-alive, and records every
+request and every TCP connection it accepted.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Durations a real server reports, in nanoseconds
+LOAD_DURATION = 2_500_000_000
+PROMPT_EVAL_DURATION = 40_000_000
+EVAL_DURATION = 160_000_000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        stub = self.server.stub
+        with stub.lock:
+            stub.connections += 1
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests.append(("GET", self.path, None))
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": stub.model}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests.append(("POST", self.path, payload))
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        if "prompt" not in payload:
+            # A prompt-less generate only loads the model
+            time.sleep(stub.load_delay)
+            self._send_json({"model": payload.get("model"), "response": "", "done": True,
+                             "done_reason": "load", "load_duration": LOAD_DURATION})
+            return
+
+        final = {"done": True, "done_reason": "stop", "load_duration": 1_000_000,
+                 "prompt_eval_duration": PROMPT_EVAL_DURATION, "eval_duration": EVAL_DURATION,
+                 "eval_count": len(stub.tokens)}
+        if not payload.get("stream", True):
+            self._send_json(dict(final, response="".join(stub.tokens)))
+            return
+
+        lines = [{"response": token, "done": False} for token in stub.tokens]
+        if stub.break_stream:
+            # Half the answer, then the connection goes away without a "done" chunk
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for line in lines[:len(lines) // 2]:
+                self.wfile.write(json.dumps(line).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        body = b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines + [dict(final, response="")])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class OllamaStub:
+    """
+    Runs the stand-in on a free local port until stop().
+
+    `tokens` is the answer every generation returns, `load_delay` how long
+    a model load takes and `break_stream` cuts streamed answers off half-way.
+    """
+
+    def __init__(self, tokens=("Hello", ", ", "world", "!"), load_delay=0.0, model="stub"):
+        self.tokens = list(tokens)
+        self.load_delay = load_delay
+        self.break_stream = False
+        self.model = model
+        self.lock = threading.Lock()
+        self.requests = []     # (method, path, JSON payload) in arrival order
+        self.connections = 0   # TCP connections accepted
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def host(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def unused_host():
+    """An http:// address nothing listens on."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
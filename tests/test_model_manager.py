@@ -0,0 +1,120 @@
+"""
+ModelManager against a local stand-in server: the background load, the
+keep-alive it sends, queries waiting out a load, and the load-time stats.
+
+    python -m unittest discover tests
+"""
+import threading
+import time
+import unittest
+from unittest import mock
+
+# ollama_stub also puts the repository root on sys.path for the imports below
+from ollama_stub import OllamaStub, unused_host, LOAD_DURATION
+
+import model_manager
+from model_manager import ModelManager, IDLE, LOADING, READY, FAILED
+from ollama_client import OllamaClient
+
+LOAD_DELAY = 0.4
+
+
+class ModelManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = OllamaStub(load_delay=LOAD_DELAY)
+        self.client = OllamaClient(self.stub.host, timeout=5)
+        self.manager = ModelManager(model="stub", keep_alive=600, client=self.client)
+        for name, value in [("AI_BACKEND", "http"), ("AI_WARMUP", True)]:
+            patcher = mock.patch.object(model_manager, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.manager.stop()
+        self.client.close()
+        self.stub.stop()
+
+    def test_load_model_is_a_promptless_generate_with_keep_alive(self):
+        result = self.client.load_model("stub", keep_alive=600, timeout=5)
+        method, path, payload = self.stub.requests[0]
+        self.assertEqual((method, path), ("POST", "/api/generate"))
+        self.assertEqual(payload, {"model": "stub", "keep_alive": 600})
+        self.assertGreaterEqual(result["seconds"], LOAD_DELAY)
+        self.assertAlmostEqual(result["load_seconds"], LOAD_DURATION / 1e9)
+
+    def test_start_loads_in_the_background(self):
+        states = []
+        self.manager.on_change(lambda m: states.append(m.state))
+        started = time.monotonic()
+        self.manager.start()
+        self.assertLess(time.monotonic() - started, LOAD_DELAY / 2)  # didn't block
+        self.assertEqual(self.manager.state, LOADING)
+
+        self.assertTrue(self.manager.wait(timeout=5))
+        self.assertEqual(states, [LOADING, READY])
+        self.assertEqual(self.stub.requests[0][2]["keep_alive"], 600)
+
+        # A second start() while ready doesn't load again
+        self.manager.start()
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_queries_wait_while_the_model_loads(self):
+        self.manager.start()
+        finished = {}
+
+        def query():
+            self.manager.wait(timeout=5)
+            finished["at"] = time.monotonic()
+            finished["answer"] = self.client.generate("hi")
+
+        started = time.monotonic()
+        worker = threading.Thread(target=query)
+        worker.start()
+        worker.join(5)
+        self.assertGreaterEqual(finished["at"] - started, LOAD_DELAY * 0.8)
+        self.assertEqual(finished["answer"], "Hello, world!")
+        # The load went out before the query
+        self.assertNotIn("prompt", self.stub.requests[0][2])
+        self.assertEqual(self.stub.requests[1][2]["prompt"], "hi")
+
+    def test_wait_returns_at_once_without_a_load(self):
+        started = time.monotonic()
+        self.assertFalse(self.manager.wait(timeout=5))
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual(self.manager.state, IDLE)
+
+    def test_load_time_stats(self):
+        self.manager.start()
+        self.manager.wait(timeout=5)
+        self.client.generate("hi")
+
+        status = self.manager.status()
+        self.assertEqual(status["state"], READY)
+        self.assertEqual(status["keep_alive"], 600)
+        self.assertGreaterEqual(status["load_seconds"], LOAD_DELAY)
+        self.assertAlmostEqual(status["server_load_seconds"], LOAD_DURATION / 1e9)
+        # The warm-up is a load, not a query; only the generate counts as a request
+        self.assertEqual(status["requests"], 1)
+        self.assertEqual(self.client.timing_stats()["loads"], 1)
+        self.assertGreater(status["inference_seconds"], 0)
+
+    def test_heartbeat_refreshes_the_keep_alive(self):
+        self.manager.start()
+        self.manager.wait(timeout=5)
+        self.assertIsNotNone(self.manager._heartbeat)
+        self.manager._refresh()
+        loads = [payload for _, _, payload in self.stub.requests if "prompt" not in payload]
+        self.assertEqual(len(loads), 2)
+        self.assertTrue(all(payload["keep_alive"] == 600 for payload in loads))
+
+    def test_unreachable_server_fails_the_load(self):
+        client = OllamaClient(unused_host(), timeout=2)
+        manager = ModelManager(model="stub", client=client)
+        manager.start()
+        self.assertFalse(manager.wait(timeout=5))
+        self.assertEqual(manager.state, FAILED)
+        self.assertTrue(manager.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+OllamaClient against a local stand-in server: connection reuse, NDJSON
+streaming (whole and broken off), and local_ai's fallback to the CLI.
+
+    python -m unittest discover tests
+"""
+import os
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+# ollama_stub also puts the repository root on sys.path for the imports below
+from ollama_stub import OllamaStub, unused_host, PROMPT_EVAL_DURATION, EVAL_DURATION
+
+import local_ai
+from model_manager import ModelManager
+from ollama_client import OllamaClient, OllamaError, OllamaUnavailable
+from response_cache import ResponseCache
+
+
+class PooledClientTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = OllamaStub()
+        self.client = OllamaClient(self.stub.host, timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.stop()
+
+    def test_calls_reuse_one_connection(self):
+        self.assertEqual(self.client.generate("hi"), "Hello, world!")
+        self.assertEqual(self.client.generate("again"), "Hello, world!")
+        self.assertEqual("".join(self.client.generate_stream("streamed")), "Hello, world!")
+        self.assertTrue(self.client.is_available())
+        self.assertEqual(len(self.stub.requests), 4)
+        self.assertEqual(self.stub.connections, 1)
+
+    def test_requests_carry_model_and_keep_alive(self):
+        self.client.generate("hi", model="stub")
+        _, path, payload = self.stub.requests[0]
+        self.assertEqual(path, "/api/generate")
+        self.assertEqual(payload["model"], "stub")
+        self.assertFalse(payload["stream"])
+        self.assertIn("keep_alive", payload)
+
+    def test_stream_yields_tokens_in_order(self):
+        self.assertEqual(list(self.client.generate_stream("hi")), ["Hello", ", ", "world", "!"])
+        stats = self.client.timing_stats()
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["tokens"], 4)
+        self.assertAlmostEqual(stats["inference_seconds"], (PROMPT_EVAL_DURATION + EVAL_DURATION) / 1e9)
+
+    def test_stream_broken_off_raises_and_drops_the_connection(self):
+        self.stub.break_stream = True
+        tokens = []
+        with self.assertRaises(OllamaError):
+            for token in self.client.generate_stream("hi"):
+                tokens.append(token)
+        self.assertEqual(tokens, ["Hello", ", "])
+        self.assertTrue(self.client._pool.empty())
+
+        # The next call opens a fresh connection and works
+        self.stub.break_stream = False
+        self.assertEqual(self.client.generate("hi"), "Hello, world!")
+        self.assertEqual(self.stub.connections, 2)
+
+    def test_unreachable_server(self):
+        client = OllamaClient(unused_host(), timeout=2)
+        with self.assertRaises(OllamaUnavailable):
+            client.generate("hi")
+        self.assertFalse(client.is_available())
+
+
+class _LocalAi:
+    """Wires run_llm / stream_llm / stream_cached to a given client, with no warm-up to wait for."""
+
+    def use_client(self, client):
+        self.addCleanup(client.close)
+        for name, value in [("get_client", lambda: client), ("get_model", lambda: ModelManager(client=client)),
+                            ("AI_BACKEND", "http")]:
+            patcher = mock.patch.object(local_ai, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def use_cache(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = ResponseCache(cache_dir=tmp.name)
+        patcher = mock.patch.object(local_ai, "get_cache", lambda: cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return cache
+
+
+class LocalAiTest(_LocalAi, unittest.TestCase):
+    def test_broken_stream_is_not_cached(self):
+        stub = OllamaStub()
+        self.addCleanup(stub.stop)
+        self.use_client(OllamaClient(stub.host, timeout=5))
+        cache = self.use_cache()
+
+        stub.break_stream = True
+        self.assertEqual("".join(local_ai.stream_cached("prompt")), "Hello, ")
+        self.assertIsNone(cache.get("prompt"))
+
+        stub.break_stream = False
+        self.assertEqual("".join(local_ai.stream_cached("prompt")), "Hello, world!")
+        self.assertEqual(cache.get("prompt"), "Hello, world!")
+
+
+@unittest.skipUnless(os.name == "posix", "the fake `ollama` CLI is a shell script")
+class CliFallbackTest(_LocalAi, unittest.TestCase):
+    """With the server down, answers come from `ollama run` (a fake one on PATH here)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        script = os.path.join(tmp.name, "ollama")
+        with open(script, "w") as f:
+            f.write("#!/bin/sh\ncat > /dev/null\nprintf 'answer from the cli'\n")
+        os.chmod(script, os.stat(script).st_mode | stat.S_IXUSR)
+        patcher = mock.patch.dict(os.environ, {"PATH": tmp.name + os.pathsep + os.environ.get("PATH", "")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.use_client(OllamaClient(unused_host(), timeout=2))
+
+    def test_run_llm_falls_back_to_the_cli(self):
+        self.assertEqual(local_ai.run_llm("hi"), "answer from the cli")
+
+    def test_stream_llm_falls_back_to_the_cli(self):
+        self.assertEqual("".join(local_ai.stream_llm("hi")), "answer from the cli")
+
+    def test_cli_answer_is_cached_when_complete(self):
+        cache = self.use_cache()
+        self.assertEqual("".join(local_ai.stream_cached("hi")), "answer from the cli")
+        self.assertEqual(cache.get("hi"), "answer from the cli")
+
+
+if __name__ == "__main__":
+    unittest.main()
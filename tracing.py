@@ -0,0 +1,182 @@
+import atexit
+import functools
+import json
+import math
+import threading
+import time
+from datetime import datetime
+
+from config import TRACE_ENABLED
+
+# Latencies land in log-spaced buckets 5% apart (1 µs .. ~30 min), so a
+# percentile is read off the counts to within ±2.5% without keeping samples.
+_GROWTH = 1.05
+_LOG_GROWTH = math.log(_GROWTH)
+_MIN_SECONDS = 1e-6
+
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = {}  # bucket index -> count
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        i = int(math.log(seconds / _MIN_SECONDS) / _LOG_GROWTH) if seconds > _MIN_SECONDS else 0
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+    def percentile(self, p):
+        """Seconds below which `p` percent of the samples fall (bucket midpoint, clamped to min/max)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                value = _MIN_SECONDS * _GROWTH ** (i + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        ms = 1000
+        return {
+            "count": self.count,
+            "total_ms": self.total * ms,
+            "mean_ms": self.total / self.count * ms if self.count else 0.0,
+            "min_ms": (self.min if self.count else 0.0) * ms,
+            "p50_ms": self.percentile(50) * ms,
+            "p95_ms": self.percentile(95) * ms,
+            "p99_ms": self.percentile(99) * ms,
+            "max_ms": self.max * ms,
+        }
+
+class Tracer:
+    """
+    Per-stage latency histograms ("route", "llm", "execute", "render"...).
+
+    Stages are recorded with span() / traced(); with TRACE_ENABLED off,
+    traced() hands back the undecorated function and span() a shared no-op
+    context, so the instrumentation costs nothing.
+    """
+
+    def __init__(self, enabled=TRACE_ENABLED):
+        self.enabled = enabled
+        self.started = datetime.now()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.add(seconds)
+
+    def stats(self):
+        """{stage: summary dict}, slowest total first."""
+        with self._lock:
+            summaries = {stage: h.summary() for stage, h in self._stages.items()}
+        return dict(sorted(summaries.items(), key=lambda kv: kv[1]["total_ms"], reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.started = datetime.now()
+
+    def dump(self, path):
+        """Writes the stats as JSON (with the raw buckets, so runs can be merged or compared offline)."""
+        with self._lock:
+            buckets = {stage: {str(i): n for i, n in sorted(h.buckets.items())} for stage, h in self._stages.items()}
+        data = {
+            "started": self.started.isoformat(timespec="seconds"),
+            "ended": datetime.now().isoformat(timespec="seconds"),
+            "bucket_growth": _GROWTH,
+            "bucket_min_seconds": _MIN_SECONDS,
+            "stages": {stage: dict(summary, buckets=buckets[stage]) for stage, summary in self.stats().items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _tracer.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+_tracer = Tracer()
+
+def get_tracer():
+    return _tracer
+
+def span(stage):
+    """`with span("execute"): ...` records how long the block took."""
+    return _Span(stage) if _tracer.enabled else _NO_SPAN
+
+def traced(stage):
+    """Decorator recording every call of a function (including the ones that raise) under `stage`."""
+    def decorate(fn):
+        if not _tracer.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _tracer.record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def traced_stream(stage):
+    """traced() for generators: from the first next() until the stream ends or is closed."""
+    def decorate(fn):
+        if not _tracer.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return (yield from fn(*args, **kwargs))
+            finally:
+                _tracer.record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def dump_on_exit(path):
+    """Writes the stats to `path` when the process exits."""
+    def write():
+        try:
+            _tracer.dump(path)
+        except OSError:
+            pass
+    atexit.register(write)
@@ -2,11 +2,8 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 from rich.rule import Rule
-from rich.prompt import Prompt
-from rich.layout import Layout
-from rich.live import Live
-from rich.spinner import Spinner
 from theme import custom_theme, COLORS
+from tracing import traced
 import time
 
 class TerminalUI:
@@ -15,6 +12,7 @@ class TerminalUI:
         self.mode = mode
         self.os_type = os_type
         self.spinner = None
+        self.partial_line = False
 
     def update_mode(self, mode):
         self.mode = mode
@@ -42,19 +40,30 @@ class TerminalUI:
         self.console.print(Rule(style="comment"))
         self.console.print()
 
-    def get_input(self):
+    def prompt_text(self):
         # Create a visually distinct prompt
         mode_style = "prompt"
         if self.mode == "expert": mode_style = "red"
         elif self.mode == "safe": mode_style = "green"
-        
-        return Prompt.ask(f"[{mode_style}]➜ {self.mode.upper()}[/{mode_style}]")
+
+        return f"[{mode_style}]➜ {self.mode.upper()}[/{mode_style}]"
+
+    def print_prompt(self, text=None):
+        """Draws a prompt without reading; the caller reads the line itself (see AsyncInput)."""
+        self.console.print(f"{text or self.prompt_text()}: ", end="")
+
+    @traced("render")
+    def print_async_response(self, renderable):
+        """Prints something that arrived while the prompt was waiting, then redraws the prompt."""
+        self.console.print()
+        self.console.print(renderable)
+        self.print_prompt()
 
     def print_command_execution(self, command):
         self.console.print(f"[comment]Executing:[/comment] [command]{command}[/command]")
 
-    def print_ai_thinking(self):
-        self.spinner = self.console.status("[ai.thinking]AI is thinking...[/ai.thinking]", spinner="dots")
+    def print_ai_thinking(self, message="AI is thinking..."):
+        self.spinner = self.console.status(f"[ai.thinking]{message}[/ai.thinking]", spinner="dots")
         self.spinner.start()
 
     def stop_ai_thinking(self):
@@ -62,6 +71,7 @@ class TerminalUI:
             self.spinner.stop()
             self.spinner = None
 
+    @traced("render")
     def print_ai_response(self, text):
         self.stop_ai_thinking()
         panel = Panel(
@@ -72,6 +82,68 @@ class TerminalUI:
         )
         self.console.print(panel)
 
+    def print_ai_stream(self, tokens, render, cancel=None):
+        """
+        Renders an AI answer while it is being generated.
+        `render` turns the text received so far into a renderable (e.g. a Markdown panel);
+        the spinner stays up until the first token, then a Live region takes over.
+        Setting the optional `cancel` event stops the stream early.
+        Returns the full text.
+        """
+        from rich.live import Live
+
+        text = ""
+        live = None
+        last_refresh = 0.0
+        try:
+            for token in tokens:
+                if cancel is not None and cancel.is_set():
+                    break
+                if not token:
+                    continue
+                text += token
+                if live is None:
+                    self.stop_ai_thinking()
+                    live = Live(render(text), console=self.console, auto_refresh=False)
+                    live.start()
+                    last_refresh = time.monotonic()
+                    continue
+                # Re-parsing Markdown on every token is wasteful, cap it at ~15 fps
+                now = time.monotonic()
+                if now - last_refresh >= 1 / 15:
+                    live.update(render(text), refresh=True)
+                    last_refresh = now
+        finally:
+            if hasattr(tokens, "close"):
+                tokens.close()
+            if live is not None:
+                live.update(render(text), refresh=True)
+                live.stop()
+
+        if live is None and not (cancel is not None and cancel.is_set()):
+            self.print_ai_response(render(text))
+        return text
+
+    def print_async_stream(self, tokens, render, cancel=None):
+        """
+        print_ai_stream for an answer that arrives while the prompt is waiting:
+        nothing is printed until the first token, and the prompt is redrawn
+        below the answer (unless `cancel` was set, whoever set it redraws).
+        """
+        from itertools import chain
+
+        try:
+            first = next(tokens, "")
+            if cancel is not None and cancel.is_set():
+                return ""
+            self.console.print()
+            text = self.print_ai_stream(chain([first], tokens), render, cancel)
+        finally:
+            tokens.close()
+        if cancel is None or not cancel.is_set():
+            self.print_prompt()
+        return text
+
     def print_error(self, message):
         self.stop_ai_thinking()
         self.console.print(f"[error]✖ Error:[/error] {message}")
@@ -86,6 +158,39 @@ class TerminalUI:
     def print_warning(self, message):
         self.console.print(f"[warning]⚠ Warning:[/warning] {message}")
 
+    @traced("render_line")
+    def stream_line(self, stream, text):
+        """Prints one raw line of command output as it arrives ("err" lines in the error style)."""
+        style = "error" if stream == "err" else "foreground"
+        self.console.print(text, style=style, markup=False, highlight=False, end="")
+        self.partial_line = not text.endswith("\n")
+
+    def end_stream(self):
+        # Output that did not end with a newline would otherwise swallow the next message
+        if self.partial_line:
+            self.console.print()
+            self.partial_line = False
+
+    def page_height(self):
+        """Output lines per pager page: the terminal height less the status, hint and prompt lines."""
+        return max(5, self.console.size.height - 4)
+
+    def pager_screen(self):
+        """The alternate screen while paging, so pages don't pile up in the scrollback."""
+        return self.console.screen(hide_cursor=False)
+
+    @traced("render")
+    def show_page(self, lines, status, hint, highlight=None):
+        """Draws one pager window: the lines (cut at the terminal width), a status rule and a hint."""
+        text = Text.from_ansi("\n".join(lines), style="foreground", no_wrap=True, overflow="ellipsis")
+        if highlight:
+            text.highlight_words([highlight], style="reverse", case_sensitive=False)
+        self.console.clear()
+        self.console.print(text)
+        self.console.print(Rule(Text(status), style="comment"))
+        self.console.print(hint, style="comment", markup=False, highlight=False, no_wrap=True, overflow="ellipsis")
+
+    @traced("render")
     def stream_output(self, output):
         # Determine if output looks like a list or table, otherwise just print
         self.console.print(output, style="foreground")